@@ -2,11 +2,35 @@ import streamlit as st
 import pandas as pd
 import os
 import re # For regex to extract year from filenames
+import hashlib # For fingerprinting the source CSVs of the on-disk cache
+import json # For the source file manifest
+import numpy as np # For the leaderboard's ranking arrays
 import plotly.express as px # For interactive plots
+from concurrent.futures import ThreadPoolExecutor # For parallel CSV ingestion
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The shared vahan_frames module lives in the repository root
+from vahan_frames import optimize_frame_dtypes
+
+try:
+    import pyarrow # Optional: enables the Parquet cache of preprocessed frames
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
 
 # --- 1. Configuration and Data Paths ---
 # Define the directory where CSVs are stored
 DATA_DIR = "vahan_data" # Assuming the scraped data is in this folder
+INGEST_WORKERS = min(8, os.cpu_count() or 1) # Threads used to parse CSVs in parallel (1 = serial)
+CACHE_DIR = ".vahan_cache" # Parquet copies of the preprocessed frames, survive Streamlit restarts
+FRAGMENT_DIR = os.path.join(CACHE_DIR, "files") # One preprocessed Parquet fragment per source CSV
+MANIFEST_FILE = os.path.join(CACHE_DIR, "manifest.json") # Size, mtime and content hash of every ingested CSV
+CACHE_VERSION = 2 # Bump when the columns of the cached frames change, so older caches are rebuilt
+PERIOD_EPOCH_YEAR = 1970 # Month and quarter keys count from January of this year
+LEADERBOARD_SIZE = 20 # Default number of manufacturers in the top movers leaderboard
+COMPARISON_MAX_ENTITIES = 10 # Most lines drawn in the comparison chart
+COMPARISON_MAX_POINTS = 2000 # Most points drawn in the comparison chart; older periods are dropped beyond it
+CACHE_MAX_ENTRIES = 256 # Most results kept per cached dashboard artifact (names, growth views, figures)
+CACHE_TTL_SECONDS = 3600 # Seconds a cached dashboard artifact is kept
 
 # Ensure the data directory exists
 if not os.path.exists(DATA_DIR):
@@ -14,158 +38,412 @@ if not os.path.exists(DATA_DIR):
     st.stop() # Stop the Streamlit app if data directory is missing
 
 # --- 2. Data Loading and Preprocessing Functions ---
-@st.cache_data # Cache data to avoid reloading on every rerun
-def load_and_preprocess_data():
+# Integer period keys: months and quarters counted from January of PERIOD_EPOCH_YEAR
+def month_key(year, month_num):
+    """Returns the month key (months since January of PERIOD_EPOCH_YEAR) for Year and MonthNum series."""
+    return (year.astype('int32') - PERIOD_EPOCH_YEAR) * 12 + (month_num.astype('int32') - 1)
+
+def format_quarter_labels(quarter_keys):
+    """Returns 'YYYY-Qn' labels for a series of quarter keys, formatting each distinct quarter once."""
+    codes, uniques = pd.factorize(quarter_keys)
+    labels = pd.Index([f"{PERIOD_EPOCH_YEAR + key // 4}-Q{key % 4 + 1}" for key in uniques], dtype=object)
+    return pd.Series(labels.take(codes), index=quarter_keys.index)
+
+def parse_calendar_year_file(file):
     """
-    Loads all calendar year and month-wise CSVs from the DATA_DIR,
-    combines them into two main DataFrames, and performs initial cleaning.
+    Parses a single calendar year CSV into the (Name, DataType, Year, Registrations) layout.
+    Returns a (DataFrame or None, warning message or None) tuple so it can run on a worker thread;
+    Streamlit calls are left to the caller on the main script thread.
     """
-    all_calendar_data = []
-    all_monthly_data = []
+    filepath = os.path.join(DATA_DIR, file)
+    try:
+        df = pd.read_csv(filepath)
+        
+        # Determine if it's Maker or Vehicle Category data
+        df_type = ""
+        if "Y_Maker_" in file:
+            df_type = "Manufacturer"
+            df.rename(columns={col: col.replace('Maker_Maker', 'Name').replace('TOTAL_TOTAL', 'TotalRegistrations') for col in df.columns}, inplace=True)
+        elif "Y_Vehicle_Category_" in file:
+            df_type = "Vehicle Category"
+            df.rename(columns={col: col.replace('Vehicle Category_Vehicle Category', 'Name').replace('TOTAL_TOTAL', 'TotalRegistrations') for col in df.columns}, inplace=True)
+        else:
+            return None, None # Skip files that don't match expected patterns
 
-    # --- Load Calendar Year Data (for YoY) ---
-    # Files are expected to be named like Y_Maker_X_Calendar_Year_Year_YYYY.csv
-    # or Y_Vehicle_Category_X_Calendar_Year_Year_YYYY.csv
-    calendar_year_files = [f for f in os.listdir(DATA_DIR) if f.startswith("Y_") and "X_Calendar_Year_Year_" in f and f.endswith(".csv")]
-    
-    for file in calendar_year_files:
-        filepath = os.path.join(DATA_DIR, file)
-        try:
-            df = pd.read_csv(filepath)
+        df['DataType'] = df_type
+
+        # Extract the year from the column name (e.g., 'Calendar Year_2024')
+        year_col = next((col for col in df.columns if 'Calendar Year_' in col), None)
+        if year_col:
+            year = int(year_col.split('_')[-1])
+            df['Year'] = year
+            # Assign the specific year's registration count to a generic 'Registrations' column
+            df['Registrations'] = pd.to_numeric(df[year_col], errors='coerce').fillna(0)
             
-            # Determine if it's Maker or Vehicle Category data
-            df_type = ""
-            if "Y_Maker_" in file:
-                df_type = "Manufacturer"
-                df.rename(columns={col: col.replace('Maker_Maker', 'Name').replace('TOTAL_TOTAL', 'TotalRegistrations') for col in df.columns}, inplace=True)
-            elif "Y_Vehicle_Category_" in file:
-                df_type = "Vehicle Category"
-                df.rename(columns={col: col.replace('Vehicle Category_Vehicle Category', 'Name').replace('TOTAL_TOTAL', 'TotalRegistrations') for col in df.columns}, inplace=True)
-            else:
-                continue # Skip files that don't match expected patterns
+            # Select and reorder relevant columns
+            return df[['Name', 'DataType', 'Year', 'Registrations']], None
+        return None, f"Could not find a 'Calendar Year_' column in {file}. Skipping for YoY analysis."
+    except Exception as e:
+        return None, f"Error loading or processing {file} for calendar data: {e}"
+
+def parse_month_wise_file(file):
+    """
+    Parses a single month-wise CSV and melts it into one row per Name and Month.
+    Returns a (DataFrame or None, warning message or None) tuple, like parse_calendar_year_file.
+    """
+    filepath = os.path.join(DATA_DIR, file)
+    try:
+        df = pd.read_csv(filepath)
+        
+        # Extract the year from the filename
+        match = re.search(r'Year_(\d{4})\.csv', file)
+        if not match:
+            return None, f"Could not extract year from filename: {file}. Skipping for QoQ analysis."
+        year = int(match.group(1))
+
+        df_type = ""
+        if "Y_Maker_" in file:
+            df_type = "Manufacturer"
+            df.rename(columns={col: col.replace('Maker_Maker', 'Name') for col in df.columns}, inplace=True)
+        elif "Y_Vehicle_Category_" in file:
+            df_type = "Vehicle Category"
+            df.rename(columns={col: col.replace('Vehicle Category_Vehicle Category', 'Name') for col in df.columns}, inplace=True)
+        else:
+            return None, None
 
-            df['DataType'] = df_type
+        df['DataType'] = df_type
+        df['Year'] = year
 
-            # Extract the year from the column name (e.g., 'Calendar Year_2024')
-            year_col = next((col for col in df.columns if 'Calendar Year_' in col), None)
-            if year_col:
-                year = int(year_col.split('_')[-1])
-                df['Year'] = year
-                # Assign the specific year's registration count to a generic 'Registrations' column
-                df['Registrations'] = pd.to_numeric(df[year_col], errors='coerce').fillna(0)
-                
-                # Select and reorder relevant columns
-                df = df[['Name', 'DataType', 'Year', 'Registrations']]
-                all_calendar_data.append(df)
-            else:
-                st.warning(f"Could not find a 'Calendar Year_' column in {file}. Skipping for YoY analysis.")
-        except Exception as e:
-            st.warning(f"Error loading or processing {file} for calendar data: {e}")
+        # Melt the monthly columns into rows
+        month_cols = [col for col in df.columns if 'Month Wise_' in col]
+        if not month_cols:
+            return None, f"No month-wise columns found in {file}. Skipping for QoQ analysis."
+        
+        df_melted = df.melt(id_vars=['S No_S No', 'Name', 'DataType', 'Year'], 
+                            value_vars=month_cols, 
+                            var_name='Month', 
+                            value_name='MonthlyRegistrations')
+        
+        df_melted['Month'] = df_melted['Month'].str.replace('Month Wise_', '') # Clean month name
+        
+        # Convert month name to number for the integer month key
+        month_to_num = {
+            'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+            'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+        }
+        df_melted['MonthNum'] = df_melted['Month'].map(month_to_num)
+        
+        df_melted.dropna(subset=['MonthNum'], inplace=True) # Drop rows with an unknown month label
+        # Integer month key used for sorting and quarter arithmetic
+        df_melted['MonthKey'] = month_key(df_melted['Year'], df_melted['MonthNum'])
 
-    calendar_data_combined = pd.concat(all_calendar_data, ignore_index=True) if all_calendar_data else pd.DataFrame()
-    
-    # --- Load Month Wise Data (for QoQ) ---
+        df_melted['MonthlyRegistrations'] = pd.to_numeric(df_melted['MonthlyRegistrations'], errors='coerce').fillna(0)
+        
+        # Select and reorder relevant columns
+        return df_melted[['Name', 'DataType', 'Year', 'Month', 'MonthNum', 'MonthKey', 'MonthlyRegistrations']], None
+    except Exception as e:
+        return None, f"Error loading or processing {file} for monthly data: {e}"
+
+def parse_files(parser, files, workers=INGEST_WORKERS):
+    """
+    Runs `parser` over `files` and returns a {file: DataFrame or None} dict.
+    With workers > 1 the files are parsed on a thread pool (pandas releases the GIL while
+    tokenizing CSVs); results are collected in input order so the output matches the serial path.
+    """
+    if workers and workers > 1 and len(files) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(files))) as executor:
+            results = list(executor.map(parser, files))
+    else:
+        results = [parser(file) for file in files]
+
+    parsed = {}
+    for file, (df, warning) in zip(files, results):
+        if warning:
+            st.warning(warning)
+        parsed[file] = df
+    return parsed
+
+def combine_frames(files, frames_by_file):
+    """Concatenates the per-file frames in `files` order with a single pd.concat."""
+    frames = [frames_by_file[file] for file in files if frames_by_file.get(file) is not None]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def get_source_fingerprint(files):
+    """
+    Returns a short key for the set of source CSVs, built from each file's name, size and mtime.
+    Any added, removed or rewritten file produces a different key.
+    """
+    digest = hashlib.sha1()
+    digest.update(f"v{CACHE_VERSION}\n".encode("utf-8"))
+    for file in sorted(files):
+        stat = os.stat(os.path.join(DATA_DIR, file))
+        digest.update(f"{file}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def load_cached_frames(cache_key, prefixes=("calendar", "monthly")):
+    """Loads the frames stored under `prefixes` from the Parquet cache, or returns None on a cache miss."""
+    if not PARQUET_AVAILABLE:
+        return None
+    paths = [os.path.join(CACHE_DIR, f"{prefix}_{cache_key}.parquet") for prefix in prefixes]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    try:
+        return tuple(pd.read_parquet(path) for path in paths)
+    except Exception as e:
+        st.warning(f"Ignoring unreadable data cache in '{CACHE_DIR}': {e}")
+        return None
+
+def save_cached_frames(cache_key, frames_by_prefix):
+    """
+    Writes {prefix: frame} to the Parquet cache and removes entries for older source versions.
+    Files are written under a temporary name and renamed so a concurrent reader never sees a partial file.
+    """
+    if not PARQUET_AVAILABLE:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for prefix, df in frames_by_prefix.items():
+            path = os.path.join(CACHE_DIR, f"{prefix}_{cache_key}.parquet")
+            df.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+        for file in os.listdir(CACHE_DIR):
+            if file.endswith(".parquet") and not file.endswith(f"_{cache_key}.parquet"):
+                os.remove(os.path.join(CACHE_DIR, file))
+    except Exception as e:
+        st.warning(f"Could not write data cache to '{CACHE_DIR}': {e}")
+
+def hash_file(filepath):
+    """Returns the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest():
+    """Loads the manifest of previously ingested CSVs ({file: {size, mtime_ns, sha256, has_data}})."""
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    """Writes the manifest atomically."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(MANIFEST_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(MANIFEST_FILE + ".tmp", MANIFEST_FILE)
+
+def build_file_manifest(files, previous_manifest):
+    """
+    Builds manifest entries for `files`. The content hash is only recomputed for files whose
+    size or mtime differs from the previous manifest, so an unchanged directory costs one stat per file.
+    """
+    manifest = {}
+    for file in files:
+        stat = os.stat(os.path.join(DATA_DIR, file))
+        previous = previous_manifest.get(file)
+        if previous and previous.get("cache_version") != CACHE_VERSION:
+            previous = None # Fragment written with older columns, parse the file again
+        if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+            manifest[file] = dict(previous)
+            continue
+        manifest[file] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": hash_file(os.path.join(DATA_DIR, file)),
+            "cache_version": CACHE_VERSION,
+        }
+        # A touched file with identical contents keeps its parsed fragment
+        if previous and previous["sha256"] == manifest[file]["sha256"] and "has_data" in previous:
+            manifest[file]["has_data"] = previous["has_data"]
+    return manifest
+
+def diff_manifests(previous_manifest, current_manifest):
+    """Returns the (added, changed, removed) file lists between two manifests."""
+    added = [f for f in current_manifest if f not in previous_manifest]
+    changed = [f for f in current_manifest if f in previous_manifest and current_manifest[f]["sha256"] != previous_manifest[f]["sha256"]]
+    removed = [f for f in previous_manifest if f not in current_manifest]
+    return added, changed, removed
+
+def fragment_path(file):
+    return os.path.join(FRAGMENT_DIR, f"{file}.parquet")
+
+def load_and_preprocess_data(workers=INGEST_WORKERS):
+    """
+    Loads all calendar year and month-wise CSVs from the DATA_DIR,
+    combines them into two main DataFrames, and performs initial cleaning.
+    Set workers=1 to parse the files serially. The dashboard reads the frames through
+    load_dashboard_data, which caches them per dataset version.
+    The result is also kept in a Parquet cache keyed by the source files' names, sizes and mtimes,
+    so a restarted app only re-parses the CSVs when one of them has changed. In that case the
+    manifest is used to re-parse only the added or changed files; every other file is read back
+    from its per-file fragment and the frames are merged again.
+    """
+    # Files are expected to be named like Y_Maker_X_Calendar_Year_Year_YYYY.csv
+    # or Y_Vehicle_Category_X_Calendar_Year_Year_YYYY.csv
+    calendar_year_files = [f for f in os.listdir(DATA_DIR) if f.startswith("Y_") and "X_Calendar_Year_Year_" in f and f.endswith(".csv")]
     # Files are expected to be named like Y_Maker_X_Month_Wise_Year_YYYY.csv
     # or Y_Vehicle_Category_X_Month_Wise_Year_YYYY.csv
     month_wise_files = [f for f in os.listdir(DATA_DIR) if f.startswith("Y_") and "X_Month_Wise_Year_" in f and f.endswith(".csv")]
 
-    for file in month_wise_files:
-        filepath = os.path.join(DATA_DIR, file)
-        try:
-            df = pd.read_csv(filepath)
-            
-            # Extract the year from the filename
-            match = re.search(r'Year_(\d{4})\.csv', file)
-            if not match:
-                st.warning(f"Could not extract year from filename: {file}. Skipping for QoQ analysis.")
+    cache_key = get_source_fingerprint(calendar_year_files + month_wise_files)
+    cached_frames = load_cached_frames(cache_key)
+    if cached_frames is not None:
+        return cached_frames
+
+    # Reuse the per-file fragments of files whose contents have not changed since the last ingest
+    frames_by_file = {}
+    manifest = {}
+    if PARQUET_AVAILABLE:
+        previous_manifest = load_manifest()
+        manifest = build_file_manifest(calendar_year_files + month_wise_files, previous_manifest)
+        added, changed, removed = diff_manifests(previous_manifest, manifest)
+        stale_files = set(added) | set(changed)
+        for file, entry in manifest.items():
+            if file in stale_files or "has_data" not in entry:
                 continue
-            year = int(match.group(1))
-
-            df_type = ""
-            if "Y_Maker_" in file:
-                df_type = "Manufacturer"
-                df.rename(columns={col: col.replace('Maker_Maker', 'Name') for col in df.columns}, inplace=True)
-            elif "Y_Vehicle_Category_" in file:
-                df_type = "Vehicle Category"
-                df.rename(columns={col: col.replace('Vehicle Category_Vehicle Category', 'Name') for col in df.columns}, inplace=True)
-            else:
+            if not entry["has_data"]:
+                frames_by_file[file] = None
                 continue
+            try:
+                frames_by_file[file] = pd.read_parquet(fragment_path(file))
+            except Exception:
+                pass # Missing or unreadable fragment, the file is simply parsed again
+        for file in removed:
+            if os.path.exists(fragment_path(file)):
+                os.remove(fragment_path(file))
 
-            df['DataType'] = df_type
-            df['Year'] = year
-
-            # Melt the monthly columns into rows
-            month_cols = [col for col in df.columns if 'Month Wise_' in col]
-            if not month_cols:
-                st.warning(f"No month-wise columns found in {file}. Skipping for QoQ analysis.")
-                continue
-            
-            df_melted = df.melt(id_vars=['S No_S No', 'Name', 'DataType', 'Year'], 
-                                value_vars=month_cols, 
-                                var_name='Month', 
-                                value_name='MonthlyRegistrations')
-            
-            df_melted['Month'] = df_melted['Month'].str.replace('Month Wise_', '') # Clean month name
-            
-            # Convert month name to number for datetime object
-            month_to_num = {
-                'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
-                'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
-            }
-            df_melted['MonthNum'] = df_melted['Month'].map(month_to_num)
-            
-            # Create a proper date column (e.g., first day of the month) for sorting
-            df_melted['Date'] = pd.to_datetime(df_melted['Year'].astype(str) + '-' + df_melted['MonthNum'].astype(str) + '-01', errors='coerce')
-            df_melted.dropna(subset=['Date'], inplace=True) # Drop rows where date conversion failed
+    # --- Load Calendar Year Data (for YoY) ---
+    # --- Load Month Wise Data (for QoQ) ---
+    parsed = parse_files(parse_calendar_year_file, [f for f in calendar_year_files if f not in frames_by_file], workers)
+    parsed.update(parse_files(parse_month_wise_file, [f for f in month_wise_files if f not in frames_by_file], workers))
+    frames_by_file.update(parsed)
 
-            df_melted['MonthlyRegistrations'] = pd.to_numeric(df_melted['MonthlyRegistrations'], errors='coerce').fillna(0)
-            
-            # Select and reorder relevant columns
-            df_melted = df_melted[['Name', 'DataType', 'Year', 'Month', 'MonthNum', 'Date', 'MonthlyRegistrations']]
-            all_monthly_data.append(df_melted)
+    calendar_data_combined = optimize_frame_dtypes(combine_frames(calendar_year_files, frames_by_file), "Calendar year data")
+    monthly_data_combined = optimize_frame_dtypes(combine_frames(month_wise_files, frames_by_file), "Month wise data")
 
+    if PARQUET_AVAILABLE:
+        try:
+            os.makedirs(FRAGMENT_DIR, exist_ok=True)
+            for file, df in parsed.items():
+                manifest[file]["has_data"] = df is not None
+                if df is not None:
+                    df.to_parquet(fragment_path(file) + ".tmp", index=False)
+                    os.replace(fragment_path(file) + ".tmp", fragment_path(file))
+            save_manifest(manifest)
         except Exception as e:
-            st.warning(f"Error loading or processing {file} for monthly data: {e}")
+            st.warning(f"Could not update the ingest manifest in '{CACHE_DIR}': {e}")
 
-    monthly_data_combined = pd.concat(all_monthly_data, ignore_index=True) if all_monthly_data else pd.DataFrame()
+    # Without pyarrow there is no cache to keep them in: load_growth_tables then computes them once per dataset version
+    if PARQUET_AVAILABLE and not (calendar_data_combined.empty and monthly_data_combined.empty):
+        # Growth for every entity is materialized at ingest time, next to the frames it is derived from
+        annual_growth, quarterly_growth = build_growth_tables(apply_category_mapping(calendar_data_combined), apply_category_mapping(monthly_data_combined))
+        save_cached_frames(cache_key, {
+            "calendar": calendar_data_combined, "monthly": monthly_data_combined,
+            "annual_growth": annual_growth, "quarterly_growth": quarterly_growth,
+        })
 
     return calendar_data_combined, monthly_data_combined
 
+def get_dataset_version():
+    """Returns the fingerprint of the source CSVs currently in DATA_DIR (one stat per file)."""
+    files = [f for f in os.listdir(DATA_DIR) if f.startswith("Y_") and ("X_Calendar_Year_Year_" in f or "X_Month_Wise_Year_" in f) and f.endswith(".csv")]
+    return get_source_fingerprint(files)
+
+def freeze_frame(df):
+    """
+    Returns `df` rebuilt on read-only arrays, so writing values into it (e.g. with .loc) raises
+    instead of changing a frame other sessions share. Frames derived from it are ordinary copies.
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy(copy=True)
+            codes.flags.writeable = False
+            columns[col] = pd.Categorical.from_codes(codes, dtype=series.dtype)
+        elif isinstance(series.dtype, np.dtype):
+            values = series.to_numpy(copy=True)
+            values.flags.writeable = False
+            columns[col] = values
+        else:
+            columns[col] = series.array # Extension arrays (e.g. strings) are kept as they are
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+@st.cache_resource(max_entries=1) # Shared by all sessions without copying; only the latest version is kept
+def load_dashboard_data(dataset_version):
+    """
+    Returns the (calendar_data, monthly_data) frames for `dataset_version` (see get_dataset_version),
+    with vehicle categories mapped to their 2W/3W/4W group. The mapping is done once here instead of
+    on every rerun, and the frames are read-only: they are shared by all sessions, so anything that
+    needs to change them works on a copy.
+    """
+    calendar_data, monthly_data = load_and_preprocess_data()
+    return freeze_frame(apply_category_mapping(calendar_data)), freeze_frame(apply_category_mapping(monthly_data))
+
+def load_growth_tables(dataset_version):
+    """
+    Returns the (annual_growth, quarterly_growth) tables holding YoY/QoQ for every (DataType, Name),
+    with vehicle categories grouped into 2W/3W/4W. They are read from the Parquet cache written at
+    ingest time for `dataset_version` and only recomputed if that cache is unavailable.
+    """
+    cached_growth = load_cached_frames(dataset_version, ("annual_growth", "quarterly_growth"))
+    if cached_growth is not None:
+        return cached_growth
+    calendar_data, monthly_data = load_dashboard_data(dataset_version)
+    return build_growth_tables(calendar_data, monthly_data)
+
 # --- 3. Vehicle Category Mapping ---
+# Keyword patterns per vehicle group, compiled once and checked in priority order
+CATEGORY_PATTERNS = [
+    ('2W', re.compile(r'TWO WHEELER')),
+    ('3W', re.compile(r'THREE WHEELER')),
+    # Classify everything else that seems like a vehicle under 4W, as per general understanding
+    ('4W', re.compile('|'.join(re.escape(keyword) for keyword in ['FOUR WHEELER', 'GOODS VEHICLE', 'PASSENGER VEHICLE', 'MOTOR VEHICLE', 'TRAC', 'EARTH MOVING']))),
+]
+
 def map_vehicle_category(category_name):
     """
     Maps detailed vehicle category names to broader 2W, 3W, or 4W groups.
     """
     category_name = str(category_name).strip().upper()
-    if 'TWO WHEELER' in category_name:
-        return '2W'
-    elif 'THREE WHEELER' in category_name:
-        return '3W'
-    # Classify everything else that seems like a vehicle under 4W, as per general understanding
-    elif any(keyword in category_name for keyword in ['FOUR WHEELER', 'GOODS VEHICLE', 'PASSENGER VEHICLE', 'MOTOR VEHICLE', 'TRAC', 'EARTH MOVING']):
-        return '4W'
+    for group, pattern in CATEGORY_PATTERNS:
+        if pattern.search(category_name):
+            return group
     return 'Other' # Fallback for unclassified categories
 
+def map_vehicle_categories(names):
+    """
+    Vectorized map_vehicle_category for a Series of names: each distinct name is classified once
+    and the result is broadcast back through the factorized codes, so the cost is O(unique names).
+    """
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    return pd.Series(pd.Index(uniques, dtype=object).map(map_vehicle_category).take(codes), index=names.index)
+
 # --- 4. Growth Analysis Functions ---
 def calculate_yoy_growth(df_annual):
     """
     Calculates Year-over-Year (YoY) growth for registrations.
-    Expects a DataFrame with 'Name', 'Year', and 'Registrations' columns.
-    First, it aggregates the data to ensure one row per Name and Year.
+    Expects a DataFrame with 'Name', 'Year', and 'Registrations' columns, and optionally 'DataType'.
+    Every entity (DataType, Name) is handled in the same pass: one groupby aggregates and sorts
+    the data and one groupby-shift finds each entity's previous year.
     """
     if df_annual.empty or 'Year' not in df_annual.columns or 'Registrations' not in df_annual.columns or 'Name' not in df_annual.columns:
         return pd.DataFrame()
+    entity_cols = ['DataType', 'Name'] if 'DataType' in df_annual.columns else ['Name']
 
-    # Step 1: Aggregate data to ensure there's only one entry per name and year.
+    # Step 1: Aggregate data to ensure there's only one entry per entity and year.
     # This prevents the multiple, incorrect rows seen in the dashboard.
-    df_annual_grouped = df_annual.groupby(['Name', 'Year'])['Registrations'].sum().reset_index()
+    # The result is sorted by entity and Year, as the shift below requires.
+    df_annual_sorted = df_annual.groupby(entity_cols + ['Year'], observed=True)['Registrations'].sum().reset_index()
 
-    # Step 2: Ensure registrations are numeric and sort for correct shift calculation.
-    df_annual_grouped['Registrations'] = pd.to_numeric(df_annual_grouped['Registrations'], errors='coerce').fillna(0)
-    df_annual_sorted = df_annual_grouped.sort_values(by=['Name', 'Year']).copy()
+    # Step 2: Ensure registrations are numeric.
+    df_annual_sorted['Registrations'] = pd.to_numeric(df_annual_sorted['Registrations'], errors='coerce').fillna(0)
     
     # Step 3: Calculate previous year's registrations using shift on the aggregated data.
-    df_annual_sorted['PrevYearRegistrations'] = df_annual_sorted.groupby(['Name'])['Registrations'].shift(1)
+    df_annual_sorted['PrevYearRegistrations'] = df_annual_sorted.groupby(entity_cols, observed=True)['Registrations'].shift(1)
     
     # Step 4: Calculate YoY Growth.
     # Handle the case where the previous year's registrations are zero to avoid division by zero errors.
@@ -173,11 +451,11 @@ def calculate_yoy_growth(df_annual):
     df_annual_sorted['YoYGrowth'] = ((df_annual_sorted['Registrations'] - df_annual_sorted['PrevYearRegistrations']) / df_annual_sorted['PrevYearRegistrations']) * 100
     
     # Handle infinite values (from division by zero) and round the result.
-    df_annual_sorted['YoYGrowth'] = df_annual_sorted['YoYGrowth'].replace([float('inf'), -float('inf')], pd.NA).round(2)
+    df_annual_sorted['YoYGrowth'] = df_annual_sorted['YoYGrowth'].replace([float('inf'), -float('inf')], float('nan')).round(2)
 
     # For the first year (e.g., 2016 or first year per group), set missing values to np.nan (not string 'NA')
     import numpy as np
-    min_years = df_annual_sorted.groupby('Name')['Year'].transform('min')
+    min_years = df_annual_sorted.groupby(entity_cols, observed=True)['Year'].transform('min')
     mask_first_year = df_annual_sorted['Year'] == min_years
     df_annual_sorted.loc[mask_first_year, 'PrevYearRegistrations'] = np.nan
     df_annual_sorted.loc[mask_first_year, 'YoYGrowth'] = np.nan
@@ -185,33 +463,39 @@ def calculate_yoy_growth(df_annual):
     # Registrations should always be numeric
     df_annual_sorted['Registrations'] = pd.to_numeric(df_annual_sorted['Registrations'], errors='coerce')
 
-    # Return the final DataFrame with the correct calculations.
-    return df_annual_sorted
+    # Return the final DataFrame with the correct calculations, Name first.
+    return df_annual_sorted[['Name'] + [col for col in df_annual_sorted.columns if col != 'Name']]
 
 def calculate_qoq_growth(df_monthly):
     """
     Calculates Quarter-over-Quarter (QoQ) growth for registrations.
-    Expects a DataFrame with 'Name', 'Date', and 'MonthlyRegistrations' columns.
+    Expects a DataFrame with 'Name', 'MonthKey', and 'MonthlyRegistrations' columns, and optionally 'DataType'.
+    Quarters are identified by QuarterKey (quarters since January of PERIOD_EPOCH_YEAR);
+    'YYYY-Qn' labels are only formatted for display. As in calculate_yoy_growth, every entity is
+    handled in one groupby and one groupby-shift.
     """
-    if df_monthly.empty or 'Date' not in df_monthly.columns or 'MonthlyRegistrations' not in df_monthly.columns or 'Name' not in df_monthly.columns:
+    if df_monthly.empty or 'MonthKey' not in df_monthly.columns or 'MonthlyRegistrations' not in df_monthly.columns or 'Name' not in df_monthly.columns:
         return pd.DataFrame()
 
-    # Ensure monthly registrations are numeric
-    df_monthly['MonthlyRegistrations'] = pd.to_numeric(df_monthly['MonthlyRegistrations'], errors='coerce').fillna(0)
+    # Ensure monthly registrations are numeric; assign leaves the (possibly shared) input frame untouched
+    df_monthly = df_monthly.assign(
+        MonthlyRegistrations=pd.to_numeric(df_monthly['MonthlyRegistrations'], errors='coerce').fillna(0),
+        QuarterKey=df_monthly['MonthKey'] // 3,
+    )
 
-    # Add Quarter and QuarterYear columns
-    df_monthly['Quarter'] = df_monthly['Date'].dt.quarter
-    df_monthly['QuarterYear'] = df_monthly['Date'].dt.year.astype(str) + '-Q' + df_monthly['Quarter'].astype(str)
-    
-    # Aggregate monthly registrations to quarterly
-    df_quarterly = df_monthly.groupby(['Name', 'DataType', 'Year', 'Quarter', 'QuarterYear'])['MonthlyRegistrations'].sum().reset_index()
-    df_quarterly.rename(columns={'MonthlyRegistrations': 'QuarterlyRegistrations'}, inplace=True)
-    
-    # Sort for correct shift calculation
-    df_quarterly_sorted = df_quarterly.sort_values(by=['Name', 'Year', 'Quarter']).copy()
+    entity_cols = ['DataType', 'Name'] if 'DataType' in df_monthly.columns else ['Name']
+
+    # Aggregate monthly registrations to quarterly; the result is sorted by entity and quarter
+    df_quarterly_sorted = df_monthly.groupby(entity_cols + ['QuarterKey'], observed=True)['MonthlyRegistrations'].sum().reset_index()
+    df_quarterly_sorted.rename(columns={'MonthlyRegistrations': 'QuarterlyRegistrations'}, inplace=True)
+
+    # Derive Year and the quarter number arithmetically from the quarter key
+    df_quarterly_sorted.insert(len(entity_cols), 'Year', PERIOD_EPOCH_YEAR + df_quarterly_sorted['QuarterKey'] // 4)
+    df_quarterly_sorted.insert(len(entity_cols) + 1, 'Quarter', (df_quarterly_sorted['QuarterKey'] % 4 + 1).astype('int32'))
+    df_quarterly_sorted = df_quarterly_sorted[['Name'] + [col for col in df_quarterly_sorted.columns if col != 'Name']]
     
     # Calculate previous quarter's registrations using shift
-    df_quarterly_sorted['PrevQuarterRegistrations'] = df_quarterly_sorted.groupby(['Name'])['QuarterlyRegistrations'].shift(1)
+    df_quarterly_sorted['PrevQuarterRegistrations'] = df_quarterly_sorted.groupby(entity_cols, observed=True)['QuarterlyRegistrations'].shift(1)
     
     # Calculate QoQ Growth
     df_quarterly_sorted['QoQGrowth'] = ((df_quarterly_sorted['QuarterlyRegistrations'] - df_quarterly_sorted['PrevQuarterRegistrations']) / df_quarterly_sorted['PrevQuarterRegistrations']) * 100
@@ -219,10 +503,245 @@ def calculate_qoq_growth(df_monthly):
     # *** FIX: Explicitly convert to numeric before rounding to avoid TypeError ***
     df_quarterly_sorted['QoQGrowth'] = pd.to_numeric(df_quarterly_sorted['QoQGrowth'], errors='coerce')
 
-    df_quarterly_sorted['QoQGrowth'] = df_quarterly_sorted['QoQGrowth'].replace([float('inf'), -float('inf')], pd.NA).round(2) # Handle inf values
+    df_quarterly_sorted['QoQGrowth'] = df_quarterly_sorted['QoQGrowth'].replace([float('inf'), -float('inf')], float('nan')).round(2) # Handle inf values
     
     return df_quarterly_sorted
 
+def apply_category_mapping(df):
+    """Returns a copy of `df` with vehicle category names replaced by their 2W/3W/4W group. Not idempotent: apply it once."""
+    df = df.copy()
+    if not df.empty and 'Name' in df.columns:
+        mask = df['DataType'] == 'Vehicle Category'
+        names = df['Name'].astype(object) # A categorical column cannot take the new group names in place
+        names[mask] = map_vehicle_categories(names[mask])
+        df['Name'] = names.astype('category') if isinstance(df['Name'].dtype, pd.CategoricalDtype) else names
+    return df
+
+def build_growth_tables(calendar_data, monthly_data):
+    """
+    Computes YoY and QoQ growth for every (DataType, Name) at once from frames whose vehicle
+    categories are already mapped (see apply_category_mapping). Rows are ordered by DataType, Name and period, so each entity is one contiguous block.
+    """
+    annual_growth = calculate_yoy_growth(calendar_data)
+    quarterly_growth = calculate_qoq_growth(monthly_data)
+    return optimize_frame_dtypes(annual_growth, "Annual growth"), optimize_frame_dtypes(quarterly_growth, "Quarterly growth")
+
+def build_growth_index(growth):
+    """Maps each (DataType, Name) of a growth table to the positions of its rows."""
+    if growth.empty:
+        return {}
+    return growth.groupby(['DataType', 'Name'], observed=True, sort=False).indices
+
+@st.cache_resource(max_entries=1)
+def load_growth_engine(dataset_version):
+    """
+    Returns (annual_growth, quarterly_growth, annual_index, quarterly_index) for the source files of
+    `dataset_version`. It is built once per dataset version and shared by all sessions without
+    copying, so the frames are read-only (see freeze_frame); get_entity_growth returns copies of their rows.
+    """
+    annual_growth, quarterly_growth = (freeze_frame(growth) for growth in load_growth_tables(dataset_version))
+    return annual_growth, quarterly_growth, build_growth_index(annual_growth), build_growth_index(quarterly_growth)
+
+def get_entity_growth(growth, growth_index, data_type, name):
+    """Returns one entity's rows of a growth table through its index: a dict lookup, no scan."""
+    positions = growth_index.get((data_type, name))
+    if positions is None:
+        return pd.DataFrame()
+    return growth.take(positions).reset_index(drop=True)
+
+# --- Multi-Entity Comparison ---
+def get_comparison_growth(growth, growth_index, data_type, names, year_range, period_col, growth_col):
+    """
+    Returns (rows, truncated): the growth rows of several entities within `year_range` that have a
+    growth value, taken from the growth table in one slice of their concatenated index positions.
+    If they exceed COMPARISON_MAX_POINTS, only the latest periods that fit are kept.
+    """
+    positions = [growth_index[(data_type, name)] for name in names if (data_type, name) in growth_index]
+    if not positions:
+        return pd.DataFrame(), False
+    df = growth.take(np.concatenate(positions))
+    df = df[(df['Year'] >= year_range[0]) & (df['Year'] <= year_range[1])].dropna(subset=[growth_col])
+    truncated = len(df) > COMPARISON_MAX_POINTS
+    if truncated:
+        periods = np.sort(df[period_col].unique())
+        kept_periods = max(1, COMPARISON_MAX_POINTS // len(positions))
+        df = df[df[period_col] >= periods[-kept_periods]]
+    df = df.sort_values(period_col, kind='stable').reset_index(drop=True)
+    df['Name'] = df['Name'].astype(object)
+    return df, truncated
+
+# --- Top Movers Leaderboard ---
+def build_ranking_index(growth, period_col, metric_cols):
+    """
+    Ranks the Manufacturer rows of a growth table within each period. Returns
+    {metric: {period: row positions}} with each array sorted by the metric, highest first, and rows
+    where the metric is NaN left out. One lexsort per metric ranks every period at once, so a
+    top-N query is a slice of a presorted array.
+    """
+    if growth.empty:
+        return {metric: {} for metric in metric_cols}
+    rows = np.flatnonzero((growth['DataType'] == 'Manufacturer').to_numpy())
+    periods = growth[period_col].to_numpy()[rows]
+    ranking = {}
+    for metric in metric_cols:
+        values = growth[metric].to_numpy(dtype=float)[rows]
+        ranked = ~np.isnan(values)
+        order = np.lexsort((-values[ranked], periods[ranked])) # By period, then metric descending
+        metric_rows, metric_periods = rows[ranked][order], periods[ranked][order]
+        if len(metric_rows) == 0:
+            ranking[metric] = {}
+            continue
+        starts = np.flatnonzero(np.diff(metric_periods)) + 1
+        ranking[metric] = dict(zip(metric_periods[np.r_[0, starts]].tolist(), np.split(metric_rows, starts)))
+    return ranking
+
+@st.cache_resource(max_entries=1)
+def load_ranking_index(dataset_version):
+    """Returns the (annual, quarterly) rankings of the growth tables, built once per dataset version."""
+    annual_growth, quarterly_growth, _, _ = load_growth_engine(dataset_version)
+    return (build_ranking_index(annual_growth, 'Year', ['YoYGrowth', 'Registrations']),
+            build_ranking_index(quarterly_growth, 'QuarterKey', ['QoQGrowth', 'QuarterlyRegistrations']))
+
+def get_leaderboard(growth, ranking, metric, period, n, highest=True):
+    """Returns the `n` manufacturers with the highest (or lowest) `metric` in `period`, with a Rank column."""
+    positions = ranking[metric].get(period, np.array([], dtype=np.intp))
+    positions = positions[:n] if highest else positions[::-1][:n]
+    leaderboard = growth.take(positions).reset_index(drop=True)
+    leaderboard.insert(0, 'Rank', np.arange(1, len(leaderboard) + 1))
+    return leaderboard
+
+# --- Cached Dashboard Artifacts ---
+# Every widget change reruns main_dashboard. Each artifact below is cached on the inputs it depends
+# on, so a rerun only recomputes what the changed widget affects.
+# Table, registrations and previous-period columns behind each growth metric
+GROWTH_COLUMNS = {
+    "YoY Growth": ('YoYGrowth', 'Registrations', 'PrevYearRegistrations'),
+    "QoQ Growth": ('QoQGrowth', 'QuarterlyRegistrations', 'PrevQuarterRegistrations'),
+}
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_year_bounds(dataset_version):
+    """Returns the (min, max) Year across the loaded data, or (None, None) if nothing was loaded."""
+    calendar_data, monthly_data = load_dashboard_data(dataset_version)
+    years = [df['Year'] for df in (calendar_data, monthly_data) if not df.empty and 'Year' in df.columns]
+    if not years:
+        return None, None
+    return int(min(year.min() for year in years)), int(max(year.max() for year in years))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_entity_names(dataset_version, data_type):
+    """
+    Returns the sorted names offered in the entity selectbox: the 2W/3W/4W groups for
+    'Vehicle Category', the manufacturer names otherwise.
+    """
+    calendar_data, monthly_data = load_dashboard_data(dataset_version)
+    names = set()
+    for df in (calendar_data, monthly_data):
+        if not df.empty:
+            names.update(df.loc[df['DataType'] == data_type, 'Name'].unique())
+    if data_type == "Vehicle Category":
+        # Ensure 2W, 3W, 4W are always present if data exists
+        if '2W' not in names and '3W' not in names and '4W' not in names:
+            names.update(['2W', '3W', '4W']) # Add them if no data for these specific categories
+    return sorted(names)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_growth_view(dataset_version, data_type, selected_name, growth_type, year_range):
+    """
+    Returns the selected entity's growth rows within `year_range` as the growth table shows them
+    (QoQ rows need a growth value and get their QuarterYear label), or None if the entity has no
+    growth data at all.
+    """
+    annual_growth, quarterly_growth, annual_index, quarterly_index = load_growth_engine(dataset_version)
+    if growth_type == "YoY Growth":
+        yoy_df = get_entity_growth(annual_growth, annual_index, data_type, selected_name)
+        if yoy_df.empty:
+            return None
+        return yoy_df[(yoy_df['Year'] >= year_range[0]) & (yoy_df['Year'] <= year_range[1])]
+
+    qoq_df = get_entity_growth(quarterly_growth, quarterly_index, data_type, selected_name)
+    if qoq_df.empty:
+        return None
+    display_qoq_df = qoq_df[
+        (qoq_df['Year'] >= year_range[0]) &
+        (qoq_df['Year'] <= year_range[1])
+    ].dropna(subset=['QoQGrowth']).copy()
+    display_qoq_df['QuarterYear'] = format_quarter_labels(display_qoq_df['QuarterKey'])
+    return display_qoq_df
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def build_growth_figure(dataset_version, data_type, selected_name, growth_type, year_range):
+    """Returns the growth trend figure for one selection."""
+    display_df = get_growth_view(dataset_version, data_type, selected_name, growth_type, year_range)
+    if growth_type == "YoY Growth":
+        fig = px.line(display_df,
+                      x='Year',
+                      y='YoYGrowth',
+                      title=f"YoY Growth for {selected_name}",
+                      labels={'YoYGrowth': 'YoY Growth (%)', 'Year': 'Year'},
+                      markers=True)
+    else:
+        # Plot in quarter key order, labelled by QuarterYear
+        fig = px.line(display_df.sort_values('QuarterKey'),
+                      x='QuarterYear',
+                      y='QoQGrowth',
+                      title=f"QoQ Growth for {selected_name}",
+                      labels={'QoQGrowth': 'QoQ Growth (%)', 'QuarterYear': 'Quarter'},
+                      markers=True)
+    fig.update_traces(mode='lines+markers')
+    return fig
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def build_comparison_figure(dataset_version, data_type, names, growth_type, year_range):
+    """Returns (figure, truncated) for the comparison chart of `names`, with figure None if they have no data."""
+    annual_growth, quarterly_growth, annual_index, quarterly_index = load_growth_engine(dataset_version)
+    if growth_type == "YoY Growth":
+        comparison_df, truncated = get_comparison_growth(annual_growth, annual_index, data_type, names, year_range, 'Year', 'YoYGrowth')
+        x_col, y_col, category_orders = 'Year', 'YoYGrowth', {}
+    else:
+        comparison_df, truncated = get_comparison_growth(quarterly_growth, quarterly_index, data_type, names, year_range, 'QuarterKey', 'QoQGrowth')
+        x_col, y_col = 'QuarterYear', 'QoQGrowth'
+        if not comparison_df.empty:
+            comparison_df['QuarterYear'] = format_quarter_labels(comparison_df['QuarterKey'])
+        category_orders = {'QuarterYear': comparison_df['QuarterYear'].unique().tolist()} if not comparison_df.empty else {}
+    if comparison_df.empty:
+        return None, False
+    fig = px.line(comparison_df,
+                  x=x_col,
+                  y=y_col,
+                  color='Name',
+                  title=f"{growth_type} Comparison",
+                  labels={y_col: f"{growth_type} (%)", 'QuarterYear': 'Quarter', 'Name': data_type},
+                  category_orders=category_orders,
+                  markers=True)
+    return fig, truncated
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_leaderboard_periods(dataset_version, growth_type, year_range):
+    """Returns {period: label} for the periods within `year_range` the leaderboard can rank, oldest first."""
+    annual_ranking, quarterly_ranking = load_ranking_index(dataset_version)
+    if growth_type == "YoY Growth":
+        periods = [year for year in sorted(annual_ranking['Registrations']) if year_range[0] <= year <= year_range[1]]
+        return {year: str(year) for year in periods}
+    periods = [key for key in sorted(quarterly_ranking['QuarterlyRegistrations']) if year_range[0] <= PERIOD_EPOCH_YEAR + key // 4 <= year_range[1]]
+    return dict(zip(periods, format_quarter_labels(pd.Series(periods, dtype='int64')).tolist()))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_leaderboard_view(dataset_version, growth_type, period, rank_by_growth, n, highest):
+    """Returns the leaderboard table for one selection of period, ranking metric, size and direction."""
+    annual_growth, quarterly_growth, _, _ = load_growth_engine(dataset_version)
+    annual_ranking, quarterly_ranking = load_ranking_index(dataset_version)
+    growth_col, value_col, prev_col = GROWTH_COLUMNS[growth_type]
+    growth, ranking = (annual_growth, annual_ranking) if growth_type == "YoY Growth" else (quarterly_growth, quarterly_ranking)
+    leaderboard = get_leaderboard(growth, ranking, growth_col if rank_by_growth else value_col, period, n, highest=highest)
+    return leaderboard[['Rank', 'Name', value_col, prev_col, growth_col]]
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_dataset_previews(dataset_version, rows=5):
+    """Returns the first rows of the annual and monthly data, with vehicle categories mapped, for the previews."""
+    calendar_data, monthly_data = load_dashboard_data(dataset_version)
+    return calendar_data.head(rows), monthly_data.head(rows)
+
 # --- 5. Streamlit Dashboard ---
 def main_dashboard():
     st.set_page_config(layout="wide", page_title="Vehicle Registration Dashboard 🚗📈")
@@ -236,20 +755,14 @@ def main_dashboard():
     """)
     st.markdown("---")
 
-    # Load and preprocess data
-    calendar_data, monthly_data = load_and_preprocess_data()
+    # The dataset version keys every cached artifact below, so new CSVs invalidate them
+    dataset_version = get_dataset_version()
+    min_year_db, max_year_db = get_year_bounds(dataset_version)
 
-    if calendar_data.empty and monthly_data.empty:
+    if min_year_db is None:
         st.error("No data loaded. Please ensure CSV files are in the 'vahan_data' directory and follow the expected naming conventions.")
         st.stop() # Stop execution if no data is found
 
-    # Apply vehicle category mapping to the original dataframes for filtering
-    if not calendar_data.empty and 'Name' in calendar_data.columns and 'Vehicle Category' in calendar_data['DataType'].unique():
-        calendar_data.loc[calendar_data['DataType'] == 'Vehicle Category', 'Name'] = calendar_data[calendar_data['DataType'] == 'Vehicle Category']['Name'].apply(map_vehicle_category)
-    
-    if not monthly_data.empty and 'Name' in monthly_data.columns and 'Vehicle Category' in monthly_data['DataType'].unique():
-        monthly_data.loc[monthly_data['DataType'] == 'Vehicle Category', 'Name'] = monthly_data[monthly_data['DataType'] == 'Vehicle Category']['Name'].apply(map_vehicle_category)
-
     # --- Sidebar Filters ---
     st.sidebar.header("⚙️ Dashboard Controls")
 
@@ -268,22 +781,7 @@ def main_dashboard():
     st.sidebar.markdown("---")
 
     # Dynamic filter for Name (Vehicle Category Group or Manufacturer Name)
-    unique_names = []
-    if data_type_filter == "Vehicle Category":
-        if not calendar_data.empty:
-            unique_names.extend(calendar_data[calendar_data['DataType'] == 'Vehicle Category']['Name'].unique())
-        if not monthly_data.empty:
-            unique_names.extend(monthly_data[monthly_data['DataType'] == 'Vehicle Category']['Name'].unique())
-        # Ensure 2W, 3W, 4W are always present if data exists
-        if '2W' not in unique_names and '3W' not in unique_names and '4W' not in unique_names:
-             unique_names.extend(['2W', '3W', '4W']) # Add them if no data for these specific categories
-    else: # Manufacturer
-        if not calendar_data.empty:
-            unique_names.extend(calendar_data[calendar_data['DataType'] == 'Manufacturer']['Name'].unique())
-        if not monthly_data.empty:
-            unique_names.extend(monthly_data[monthly_data['DataType'] == 'Manufacturer']['Name'].unique())
-    
-    unique_names = sorted(list(set(unique_names)))
+    unique_names = get_entity_names(dataset_version, data_type_filter)
     
     if not unique_names:
         st.warning("No names (categories/manufacturers) found in the loaded data for filtering.")
@@ -297,15 +795,8 @@ def main_dashboard():
     st.sidebar.markdown("---")
 
     # Date Range Selection
-    min_year_data = pd.Timestamp.now().year # Default min to current year
-    max_year_data = pd.Timestamp.now().year # Default max to current year
-    
-    if not calendar_data.empty and 'Year' in calendar_data.columns:
-        min_year_data = min(min_year_data, calendar_data['Year'].min())
-        max_year_data = max(max_year_data, calendar_data['Year'].max())
-    if not monthly_data.empty and 'Year' in monthly_data.columns:
-        min_year_data = min(min_year_data, monthly_data['Year'].min())
-        max_year_data = max(max_year_data, monthly_data['Year'].max())
+    min_year_data = min(pd.Timestamp.now().year, min_year_db) # Include the current year
+    max_year_data = max(pd.Timestamp.now().year, max_year_db)
 
     year_range = st.sidebar.slider(
         "Select Year Range:",
@@ -321,33 +812,16 @@ def main_dashboard():
 
     insight_message = ""
     if growth_type_filter == "YoY Growth":
-        # Filter annual data for the selected type and name
-        filtered_annual_data = calendar_data[
-            (calendar_data['DataType'] == data_type_filter) &
-            (calendar_data['Name'] == selected_name)
-        ].copy()
-
-        yoy_df = calculate_yoy_growth(filtered_annual_data)
+        # The selected entity's precomputed YoY growth within the year range
+        display_yoy_df = get_growth_view(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range)
         
-        if not yoy_df.empty:
-            display_yoy_df = yoy_df[
-                (yoy_df['Year'] >= year_range[0]) & 
-                (yoy_df['Year'] <= year_range[1])
-            ]
-            
+        if display_yoy_df is not None:
             if not display_yoy_df.empty:
                 st.subheader("Year-over-Year Growth Table")
                 st.dataframe(display_yoy_df[['Year', 'Registrations', 'PrevYearRegistrations', 'YoYGrowth']].set_index('Year').style.format({"Registrations": "{:,.0f}", "PrevYearRegistrations": "{:,.0f}", "YoYGrowth": "{:.2f}%"}))
 
                 st.subheader("Year-over-Year Growth Trend")
-                fig_yoy = px.line(display_yoy_df, 
-                                x='Year', 
-                                y='YoYGrowth', 
-                                title=f"YoY Growth for {selected_name}",
-                                labels={'YoYGrowth': 'YoY Growth (%)', 'Year': 'Year'},
-                                markers=True)
-                fig_yoy.update_traces(mode='lines+markers')
-                st.plotly_chart(fig_yoy, use_container_width=True)
+                st.plotly_chart(build_growth_figure(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range), use_container_width=True)
                 
                 st.info(f"YoY Growth is calculated as ((Current Year Registrations - Previous Year Registrations) / Previous Year Registrations) * 100.")
                 
@@ -374,34 +848,16 @@ def main_dashboard():
             st.warning("YoY growth data could not be computed. Please check the raw data and filters.")
     
     elif growth_type_filter == "QoQ Growth":
-        # Filter monthly data for the selected type and name
-        filtered_monthly_data = monthly_data[
-            (monthly_data['DataType'] == data_type_filter) &
-            (monthly_data['Name'] == selected_name)
-        ].copy()
-
-        qoq_df = calculate_qoq_growth(filtered_monthly_data)
+        # The selected entity's precomputed QoQ growth within the year range
+        display_qoq_df = get_growth_view(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range)
         
-        if not qoq_df.empty:
-            display_qoq_df = qoq_df[
-                (qoq_df['Year'] >= year_range[0]) & 
-                (qoq_df['Year'] <= year_range[1])
-            ].dropna(subset=['QoQGrowth'])
-            
+        if display_qoq_df is not None:
             if not display_qoq_df.empty:
                 st.subheader("Quarter-over-Quarter Growth Table")
                 st.dataframe(display_qoq_df[['QuarterYear', 'QuarterlyRegistrations', 'PrevQuarterRegistrations', 'QoQGrowth']].set_index('QuarterYear').style.format({"QuarterlyRegistrations": "{:,.0f}", "PrevQuarterRegistrations": "{:,.0f}", "QoQGrowth": "{:.2f}%"}))
 
                 st.subheader("Quarter-over-Quarter Growth Trend")
-                # Ensure QuarterYear is sortable for plotting
-                fig_qoq = px.line(display_qoq_df.sort_values('QuarterYear'), 
-                                x='QuarterYear', 
-                                y='QoQGrowth', 
-                                title=f"QoQ Growth for {selected_name}",
-                                labels={'QoQGrowth': 'QoQ Growth (%)', 'QuarterYear': 'Quarter'},
-                                markers=True)
-                fig_qoq.update_traces(mode='lines+markers')
-                st.plotly_chart(fig_qoq, use_container_width=True)
+                st.plotly_chart(build_growth_figure(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range), use_container_width=True)
 
                 st.info(f"QoQ Growth is calculated as ((Current Quarter Registrations - Previous Quarter Registrations) / Previous Quarter Registrations) * 100.")
 
@@ -434,15 +890,56 @@ def main_dashboard():
     else:
         st.write("Select a data type, entity, and growth metric to generate insights. Ensure sufficient data is available for the selected period.")
 
+    # --- Multi-Entity Comparison ---
+    st.markdown("---")
+    st.subheader(f"📊 {growth_type_filter} Comparison")
+    compare_names = st.multiselect(
+        f"Select up to {COMPARISON_MAX_ENTITIES} entries to compare:",
+        unique_names,
+        default=[selected_name],
+        max_selections=COMPARISON_MAX_ENTITIES,
+        help="Each selected entry is drawn as one line of the same chart."
+    )
+    if compare_names:
+        fig_compare, truncated = build_comparison_figure(dataset_version, data_type_filter, tuple(compare_names), growth_type_filter, year_range)
+        if fig_compare is not None:
+            st.plotly_chart(fig_compare, use_container_width=True)
+            if truncated:
+                st.caption(f"Only the latest periods are shown, to keep the chart under {COMPARISON_MAX_POINTS} points.")
+        else:
+            st.info(f"No {growth_type_filter} data for the selected entries in the selected year range ({year_range[0]}-{year_range[1]}).")
+
+    # --- Top Movers Leaderboard ---
+    st.markdown("---")
+    st.subheader(f"🏆 Top Movers: Manufacturers by {growth_type_filter}")
+    period_labels = get_leaderboard_periods(dataset_version, growth_type_filter, year_range)
+    if period_labels:
+        periods = list(period_labels)
+        col1, col2, col3, col4 = st.columns(4)
+        period = col1.selectbox("Period:", periods, index=len(periods) - 1, format_func=period_labels.get)
+        rank_by = col2.radio("Rank by:", [growth_type_filter, "Registrations"], horizontal=True)
+        direction = col3.radio("Show:", ["Highest", "Lowest"], horizontal=True)
+        top_n = col4.number_input("Manufacturers:", min_value=1, max_value=500, value=LEADERBOARD_SIZE, step=5)
+
+        leaderboard = get_leaderboard_view(dataset_version, growth_type_filter, period, rank_by == growth_type_filter, int(top_n), direction == "Highest")
+        if not leaderboard.empty:
+            growth_col, value_col, prev_col = GROWTH_COLUMNS[growth_type_filter]
+            st.dataframe(leaderboard.set_index('Rank').style.format({value_col: "{:,.0f}", prev_col: "{:,.0f}", growth_col: "{:.2f}%"}, na_rep="-"))
+        else:
+            st.info(f"No manufacturer has {rank_by} data for {period_labels[period]}.")
+    else:
+        st.info(f"No manufacturer growth data in the selected year range ({year_range[0]}-{year_range[1]}).")
+
     st.markdown("---")
     st.subheader("Dataset Previews")
+    calendar_preview, monthly_preview = get_dataset_previews(dataset_version)
     col1, col2 = st.columns(2)
     with col1:
         st.write("#### Annual Data (for YoY)")
-        st.dataframe(calendar_data.head())
+        st.dataframe(calendar_preview)
     with col2:
         st.write("#### Monthly Data (for QoQ)")
-        st.dataframe(monthly_data.head())
+        st.dataframe(monthly_preview)
 
 if __name__ == "__main__":
     main_dashboard()
@@ -8,30 +8,52 @@ from selenium.webdriver.edge.service import Service as EdgeService
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service as ChromeService
 from webdriver_manager.microsoft import EdgeChromiumDriverManager
-import time
 from datetime import datetime
 import io
+import sqlite3 # The crawl ledger
+import argparse
+import hashlib # Content hashes of the scraped tables
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The shared vahan_crawl module lives in the repository root
+from vahan_crawl import LOCATORS, WAIT_TIMEOUT, OPEN_YEARS, get_panel_state, wait_until_settled, print_wait_report
+from vahan_crawl import build_scrape_jobs, create_crawl_ledger, plan_crawl_jobs, update_crawl_job
 
 # --- Configuration ---
 VAHAN_DASHBOARD_URL = "https://vahan.parivahan.gov.in/vahan4dashboard/vahan/view/reportview.xhtml"
 OUTPUT_DIR = "vahan_data"
 HTML_BACKUP_DIR = "html_backups"
 BROWSER = "edge"
-WAIT_TIMEOUT = 30
-SLEEP_AFTER_ACTION = 3
-
-# XPath Locators
-LOCATORS = {
-    "y_axis_dropdown_id": "yaxisVar",
-    "x_axis_dropdown_id": "xaxisVar",
-    "year_type_dropdown_id": "selectedYearType",
-    "single_select_year_dropdown_id": "selectedYear",
-    "multi_select_year_dropdown_id": "yearList",
-    "refresh_button": (By.XPATH, "//button[contains(@class, 'ui-button') and .//span[contains(@class, 'ui-icon-refresh')]]"),
-    "main_table_panel_id": "combTablePnl",
-    "loading_overlay_blocker": (By.ID, "j_idt132_blocker"),
-    "dropdown_options": (By.XPATH, ".//ul[contains(@class, 'ui-selectonemenu-list')]/li[contains(@class, 'ui-selectonemenu-item')]")
-}
+LEDGER_DB_FILE = "crawl_jobs.db" # SQLite ledger of the crawl's jobs, so a rerun resumes the unfinished ones
+TARGET_Y_AXIS_OPTIONS = ["Maker"]
+TARGET_X_AXIS_OPTIONS = ["Calendar Year"]
+REFRESH_CLOSED_YEARS = False # Fetch closed years the ledger has done again too (see --refresh-closed-years)
+
+# --- Crawl Ledger (resumable crawl) ---
+def initialize_ledger():
+    """Creates the crawl_jobs ledger (see create_crawl_ledger) in LEDGER_DB_FILE."""
+    conn = sqlite3.connect(LEDGER_DB_FILE)
+    create_crawl_ledger(conn)
+    conn.commit()
+    conn.close()
+
+def record_crawl_job(job, status, row_count=None, error=None):
+    """Sets a job's status in the ledger kept in LEDGER_DB_FILE, see update_crawl_job."""
+    update_crawl_job(LEDGER_DB_FILE, job, status, row_count, error)
+
+def run_crawl_job(job, scrape):
+    """
+    Runs one ledger job: `scrape()` scrapes it and returns the saved DataFrame, and the job is
+    recorded as done with its row count, or as failed if nothing was saved. An exception is
+    recorded and re-raised. Returns the number of rows saved.
+    """
+    record_crawl_job(job, 'running')
+    try:
+        row_count = len(scrape())
+    except Exception as e:
+        record_crawl_job(job, 'failed', 0, str(e))
+        raise
+    record_crawl_job(job, 'done' if row_count else 'failed', row_count, None if row_count else "No rows scraped")
+    return row_count
 
 def setup_driver(browser_name):
     """
@@ -81,7 +103,7 @@ def get_dropdown_options(driver, dropdown_parent_id, dropdown_name):
             message=f"{dropdown_name} dropdown trigger (ID: {dropdown_parent_id}) is not clickable."
         )
         dropdown_trigger_element.click()
-        time.sleep(SLEEP_AFTER_ACTION)
+        wait_until_settled(driver, "open dropdown")
 
         specific_dropdown_panel_locator = (By.ID, f"{dropdown_parent_id}_panel")
 
@@ -118,11 +140,11 @@ def get_dropdown_options(driver, dropdown_parent_id, dropdown_name):
                     EC.invisibility_of_element_located(specific_dropdown_panel_locator),
                     message=f"{dropdown_name} dropdown panel did not become invisible after closing."
                 )
-                time.sleep(SLEEP_AFTER_ACTION)
+                wait_until_settled(driver, "close dropdown")
             except Exception as e:
                 print(f"Warning: Panel invisibility check failed for {dropdown_name}. Error: {e}")
                 driver.find_element(By.TAG_NAME, "body").click()
-                time.sleep(SLEEP_AFTER_ACTION)
+                wait_until_settled(driver, "close dropdown")
         
         return option_texts
     except Exception as e:
@@ -142,7 +164,7 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
             message=f"{dropdown_name} dropdown trigger is not clickable."
         )
         dropdown_trigger_element.click()
-        time.sleep(SLEEP_AFTER_ACTION)
+        wait_until_settled(driver, "open dropdown")
 
         specific_dropdown_panel_locator = (By.ID, f"{dropdown_parent_id}_panel")
         panel = WebDriverWait(driver, WAIT_TIMEOUT).until(
@@ -170,7 +192,7 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
             
             driver.execute_script("arguments[0].scrollIntoView(true);", option_to_click)
             option_to_click.click()
-            time.sleep(1)
+            wait_until_settled(driver, "select option", fixed_delay=1)
 
         if dropdown_parent_id == LOCATORS["multi_select_year_dropdown_id"]:
             try:
@@ -189,20 +211,26 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
                 EC.invisibility_of_element_located(specific_dropdown_panel_locator),
                 message=f"{dropdown_name} dropdown panel did not become invisible after closing."
             )
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "close dropdown")
         except Exception as e:
             print(f"Warning: Panel invisibility check failed for {dropdown_name}. Error: {e}")
             driver.find_element(By.TAG_NAME, "body").click()
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "close dropdown")
         print(f"Successfully selected '{option_text}' in {dropdown_name}.")
         return True
     except Exception as e:
         print(f"Error while selecting '{option_text}' in {dropdown_name}: {e}")
         return False
 
+def file_content_hash(filepath):
+    """Returns the SHA-256 of a file's bytes."""
+    with open(filepath, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
 def scrape_table_data(driver, combination_name):
     """
-    Scrapes the data table from the page and saves it to a CSV file.
+    Scrapes the data table from the page and saves it to a CSV file, unless the file already holds
+    the same content.
     """
     try:
         WebDriverWait(driver, WAIT_TIMEOUT).until(
@@ -210,7 +238,7 @@ def scrape_table_data(driver, combination_name):
             message="Loading overlay did not disappear."
         )
         print("Loading overlay disappeared.")
-        time.sleep(1)
+        wait_until_settled(driver, "table ready", fixed_delay=1)
 
         main_table_container_id = ""
         try:
@@ -261,7 +289,13 @@ def scrape_table_data(driver, combination_name):
 
                 safe_combination_name = "".join([c if c.isalnum() else "_" for c in combination_name])
                 output_filename = os.path.join(OUTPUT_DIR, f"{safe_combination_name}.csv")
-                data_df.to_csv(output_filename, index=False, encoding='utf-8')
+                csv_text = data_df.to_csv(index=False)
+                # An unchanged table keeps its file (and mtime), so migrate_csv_to_sql.py --incremental skips it
+                if os.path.exists(output_filename) and file_content_hash(output_filename) == hashlib.sha256(csv_text.encode('utf-8')).hexdigest():
+                    print(f"Data unchanged: {output_filename}")
+                    return data_df
+                with open(output_filename, "w", encoding="utf-8", newline="") as f:
+                    f.write(csv_text)
                 print(f"Data saved: {output_filename}")
                 return data_df
             else:
@@ -277,11 +311,12 @@ def scrape_table_data(driver, combination_name):
 def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id):
     """
     Selects a single year from a multi-select dropdown, scrapes the data, and then unselects it.
+    Returns the saved DataFrame, empty if nothing was scraped.
     """
     try:
         # Select the specific year
         if not select_dropdown_option(driver, active_year_dropdown_id, year_to_scrape, "Year"):
-            return
+            return pd.DataFrame()
 
         combination_name = f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}"
         print(f"\nProcessing combination: {combination_name}")
@@ -291,21 +326,23 @@ def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_optio
                 EC.element_to_be_clickable(LOCATORS["refresh_button"]),
                 message="Refresh button is not clickable."
             )
+            panel_state = get_panel_state(driver) # To detect when the refreshed table has arrived
             refresh_button.click()
             WebDriverWait(driver, WAIT_TIMEOUT).until(
                 EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
                 message="Loading overlay did not disappear after refresh."
             )
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "refresh table", panel_state=panel_state)
             print("Refresh button clicked and page reloaded.")
         except Exception as e:
             print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping to next year.")
-            return
+            return pd.DataFrame()
 
         save_html_backup(driver, f"{combination_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-        scrape_table_data(driver, combination_name)
+        return scrape_table_data(driver, combination_name)
     except Exception as e:
         print(f"An error occurred while processing year {year_to_scrape}: {e}")
+        return pd.DataFrame()
     finally:
         # Unselect the year after scraping is complete
         try:
@@ -315,23 +352,57 @@ def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_optio
                 EC.element_to_be_clickable(dropdown_trigger_locator)
             )
             dropdown_trigger_element.click()
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "unselect year")
             
             year_label_locator = (By.XPATH, f"//div[@id='{active_year_dropdown_id}_panel']//li/label[text()='{year_to_scrape}']")
             year_label_element = WebDriverWait(driver, WAIT_TIMEOUT).until(
                 EC.element_to_be_clickable(year_label_locator)
             )
             year_label_element.click()
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "unselect year")
 
             dropdown_trigger_element.click()
             print(f"Successfully unselected year {year_to_scrape}.")
         except Exception as e:
             print(f"Error unselecting year {year_to_scrape}: {e}")
 
-def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option):
+def scrape_month_wise_year(driver, year_to_scrape, y_axis_option, x_axis_option):
     """
-    Handles single-select year iteration for the 'Month Wise' X-axis.
+    Selects one year in the single-select Year dropdown, refreshes the table and scrapes it.
+    Returns the saved DataFrame, empty if nothing was scraped.
+    """
+    # Select the specific year from the single-select dropdown
+    if not select_dropdown_option(driver, LOCATORS["single_select_year_dropdown_id"], year_to_scrape, "Year"):
+        return pd.DataFrame()
+
+    combination_name = f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}"
+    print(f"\nProcessing combination: {combination_name}")
+
+    try:
+        refresh_button = WebDriverWait(driver, WAIT_TIMEOUT).until(
+            EC.element_to_be_clickable(LOCATORS["refresh_button"]),
+            message="Refresh button is not clickable."
+        )
+        panel_state = get_panel_state(driver) # To detect when the refreshed table has arrived
+        refresh_button.click()
+        WebDriverWait(driver, WAIT_TIMEOUT).until(
+            EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
+            message="Loading overlay did not disappear after refresh."
+        )
+        wait_until_settled(driver, "refresh table", panel_state=panel_state)
+        print("Refresh button clicked and page reloaded.")
+    except Exception as e:
+        print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping to next year.")
+        return pd.DataFrame()
+
+    save_html_backup(driver, f"{combination_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+    return scrape_table_data(driver, combination_name)
+    # No need to unselect for a single-select dropdown, as the next selection will overwrite it.
+
+def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option, target_years):
+    """
+    Handles single-select year iteration for the 'Month Wise' X-axis, over `target_years` (the
+    years the freshness policy fetches), recording each in the ledger.
     """
     active_year_dropdown_id = LOCATORS["single_select_year_dropdown_id"]
     print(f"Detected single-select Year dropdown: {active_year_dropdown_id}")
@@ -341,8 +412,6 @@ def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option):
         print("No year options available. Skipping year iteration.")
         return
 
-    # Define the years you want to scrape
-    target_years = ["2025", "2024", "2023", "2022", "2021", "2020", "2019", "2018", "2017", "2016"]
     relevant_year_options = [opt for opt in fetched_year_options if opt in target_years]
 
     if not relevant_year_options:
@@ -351,36 +420,13 @@ def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option):
 
     # Iterate through each year, select it, and scrape the data
     for year_to_scrape in relevant_year_options:
-        # Select the specific year from the single-select dropdown
-        if not select_dropdown_option(driver, active_year_dropdown_id, year_to_scrape, "Year"):
-            continue
+        run_crawl_job((y_axis_option, x_axis_option, year_to_scrape),
+                      lambda: scrape_month_wise_year(driver, year_to_scrape, y_axis_option, x_axis_option))
 
-        combination_name = f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}"
-        print(f"\nProcessing combination: {combination_name}")
-
-        try:
-            refresh_button = WebDriverWait(driver, WAIT_TIMEOUT).until(
-                EC.element_to_be_clickable(LOCATORS["refresh_button"]),
-                message="Refresh button is not clickable."
-            )
-            refresh_button.click()
-            WebDriverWait(driver, WAIT_TIMEOUT).until(
-                EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
-                message="Loading overlay did not disappear after refresh."
-            )
-            time.sleep(SLEEP_AFTER_ACTION)
-            print("Refresh button clicked and page reloaded.")
-        except Exception as e:
-            print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping to next year.")
-            continue
-
-        save_html_backup(driver, f"{combination_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-        scrape_table_data(driver, combination_name)
-        # No need to unselect for a single-select dropdown, as the next selection will overwrite it.
-
-def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
+def handle_year_selection_calendar(driver, x_axis_option, y_axis_option, target_years):
     """
-    Handles multi-select year iteration for the 'Calendar Year' X-axis.
+    Handles multi-select year iteration for the 'Calendar Year' X-axis, over `target_years` (the
+    years the freshness policy fetches), recording each in the ledger.
     """
     active_year_dropdown_id = LOCATORS["multi_select_year_dropdown_id"]
     print(f"Detected multi-select Year dropdown: {active_year_dropdown_id}")
@@ -390,7 +436,6 @@ def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
         print("No year options available. Skipping year iteration.")
         return
 
-    target_years = ["2025", "2024", "2023", "2022", "2021", "2020", "2019", "2018", "2017", "2016"]
     relevant_year_options = [opt for opt in fetched_year_options if opt in target_years]
 
     if not relevant_year_options:
@@ -399,7 +444,8 @@ def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
 
     # Iterate through each year and select it one-by-one for scraping
     for year_to_scrape in relevant_year_options:
-        select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id)
+        run_crawl_job((y_axis_option, x_axis_option, year_to_scrape),
+                      lambda: select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id))
         
         # After a year is scraped and unselected, we need to ensure the dropdown is closed
         try:
@@ -409,9 +455,17 @@ def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
         except:
             pass # Panel is already closed, or we can move on
 
-def main():
+def main(refresh_closed_years=REFRESH_CLOSED_YEARS):
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     os.makedirs(HTML_BACKUP_DIR, exist_ok=True)
+    initialize_ledger()
+
+    # Open years, plus the closed years the ledger does not have done, so a rerun resumes where the last one stopped
+    pending_jobs = plan_crawl_jobs(LEDGER_DB_FILE, build_scrape_jobs(TARGET_Y_AXIS_OPTIONS, TARGET_X_AXIS_OPTIONS), refresh_closed_years)
+    if not pending_jobs:
+        print("Nothing to fetch.")
+        return
+
     driver = setup_driver(BROWSER)
     if not driver:
         return
@@ -423,11 +477,11 @@ def main():
             EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
             message="Initial loading overlay did not disappear."
         )
-        time.sleep(SLEEP_AFTER_ACTION)
+        wait_until_settled(driver, "initial load")
         save_html_backup(driver, f"initial_page_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
 
-        target_y_axis_options = ["Maker"]
-        target_x_axis_options = ["Calendar Year"]
+        target_y_axis_options = TARGET_Y_AXIS_OPTIONS
+        target_x_axis_options = TARGET_X_AXIS_OPTIONS
         
         y_axis_options_available = get_dropdown_options(driver, LOCATORS["y_axis_dropdown_id"], "Y-Axis")
         if not y_axis_options_available:
@@ -435,6 +489,9 @@ def main():
             return
 
         for y_axis_option in target_y_axis_options:
+            if not any(job[0] == y_axis_option for job in pending_jobs):
+                print(f"Nothing to fetch for Y-Axis '{y_axis_option}'. Skipping.")
+                continue
             if y_axis_option not in y_axis_options_available:
                 print(f"Y-Axis option '{y_axis_option}' not available. Skipping.")
                 continue
@@ -450,15 +507,19 @@ def main():
                 continue
 
             for x_axis_option in relevant_x_axis_options:
+                pending_years = [year for y, x, year in pending_jobs if (y, x) == (y_axis_option, x_axis_option)]
+                if not pending_years and x_axis_option in ("Calendar Year", "Month Wise"):
+                    print(f"Nothing to fetch for {y_axis_option} / {x_axis_option}. Skipping.")
+                    continue
                 if not select_dropdown_option(driver, LOCATORS["x_axis_dropdown_id"], x_axis_option, "X-Axis"):
                     continue
 
                 if x_axis_option == "Calendar Year":
                     # For Calendar Year, use the multi-select handler
-                    handle_year_selection_calendar(driver, x_axis_option, y_axis_option)
+                    handle_year_selection_calendar(driver, x_axis_option, y_axis_option, pending_years)
                 elif x_axis_option == "Month Wise":
                     # For Month Wise, use the single-select handler
-                    handle_year_selection_month_wise(driver, x_axis_option, y_axis_option)
+                    handle_year_selection_month_wise(driver, x_axis_option, y_axis_option, pending_years)
                 else:
                     # Generic case for other X-axis options
                     combination_name = f"Y_{y_axis_option}_X_{x_axis_option}"
@@ -469,12 +530,13 @@ def main():
                             EC.element_to_be_clickable(LOCATORS["refresh_button"]),
                             message="Refresh button is not clickable."
                         )
+                        panel_state = get_panel_state(driver) # To detect when the refreshed table has arrived
                         refresh_button.click()
                         WebDriverWait(driver, WAIT_TIMEOUT).until(
                             EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
                             message="Loading overlay did not disappear after refresh."
                         )
-                        time.sleep(SLEEP_AFTER_ACTION)
+                        wait_until_settled(driver, "refresh table", panel_state=panel_state)
                         print("Refresh button clicked and page reloaded.")
                     except Exception as e:
                         print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping.")
@@ -489,6 +551,11 @@ def main():
         if driver:
             driver.quit()
             print("Driver closed.")
+        print_wait_report()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scrape the Vahan dashboard into CSV files: the open years, and the closed years the crawl ledger does not have done.")
+    parser.add_argument("--refresh-closed-years", action="store_true", default=REFRESH_CLOSED_YEARS,
+                        help=f"Also fetch the closed years (older than the last {OPEN_YEARS}) that are done; files that did not change are still not rewritten.")
+    args = parser.parse_args()
+    main(refresh_closed_years=args.refresh_closed_years)
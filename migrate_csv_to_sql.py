@@ -4,208 +4,814 @@ import os
 import pandas as pd
 import sqlite3
 import re
+import hashlib
+import argparse
+import time
 from datetime import datetime
+from sql_based_investor_dashboard.vahan_growth import DASHBOARD_INDEXES, GROWTH_INDEXES, get_storage_mode
+from sql_based_investor_dashboard.vahan_growth import create_category_map, update_category_map, create_growth_tables, refresh_growth_tables
 
 # --- Configuration ---
 DATA_DIR = "vahan_data" # Directory where your existing CSVs are located
 DB_FILE = "vahan_data.db" # Name for your SQLite database file
+# 'flat': one wide table per granularity; 'normalized': integer-keyed fact tables behind views with the same names (see --storage)
+STORAGE_MODE = "flat"
+
+# PRAGMAs applied for the duration of a bulk load (a bulk load rebuilds the tables from scratch,
+# so a crash mid-load only costs a re-run)
+BULK_LOAD_PRAGMAS = {
+    "journal_mode": "MEMORY",
+    "synchronous": "OFF",
+    "cache_size": -262144, # Negative = KiB, i.e. a 256 MiB page cache
+    "temp_store": "MEMORY",
+}
+
+# Normalized storage mode: period indexes so the year bounds are one lookup at each end instead of a pass over the facts
+NORMALIZED_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_fact_annual_period ON fact_annual (PeriodId);',
+    'CREATE INDEX IF NOT EXISTS idx_fact_monthly_period ON fact_monthly (PeriodId);',
+]
+
+# Representative queries issued by sql_app.py (see build_registrations_query there), as (label, sql, params)
+DASHBOARD_QUERIES = [
+    ("Entity names for a data type",
+     "SELECT Name FROM annual_registrations WHERE DataType = ? UNION SELECT Name FROM monthly_registrations WHERE DataType = ?",
+     ("Manufacturer", "Manufacturer")),
+    ("Year bounds",
+     "SELECT MIN(Year) FROM annual_registrations", ()),
+    ("Annual rows for entities in a year range",
+     "SELECT Name, DataType, Year, Registrations FROM annual_registrations WHERE DataType = ? AND Name IN (?, ?) "
+     "AND Year >= COALESCE((SELECT MAX(Year) FROM annual_registrations WHERE DataType = ? AND Year < ? AND Name IN (?, ?)), ?) AND Year <= ?",
+     ("Manufacturer", "HERO MOTOCORP LTD", "HONDA CARS INDIA LTD", "Manufacturer", 2020, "HERO MOTOCORP LTD", "HONDA CARS INDIA LTD", 2020, 2024)),
+    ("Monthly rows for entities in a year range",
+     "SELECT Name, DataType, Year, Month, MonthlyRegistrations FROM monthly_registrations WHERE DataType = ? AND Name IN (?, ?) "
+     "AND Year >= COALESCE((SELECT MAX(Year) FROM monthly_registrations WHERE DataType = ? AND Year < ? AND Name IN (?, ?)), ?) AND Year <= ?",
+     ("Manufacturer", "HERO MOTOCORP LTD", "HONDA CARS INDIA LTD", "Manufacturer", 2020, "HERO MOTOCORP LTD", "HONDA CARS INDIA LTD", 2020, 2024)),
+]
+# Leaderboard queries issued by sql_app.py (see read_materialized_leaderboard there), as (label, sql, params);
+# both storage modes read them from the growth tables, which have to serve them from GROWTH_INDEXES without a sort
+LEADERBOARD_QUERIES = [
+    ("Top YoY gainers in a year",
+     "SELECT MappedName, Year, Registrations, PrevYearRegistrations, YoYGrowth FROM annual_growth "
+     "WHERE DataType = 'Manufacturer' AND Year = ? AND YoYGrowth IS NOT NULL ORDER BY YoYGrowth DESC, MappedName LIMIT ?",
+     (2024, 20)),
+    ("Bottom QoQ movers by registrations in a quarter",
+     "SELECT MappedName, Year, QuarterlyRegistrations, PrevQuarterRegistrations, QoQGrowth FROM quarterly_growth "
+     "WHERE DataType = 'Manufacturer' AND Year = ? AND Quarter = ? AND QuarterlyRegistrations IS NOT NULL "
+     "ORDER BY QuarterlyRegistrations ASC, MappedName DESC LIMIT ?",
+     (2024, 2, 20)),
+]
+# Queries sql_app.py issues differently in the normalized storage mode (PeriodId = yyyymm, see create_normalized_schema)
+NORMALIZED_DASHBOARD_QUERIES = {
+    "Year bounds": "SELECT MIN(PeriodId) / 100 FROM fact_annual",
+}
 
 # --- Database Interaction Functions ---
-def initialize_db(conn):
-    """Initializes the SQLite database with necessary tables if they don't exist."""
+def initialize_db(conn, drop_existing=True, defer_indexes=False, storage=None, commit=True):
+    """
+    Initializes the SQLite database with necessary tables if they don't exist.
+    With drop_existing=False the existing tables (and their rows) are kept, for incremental migrations;
+    an existing database keeps its storage mode, otherwise `storage` ('flat' or 'normalized',
+    default STORAGE_MODE) is used.
+    With defer_indexes=True the indexes are left for create_indexes() to build after a bulk load.
+    With commit=False the schema changes are left in the caller's transaction.
+    """
     cursor = conn.cursor()
 
-    # Drop tables if they exist to ensure a clean slate for migration
-    # This is helpful for re-running migration without unique constraint errors
-    cursor.execute('DROP TABLE IF EXISTS annual_registrations;')
-    cursor.execute('DROP TABLE IF EXISTS monthly_registrations;')
+    if drop_existing:
+        # Drop tables if they exist to ensure a clean slate for migration
+        # This is helpful for re-running migration without unique constraint errors
+        for name, object_type in cursor.execute(
+                "SELECT name, type FROM sqlite_master WHERE name IN ('annual_registrations', 'monthly_registrations')").fetchall():
+            cursor.execute(f'DROP {object_type.upper()} IF EXISTS {name};') # Tables, or the views of the normalized mode
+        for table_name in ('fact_annual', 'fact_monthly', 'dim_entity', 'dim_datatype', 'dim_period'):
+            cursor.execute(f'DROP TABLE IF EXISTS {table_name};')
+        cursor.execute('DROP TABLE IF EXISTS ingest_manifest;')
+        cursor.execute('DROP TABLE IF EXISTS annual_growth;')
+        cursor.execute('DROP TABLE IF EXISTS quarterly_growth;')
+        cursor.execute('DROP TABLE IF EXISTS category_map;')
+        # The scraper's crawl ledger describes the rows dropped above, so it starts over too
+        cursor.execute('DROP TABLE IF EXISTS crawl_jobs;')
+
+    existing_storage = get_storage_mode(conn)
+    if existing_storage and storage and existing_storage != storage:
+        print(f"Keeping the existing '{existing_storage}' storage of '{DB_FILE}' (requested '{storage}'); run a full migration to switch.")
+    storage = existing_storage or storage or STORAGE_MODE
+
+    if storage == 'normalized':
+        create_normalized_schema(cursor)
+    else:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS annual_registrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name TEXT NOT NULL,
+                DataType TEXT NOT NULL,
+                Year INTEGER NOT NULL,
+                Registrations INTEGER NOT NULL
+            );
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS monthly_registrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name TEXT NOT NULL,
+                DataType TEXT NOT NULL,
+                Year INTEGER NOT NULL,
+                Month TEXT NOT NULL,
+                MonthlyRegistrations INTEGER NOT NULL
+            );
+        ''')
 
+    # One row per ingested CSV, used to detect added, changed and removed files
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS annual_registrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Name TEXT NOT NULL,
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            table_name TEXT NOT NULL,
             DataType TEXT NOT NULL,
-            Year INTEGER NOT NULL,
-            Registrations INTEGER NOT NULL,
-            UNIQUE(Name, DataType, Year)
+            Year INTEGER NOT NULL
         );
     ''')
+    create_category_map(conn)
+    create_growth_tables(conn)
+    if not defer_indexes:
+        create_indexes(conn)
+    if commit:
+        conn.commit()
+    print(f"Database schema initialized in '{DB_FILE}'.")
 
+def create_indexes(conn):
+    """
+    Creates the natural-key indexes of both tables (the UNIQUE(Name, DataType, Year[, Month]) keys).
+    They are kept as named indexes rather than inline constraints so a bulk load can build them
+    once, after all rows are in, instead of maintaining them row by row.
+    In the normalized storage mode the fact tables' primary keys already are these keys, and only
+    the NORMALIZED_INDEXES are built. Runs within the caller's transaction.
+    """
+    cursor = conn.cursor()
+    if get_storage_mode(conn) == 'normalized':
+        for index_sql in NORMALIZED_INDEXES:
+            cursor.execute(index_sql)
+        return
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_annual_registrations_key ON annual_registrations (Name, DataType, Year);')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_monthly_registrations_key ON monthly_registrations (Name, DataType, Year, Month);')
+    for index_sql in DASHBOARD_INDEXES:
+        cursor.execute(index_sql)
+
+def compact_db(conn):
+    """
+    Rewrites the database file with VACUUM after a full rebuild, so the pages freed by the dropped
+    tables are returned to the filesystem (e.g. when an existing file is switched to the normalized
+    storage mode). Must run outside a transaction.
+    """
+    size_before = os.path.getsize(DB_FILE)
+    conn.execute("VACUUM;")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE);") # In WAL mode the file only shrinks once the vacuumed pages are checkpointed
+    print(f"Compacted '{DB_FILE}': {size_before:,} -> {os.path.getsize(DB_FILE):,} bytes.")
+
+def check_query_plans(conn):
+    """
+    Runs EXPLAIN QUERY PLAN for each of DASHBOARD_QUERIES and checks that every access to a
+    registrations table is a SEARCH on one of the DASHBOARD_INDEXES used as a covering index,
+    i.e. neither a full SCAN nor a lookup that has to visit the table rows. In the normalized
+    storage mode every access to a fact or dimension table has to be a SEARCH on its keys or a
+    MIN/MAX lookup on an index, with the year bounds read from the fact tables' period indexes.
+    Each of LEADERBOARD_QUERIES has to be a SEARCH on one of the GROWTH_INDEXES with no sort step.
+    Prints the plans and returns True if all queries are served that way.
+    """
+    dashboard_index_names = [re.search(r'EXISTS (\w+)', index_sql).group(1) for index_sql in DASHBOARD_INDEXES]
+    normalized = get_storage_mode(conn) == 'normalized'
+    all_indexed = True
+    for label, sql, params in DASHBOARD_QUERIES:
+        if normalized:
+            sql = NORMALIZED_DASHBOARD_QUERIES.get(label, sql)
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        if normalized:
+            # Steps name the views' aliases; a SEARCH without a key constraint is a full pass over the table
+            table_steps = [step for step in plan if step.startswith(('SEARCH', 'SCAN')) and 'TEMP B-TREE' not in step]
+            indexed = bool(table_steps) and all(step.startswith('SEARCH') and ('(' in step or 'USING COVERING INDEX' in step) for step in table_steps)
+        else:
+            table_steps = [step for step in plan if 'registrations' in step]
+            indexed = bool(table_steps) and all(
+                step.startswith('SEARCH') and any(f"USING COVERING INDEX {name}" in step for name in dashboard_index_names)
+                for step in table_steps
+            )
+        all_indexed = all_indexed and indexed
+        print(f"[{'OK' if indexed else 'NOT COVERED'}] {label}")
+        for step in plan:
+            print(f"    {step}")
+
+    growth_index_names = [re.search(r'EXISTS (\w+)', index_sql).group(1) for index_sql in GROWTH_INDEXES]
+    for label, sql, params in LEADERBOARD_QUERIES:
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        indexed = bool(plan) and all(
+            step.startswith('SEARCH') and any(f"USING INDEX {name}" in step for name in growth_index_names) for step in plan
+        )
+        all_indexed = all_indexed and indexed
+        print(f"[{'OK' if indexed else 'NOT INDEXED'}] {label}")
+        for step in plan:
+            print(f"    {step}")
+    return all_indexed
+
+# --- Normalized Storage ---
+# Month labels in calendar order; a month's number is its position + 1
+MONTH_LABELS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+def month_number_sql(month_ref):
+    """Returns a CASE expression mapping the Month label `month_ref` to 1-12 (NULL if unknown)."""
+    return f"CASE {month_ref} " + " ".join(f"WHEN '{label}' THEN {number}" for number, label in enumerate(MONTH_LABELS, 1)) + " END"
+
+def entity_id_sql(row_ref):
+    """Returns a scalar subquery for the dim_entity key of the trigger row `row_ref` (NEW or OLD)."""
+    return (f"(SELECT e.EntityId FROM dim_entity e JOIN dim_datatype d ON d.DataTypeId = e.DataTypeId "
+            f"WHERE d.DataType = {row_ref}.DataType AND e.Name = {row_ref}.Name)")
+
+def create_normalized_schema(cursor):
+    """
+    Creates the star schema: dim_datatype, dim_entity and dim_period (PeriodId = yyyymm, with mm = 00
+    for a calendar year total) and fact tables holding only integer keys and counts, clustered on
+    (EntityId, PeriodId). Views named annual_registrations and monthly_registrations expose the flat
+    columns, and their INSTEAD OF triggers route inserts (as upserts) and deletes to the fact tables,
+    so the dashboard, the growth refresh and the scraper keep using the original table names.
+    """
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS monthly_registrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS dim_datatype (
+            DataTypeId INTEGER PRIMARY KEY,
+            DataType TEXT NOT NULL UNIQUE
+        );
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dim_entity (
+            EntityId INTEGER PRIMARY KEY,
+            DataTypeId INTEGER NOT NULL REFERENCES dim_datatype (DataTypeId),
             Name TEXT NOT NULL,
-            DataType TEXT NOT NULL,
+            UNIQUE (DataTypeId, Name)
+        );
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dim_period (
+            PeriodId INTEGER PRIMARY KEY,
             Year INTEGER NOT NULL,
-            Month TEXT NOT NULL,
-            MonthlyRegistrations INTEGER NOT NULL,
-            UNIQUE(Name, DataType, Year, Month)
+            MonthNum INTEGER NOT NULL,
+            Month TEXT
         );
     ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fact_annual (
+            EntityId INTEGER NOT NULL,
+            PeriodId INTEGER NOT NULL,
+            Registrations INTEGER NOT NULL,
+            PRIMARY KEY (EntityId, PeriodId)
+        ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fact_monthly (
+            EntityId INTEGER NOT NULL,
+            PeriodId INTEGER NOT NULL,
+            MonthlyRegistrations INTEGER NOT NULL,
+            PRIMARY KEY (EntityId, PeriodId)
+        ) WITHOUT ROWID;
+    ''')
+
+    # Views with the flat tables' columns; id is derived from the fact key
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS annual_registrations AS
+        SELECT f.EntityId * 1000000 + f.PeriodId AS id, e.Name, d.DataType, p.Year, f.Registrations
+        FROM fact_annual f
+        JOIN dim_entity e ON e.EntityId = f.EntityId
+        JOIN dim_datatype d ON d.DataTypeId = e.DataTypeId
+        JOIN dim_period p ON p.PeriodId = f.PeriodId;
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS monthly_registrations AS
+        SELECT f.EntityId * 1000000 + f.PeriodId AS id, e.Name, d.DataType, p.Year, p.Month, f.MonthlyRegistrations
+        FROM fact_monthly f
+        JOIN dim_entity e ON e.EntityId = f.EntityId
+        JOIN dim_datatype d ON d.DataTypeId = e.DataTypeId
+        JOIN dim_period p ON p.PeriodId = f.PeriodId;
+    ''')
+
+    # SQLite cannot UPSERT a view, so the insert triggers upsert into the fact tables themselves
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS annual_registrations_insert INSTEAD OF INSERT ON annual_registrations
+        BEGIN
+            INSERT OR IGNORE INTO dim_datatype (DataType) VALUES (NEW.DataType);
+            INSERT OR IGNORE INTO dim_entity (DataTypeId, Name)
+                VALUES ((SELECT DataTypeId FROM dim_datatype WHERE DataType = NEW.DataType), NEW.Name);
+            INSERT OR IGNORE INTO dim_period (PeriodId, Year, MonthNum, Month) VALUES (NEW.Year * 100, NEW.Year, 0, NULL);
+            INSERT INTO fact_annual (EntityId, PeriodId, Registrations)
+                VALUES ({entity_id_sql('NEW')}, NEW.Year * 100, NEW.Registrations)
+                ON CONFLICT (EntityId, PeriodId) DO UPDATE SET Registrations = excluded.Registrations
+                WHERE Registrations IS NOT excluded.Registrations;
+        END;
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS monthly_registrations_insert INSTEAD OF INSERT ON monthly_registrations
+        BEGIN
+            SELECT RAISE(ABORT, 'unknown Month label') WHERE ({month_number_sql('NEW.Month')}) IS NULL;
+            INSERT OR IGNORE INTO dim_datatype (DataType) VALUES (NEW.DataType);
+            INSERT OR IGNORE INTO dim_entity (DataTypeId, Name)
+                VALUES ((SELECT DataTypeId FROM dim_datatype WHERE DataType = NEW.DataType), NEW.Name);
+            INSERT OR IGNORE INTO dim_period (PeriodId, Year, MonthNum, Month)
+                VALUES (NEW.Year * 100 + ({month_number_sql('NEW.Month')}), NEW.Year, {month_number_sql('NEW.Month')}, NEW.Month);
+            INSERT INTO fact_monthly (EntityId, PeriodId, MonthlyRegistrations)
+                VALUES ({entity_id_sql('NEW')}, NEW.Year * 100 + ({month_number_sql('NEW.Month')}), NEW.MonthlyRegistrations)
+                ON CONFLICT (EntityId, PeriodId) DO UPDATE SET MonthlyRegistrations = excluded.MonthlyRegistrations
+                WHERE MonthlyRegistrations IS NOT excluded.MonthlyRegistrations;
+        END;
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS annual_registrations_delete INSTEAD OF DELETE ON annual_registrations
+        BEGIN
+            DELETE FROM fact_annual WHERE EntityId = {entity_id_sql('OLD')} AND PeriodId = OLD.Year * 100;
+        END;
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS monthly_registrations_delete INSTEAD OF DELETE ON monthly_registrations
+        BEGIN
+            DELETE FROM fact_monthly WHERE EntityId = {entity_id_sql('OLD')} AND PeriodId = OLD.Year * 100 + ({month_number_sql('OLD.Month')});
+        END;
+    ''')
+
+# --- CSV Parsing Functions ---
+def get_data_type(file):
+    """Returns the DataType stored for a CSV, based on its filename."""
+    return "Vehicle Category" if "Y_Vehicle_Category_" in file else "Manufacturer"
+
+def get_file_year(file):
+    """Extracts the year from a filename like Y_Maker_X_Month_Wise_Year_2024.csv, or None."""
+    year_match = re.search(r'Year_(\d{4})\.csv', file)
+    return int(year_match.group(1)) if year_match else None
+
+def prepare_annual_frame(file):
+    """Reads a calendar year CSV and returns the rows to insert into 'annual_registrations', or None."""
+    filepath = os.path.join(DATA_DIR, file)
+    try:
+        df = pd.read_csv(filepath)
+        
+        df_type = get_data_type(file)
+
+        # Rename the primary 'Name' column first
+        if df_type == "Manufacturer":
+            df.rename(columns={col: 'Name' for col in df.columns if 'Maker_Maker' in col}, inplace=True)
+        elif df_type == "Vehicle Category":
+            df.rename(columns={col: 'Name' for col in df.columns if 'Vehicle Category_Vehicle Category' in col}, inplace=True)
+
+        # Identify year columns (e.g., 'Calendar Year_2024', 'Calendar Year_2025')
+        year_cols = [col for col in df.columns if re.match(r'Calendar Year_\d{4}', col)]
+        
+        # Identify other ID columns to keep during melt (like S No, Name)
+        id_vars = [col for col in df.columns if col not in year_cols and col not in ['TOTAL_TOTAL']]
+        
+        if 'Name' not in df.columns:
+            print(f"Warning: 'Name' column not found in {file}. Skipping annual data migration.")
+            return None
+
+        if not year_cols:
+            print(f"Warning: No valid year columns found in {file}. Skipping annual migration.")
+            return None
+
+        # Melt the year columns into rows
+        df_melted_annual = df.melt(
+            id_vars=id_vars,
+            value_vars=year_cols,
+            var_name='Year_Column',
+            value_name='Registrations'
+        )
+        
+        # Extract the actual year number
+        df_melted_annual['Year'] = df_melted_annual['Year_Column'].str.extract(r'(\d{4})').astype(int)
+        
+        # Prepare DataFrame for database insertion
+        df_to_insert = pd.DataFrame({
+            'Name': df_melted_annual['Name'],
+            'DataType': df_type,
+            'Year': df_melted_annual['Year'],
+            'Registrations': pd.to_numeric(df_melted_annual['Registrations'], errors='coerce').fillna(0)
+        })
+        
+        # We will no longer apply the category mapping here.
+        # The data will be stored with its original, detailed category names.
+
+        # Filter out rows with NaN in Name or 0 registrations
+        df_to_insert.dropna(subset=['Name', 'Registrations'], inplace=True)
+        return df_to_insert[df_to_insert['Registrations'] > 0]
+    except Exception as e:
+        print(f"Error migrating annual data from {file}: {e}")
+        return None
+
+def prepare_monthly_frame(file):
+    """Reads a month-wise CSV and returns the rows to insert into 'monthly_registrations', or None."""
+    filepath = os.path.join(DATA_DIR, file)
+    try:
+        df = pd.read_csv(filepath)
+        
+        df_type = get_data_type(file)
+
+        year = get_file_year(file)
+
+        if year is None:
+            print(f"Warning: Could not determine year from filename for {file}. Skipping monthly data migration.")
+            return None
+
+        # Rename the primary 'Name' column first
+        if df_type == "Manufacturer":
+            df.rename(columns={col: 'Name' for col in df.columns if 'Maker_Maker' in col}, inplace=True)
+        elif df_type == "Vehicle Category":
+            df.rename(columns={col: 'Name' for col in df.columns if 'Vehicle Category_Vehicle Category' in col}, inplace=True)
+
+        month_cols = [col for col in df.columns if 'Month Wise_' in col]
+        
+        if 'Name' not in df.columns or not month_cols:
+            print(f"Warning: Missing 'Name' or month columns in {file}. Skipping monthly migration.")
+            return None
+
+        # Identify other ID columns to keep during melt
+        id_vars_monthly = [col for col in df.columns if col not in month_cols and col not in ['TOTAL_TOTAL']]
+
+        df_melted_monthly = df.melt(id_vars=id_vars_monthly,
+                            value_vars=month_cols, 
+                            var_name='Month', 
+                            value_name='MonthlyRegistrations')
+        
+        df_melted_monthly['Month'] = df_melted_monthly['Month'].str.replace('Month Wise_', '')
+        
+        df_to_insert = pd.DataFrame({
+            'Name': df_melted_monthly['Name'],
+            'DataType': df_type,
+            'Year': year,
+            'Month': df_melted_monthly['Month'],
+            'MonthlyRegistrations': pd.to_numeric(df_melted_monthly['MonthlyRegistrations'], errors='coerce').fillna(0)
+        })
+
+        # We will no longer apply the category mapping here.
+        # The data will be stored with its original, detailed category names.
+
+        # Filter out rows with NaN in Name or 0 registrations
+        df_to_insert.dropna(subset=['Name', 'MonthlyRegistrations'], inplace=True)
+        return df_to_insert[df_to_insert['MonthlyRegistrations'] > 0]
+    except Exception as e:
+        print(f"Error migrating monthly data from {file}: {e}")
+        return None
+
+# --- File Manifest Functions ---
+def hash_file(filepath):
+    """Returns the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def list_source_files():
+    """Returns {file: table_name} for every CSV in DATA_DIR that the migration understands."""
+    source_files = {}
+    for f in sorted(os.listdir(DATA_DIR)):
+        if not (f.startswith("Y_") and f.endswith(".csv")):
+            continue
+        if "X_Calendar_Year_Year_" in f:
+            source_files[f] = 'annual_registrations'
+        elif "X_Month_Wise_Year_" in f:
+            source_files[f] = 'monthly_registrations'
+    return source_files
+
+def load_manifest(conn):
+    """Returns the stored manifest as {path: row dict}."""
+    rows = conn.execute("SELECT path, size, mtime_ns, sha256, table_name, DataType, Year FROM ingest_manifest").fetchall()
+    columns = ['path', 'size', 'mtime_ns', 'sha256', 'table_name', 'DataType', 'Year']
+    return {row[0]: dict(zip(columns, row)) for row in rows}
+
+def build_manifest(source_files, previous_manifest):
+    """
+    Builds manifest entries for the current CSVs. The content hash is only recomputed when a file's
+    size or mtime differs from the stored entry, so an unchanged directory costs one stat per file.
+    """
+    manifest = {}
+    for file, table_name in source_files.items():
+        stat = os.stat(os.path.join(DATA_DIR, file))
+        previous = previous_manifest.get(file)
+        if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+            sha256 = previous['sha256']
+        else:
+            sha256 = hash_file(os.path.join(DATA_DIR, file))
+        manifest[file] = {
+            'path': file, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256,
+            'table_name': table_name, 'DataType': get_data_type(file), 'Year': get_file_year(file) or 0
+        }
+    return manifest
+
+def diff_manifests(previous_manifest, current_manifest):
+    """Returns the (added, changed, removed) file lists between two manifests."""
+    added = [f for f in current_manifest if f not in previous_manifest]
+    changed = [f for f in current_manifest if f in previous_manifest and current_manifest[f]['sha256'] != previous_manifest[f]['sha256']]
+    removed = [f for f in previous_manifest if f not in current_manifest]
+    return added, changed, removed
+
+def save_manifest(conn, manifest):
+    """Replaces the stored manifest with `manifest` (within the caller's transaction)."""
+    conn.execute("DELETE FROM ingest_manifest")
+    conn.executemany(
+        "INSERT INTO ingest_manifest (path, size, mtime_ns, sha256, table_name, DataType, Year) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(e['path'], e['size'], e['mtime_ns'], e['sha256'], e['table_name'], e['DataType'], e['Year']) for e in manifest.values()]
+    )
+
+def delete_file_rows(conn, entry, years):
+    """
+    Deletes the rows previously loaded from a CSV, identified by its table, DataType and year(s).
+    Returns the number of rows deleted.
+    """
+    changes_before = conn.total_changes # Unlike rowcount, also counts deletes made by the normalized views' triggers
+    for year in sorted(set(years)):
+        conn.execute(f"DELETE FROM {entry['table_name']} WHERE DataType = ? AND Year = ?", (entry['DataType'], int(year)))
+    return conn.total_changes - changes_before
+
+# --- Incremental (Upsert) Migration ---
+UPSERT_SQL = {
+    'annual_registrations': (
+        "INSERT INTO annual_registrations (Name, DataType, Year, Registrations) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(Name, DataType, Year) DO UPDATE SET Registrations = excluded.Registrations "
+        "WHERE Registrations IS NOT excluded.Registrations"
+    ),
+    'monthly_registrations': (
+        "INSERT INTO monthly_registrations (Name, DataType, Year, Month, MonthlyRegistrations) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(Name, DataType, Year, Month) DO UPDATE SET MonthlyRegistrations = excluded.MonthlyRegistrations "
+        "WHERE MonthlyRegistrations IS NOT excluded.MonthlyRegistrations"
+    ),
+}
+
+# In the normalized storage mode the views' INSTEAD OF INSERT triggers perform the same upsert
+NORMALIZED_UPSERT_SQL = {
+    'annual_registrations': "INSERT INTO annual_registrations (Name, DataType, Year, Registrations) VALUES (?, ?, ?, ?)",
+    'monthly_registrations': "INSERT INTO monthly_registrations (Name, DataType, Year, Month, MonthlyRegistrations) VALUES (?, ?, ?, ?, ?)",
+}
+
+def upsert_file_rows(conn, table_name, df, stale_years):
+    """
+    Upserts a prepared frame against the table's natural key, so rows whose count did not change
+    are not rewritten, then deletes the rows of `stale_years` that the file no longer contains.
+    Returns (rows written, rows deleted).
+    """
+    if table_name == 'annual_registrations':
+        key_cols = ['Name', 'DataType', 'Year']
+        rows = zip(df['Name'].astype(str).tolist(), df['DataType'].tolist(), df['Year'].astype(int).tolist(),
+                   df['Registrations'].astype('int64').tolist())
+    else:
+        key_cols = ['Name', 'DataType', 'Year', 'Month']
+        rows = zip(df['Name'].astype(str).tolist(), df['DataType'].tolist(), df['Year'].astype(int).tolist(),
+                   df['Month'].tolist(), df['MonthlyRegistrations'].astype('int64').tolist())
+
+    upsert_sql = NORMALIZED_UPSERT_SQL if get_storage_mode(conn) == 'normalized' else UPSERT_SQL
+    changes_before = conn.total_changes
+    conn.executemany(upsert_sql[table_name], rows)
+    written = conn.total_changes - changes_before
+
+    incoming_keys = set(zip(*[df[col].astype(int).tolist() if col == 'Year' else df[col].astype(str).tolist() for col in key_cols]))
+    key_list = ', '.join(key_cols)
+    data_types = set(df['DataType'].tolist())
+    stale_keys = []
+    for data_type in data_types:
+        for year in sorted(set(int(y) for y in stale_years)):
+            existing = conn.execute(f"SELECT {key_list} FROM {table_name} WHERE DataType = ? AND Year = ?", (data_type, year)).fetchall()
+            stale_keys.extend(key for key in existing if key not in incoming_keys)
+    conn.executemany(f"DELETE FROM {table_name} WHERE " + ' AND '.join(f"{col} = ?" for col in key_cols), stale_keys)
+    return written, len(stale_keys)
+
+def upsert_changed_files(conn, previous_manifest, manifest, files_to_load, removed):
+    """
+    Applies added, changed and removed CSVs to the existing tables in one transaction.
+    The database stays in WAL mode, so a dashboard reading it keeps seeing the previous
+    committed state until the whole refresh commits, and never an empty table.
+    """
+    conn.execute("PRAGMA journal_mode = WAL;")
+    start_time = time.perf_counter()
+    total_written = total_deleted = 0
+    conn.execute("BEGIN;")
+    for file in removed:
+        entry = previous_manifest[file]
+        total_deleted += delete_file_rows(conn, entry, [entry['Year']])
+        print(f"Removed rows of deleted file {file} from '{entry['table_name']}'.")
+
+    for file in files_to_load:
+        table_name = manifest[file]['table_name']
+        df_to_insert = prepare_annual_frame(file) if table_name == 'annual_registrations' else prepare_monthly_frame(file)
+        if df_to_insert is None:
+            del manifest[file] # Not recorded, so the next incremental run retries it
+            continue
+        if df_to_insert.empty:
+            total_deleted += delete_file_rows(conn, manifest[file], [manifest[file]['Year']])
+            print(f"No valid data left in {file}; removed its rows from '{table_name}'.")
+            continue
+
+        # Rows of an earlier version of this file that are not in the new version are deleted
+        stale_years = list(df_to_insert['Year'].unique()) + [manifest[file]['Year']]
+        if file in previous_manifest:
+            stale_years.append(previous_manifest[file]['Year'])
+        written, deleted = upsert_file_rows(conn, table_name, df_to_insert, stale_years)
+        total_written += written
+        total_deleted += deleted
+        print(f"Upserted {file} into '{table_name}': {written} row(s) written, "
+              f"{len(df_to_insert) - written} unchanged, {deleted} deleted.")
+
+    affected_data_types = {previous_manifest[file]['DataType'] for file in removed} | {manifest[file]['DataType'] for file in files_to_load if file in manifest}
+    update_category_map(conn) # Also backfills the map for databases created before it existed
+    if conn.execute("SELECT 1 FROM annual_growth LIMIT 1").fetchone() is None:
+        refresh_growth_tables(conn) # Growth tables were never materialized for this database
+    elif total_written or total_deleted:
+        refresh_growth_tables(conn, affected_data_types)
+    save_manifest(conn, manifest)
     conn.commit()
-    print(f"Database schema initialized in '{DB_FILE}'.")
+    elapsed = time.perf_counter() - start_time
+    print(f"Incremental migration wrote {total_written} and deleted {total_deleted} row(s) in {elapsed:.2f}s "
+          f"({total_written / max(elapsed, 1e-9):,.0f} rows/sec).")
 
-def map_vehicle_category(category_name):
+# --- Bulk Loading ---
+def bulk_load(conn, annual_frames, monthly_frames, manifest, storage=None):
     """
-    Maps detailed vehicle category names to broader 2W, 3W, or 4W groups.
-    (Copied from app.py for consistency during migration)
+    Rebuilds the database in one explicit transaction: the schema reset (see initialize_db), prepared
+    executemany inserts of all prepared frames using BULK_LOAD_PRAGMAS, the indexes built after the
+    rows are in, the growth tables and `manifest`. A failure rolls all of it back, leaving the previous
+    database as it was. The connection's previous PRAGMA values (e.g. a WAL journal mode) are
+    restored after the commit. Returns the number of rows inserted.
     """
-    category_name = str(category_name).strip().upper()
-    if 'TWO WHEELER' in category_name:
-        return '2W'
-    elif 'THREE WHEELER' in category_name:
-        return '3W'
-    elif any(keyword in category_name for keyword in ['FOUR WHEELER', 'GOODS VEHICLE', 'PASSENGER VEHICLE', 'MOTOR VEHICLE', 'TRAC', 'EARTH MOVING']):
-        return '4W'
-    return 'Other'
+    annual_df = pd.concat(annual_frames, ignore_index=True) if annual_frames else pd.DataFrame(columns=['Name', 'DataType', 'Year', 'Registrations'])
+    monthly_df = pd.concat(monthly_frames, ignore_index=True) if monthly_frames else pd.DataFrame(columns=['Name', 'DataType', 'Year', 'Month', 'MonthlyRegistrations'])
+
+    # The unique indexes are only built at the end, so enforce the natural keys up front
+    # (the last file wins, as it would with per-file inserts into the constrained tables)
+    for df, key, table_name in ((annual_df, ['Name', 'DataType', 'Year'], 'annual_registrations'),
+                                (monthly_df, ['Name', 'DataType', 'Year', 'Month'], 'monthly_registrations')):
+        duplicates = df.duplicated(subset=key, keep='last')
+        if duplicates.any():
+            print(f"Warning: dropping {int(duplicates.sum())} duplicate key row(s) for '{table_name}'.")
+            df.drop(index=df.index[duplicates], inplace=True)
+
+    previous_pragmas = {pragma: conn.execute(f"PRAGMA {pragma};").fetchone()[0] for pragma in BULK_LOAD_PRAGMAS}
+    for pragma, value in BULK_LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value};")
 
-def migrate_csvs():
-    """Reads all CSVs from DATA_DIR and migrates them to the SQLite database."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN;")
+    try:
+        initialize_db(conn, drop_existing=True, defer_indexes=True, storage=storage, commit=False)
+        cursor.executemany(
+            "INSERT INTO annual_registrations (Name, DataType, Year, Registrations) VALUES (?, ?, ?, ?)",
+            zip(annual_df['Name'].astype(str).tolist(), annual_df['DataType'].tolist(),
+                annual_df['Year'].astype(int).tolist(), annual_df['Registrations'].astype('int64').tolist())
+        )
+        cursor.executemany(
+            "INSERT INTO monthly_registrations (Name, DataType, Year, Month, MonthlyRegistrations) VALUES (?, ?, ?, ?, ?)",
+            zip(monthly_df['Name'].astype(str).tolist(), monthly_df['DataType'].tolist(), monthly_df['Year'].astype(int).tolist(),
+                monthly_df['Month'].tolist(), monthly_df['MonthlyRegistrations'].astype('int64').tolist())
+        )
+        create_indexes(conn)
+        refresh_growth_tables(conn)
+        save_manifest(conn, manifest)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        for pragma, value in previous_pragmas.items():
+            conn.execute(f"PRAGMA {pragma} = {value};")
+    return len(annual_df) + len(monthly_df)
+
+def migrate_csvs(incremental=False, bulk=False, storage=None):
+    """
+    Reads all CSVs from DATA_DIR and migrates them to the SQLite database.
+    With incremental=True the existing tables are kept and only CSVs that were added, changed
+    (by content hash) or removed since the last migration are upserted, see upsert_changed_files().
+    With bulk=True the tables are rebuilt with bulk_load() instead of one to_sql call per file.
+    `storage` selects the 'flat' or 'normalized' layout of a rebuilt database, see initialize_db().
+    """
     if not os.path.exists(DATA_DIR):
         print(f"Error: CSV data directory '{DATA_DIR}' not found. Cannot migrate.")
         return
 
+    if incremental and bulk:
+        print("Error: --bulk rebuilds the database and cannot be combined with --incremental.")
+        return
+
     conn = sqlite3.connect(DB_FILE)
-    initialize_db(conn) # Ensure tables exist and are clean
+    if bulk:
+        previous_manifest = {} # bulk_load() resets the schema within its own transaction
+    else:
+        initialize_db(conn, drop_existing=not incremental, storage=storage) # Ensure tables exist (and are clean for a full migration)
+        previous_manifest = load_manifest(conn)
 
-    print(f"Starting migration from CSVs in '{DATA_DIR}' to '{DB_FILE}'...")
+    source_files = list_source_files()
+    manifest = build_manifest(source_files, previous_manifest)
 
-    # --- Migrate Calendar Year Data (for YoY) ---
-    calendar_year_files = [f for f in os.listdir(DATA_DIR) if f.startswith("Y_") and "X_Calendar_Year_Year_" in f and f.endswith(".csv")]
-    
-    for file in calendar_year_files:
-        filepath = os.path.join(DATA_DIR, file)
-        try:
-            df = pd.read_csv(filepath)
-            
-            df_type = "Manufacturer"
-            if "Y_Vehicle_Category_" in file:
-                df_type = "Vehicle Category"
-
-            # Rename the primary 'Name' column first
-            if df_type == "Manufacturer":
-                df.rename(columns={col: 'Name' for col in df.columns if 'Maker_Maker' in col}, inplace=True)
-            elif df_type == "Vehicle Category":
-                df.rename(columns={col: 'Name' for col in df.columns if 'Vehicle Category_Vehicle Category' in col}, inplace=True)
-
-            # Identify year columns (e.g., 'Calendar Year_2024', 'Calendar Year_2025')
-            year_cols = [col for col in df.columns if re.match(r'Calendar Year_\d{4}', col)]
-            
-            # Identify other ID columns to keep during melt (like S No, Name)
-            id_vars = [col for col in df.columns if col not in year_cols and col not in ['TOTAL_TOTAL']]
-            
-            if 'Name' not in df.columns:
-                print(f"Warning: 'Name' column not found in {file}. Skipping annual data migration.")
-                continue
+    if incremental:
+        added, changed, removed = diff_manifests(previous_manifest, manifest)
+        files_to_load = added + changed
+        print(f"Incremental migration: {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+              f"{len(manifest) - len(files_to_load)} unchanged file(s).")
+    else:
+        added, changed, removed = list(manifest), [], []
+        files_to_load = list(manifest)
+        print(f"Starting migration from CSVs in '{DATA_DIR}' to '{DB_FILE}'...")
 
-            if year_cols:
-                # Melt the year columns into rows
-                df_melted_annual = df.melt(
-                    id_vars=id_vars,
-                    value_vars=year_cols,
-                    var_name='Year_Column',
-                    value_name='Registrations'
-                )
-                
-                # Extract the actual year number
-                df_melted_annual['Year'] = df_melted_annual['Year_Column'].str.extract(r'(\d{4})').astype(int)
-                
-                # Prepare DataFrame for database insertion
-                df_to_insert = pd.DataFrame({
-                    'Name': df_melted_annual['Name'],
-                    'DataType': df_type,
-                    'Year': df_melted_annual['Year'],
-                    'Registrations': pd.to_numeric(df_melted_annual['Registrations'], errors='coerce').fillna(0)
-                })
-                
-                # We will no longer apply the category mapping here.
-                # The data will be stored with its original, detailed category names.
-
-                # Filter out rows with NaN in Name or 0 registrations
-                df_to_insert.dropna(subset=['Name', 'Registrations'], inplace=True)
-                df_to_insert = df_to_insert[df_to_insert['Registrations'] > 0]
-
-                if not df_to_insert.empty:
-                    # Use 'replace' to handle unique constraints if re-running
-                    df_to_insert.to_sql('annual_registrations', conn, if_exists='append', index=False, method='multi')
-                    print(f"Migrated annual data from {file} to 'annual_registrations'.")
-                else:
-                    print(f"No valid annual data to migrate from {file}.")
+    if bulk:
+        start_time = time.perf_counter()
+        annual_frames, monthly_frames = [], []
+        for file in files_to_load:
+            if manifest[file]['table_name'] == 'annual_registrations':
+                df_to_insert = prepare_annual_frame(file)
+                target = annual_frames
             else:
-                print(f"Warning: No valid year columns found in {file}. Skipping annual migration.")
+                df_to_insert = prepare_monthly_frame(file)
+                target = monthly_frames
+            if df_to_insert is None:
+                del manifest[file] # Not recorded, so the next incremental run retries it
+            elif not df_to_insert.empty:
+                target.append(df_to_insert)
+        parse_seconds = time.perf_counter() - start_time
+        try:
+            load_start = time.perf_counter()
+            row_count = bulk_load(conn, annual_frames, monthly_frames, manifest, storage)
+            load_seconds = time.perf_counter() - load_start
+            compact_db(conn)
+            print(f"Bulk loaded {row_count} rows from {len(annual_frames) + len(monthly_frames)} file(s): parse {parse_seconds:.2f}s, "
+                  f"load {load_seconds:.2f}s ({row_count / max(load_seconds, 1e-9):,.0f} rows/sec).")
         except Exception as e:
-            print(f"Error migrating annual data from {file}: {e}")
-
-    # --- Migrate Month Wise Data (for QoQ) ---
-    month_wise_files = [f for f in os.listdir(DATA_DIR) if f.startswith("Y_") and "X_Month_Wise_Year_" in f and f.endswith(".csv")]
+            print(f"Error during bulk load, changes rolled back: {e}")
+        finally:
+            conn.close()
+        print("All CSV migration complete!")
+        return
 
-    for file in month_wise_files:
-        filepath = os.path.join(DATA_DIR, file)
+    if incremental:
         try:
-            df = pd.read_csv(filepath)
-            
-            df_type = "Manufacturer"
-            if "Y_Vehicle_Category_" in file:
-                df_type = "Vehicle Category"
-
-            year_match = re.search(r'Year_(\d{4})\.csv', file)
-            year = int(year_match.group(1)) if year_match else None
+            upsert_changed_files(conn, previous_manifest, manifest, files_to_load, removed)
+        except Exception as e:
+            conn.rollback()
+            print(f"Error during incremental migration, changes rolled back: {e}")
+        finally:
+            conn.close()
+        print("All CSV migration complete!")
+        return
 
-            if year is None:
-                print(f"Warning: Could not determine year from filename for {file}. Skipping monthly data migration.")
+    start_time = time.perf_counter()
+    row_count = 0
+    try:
+        # --- Migrate Calendar Year Data (for YoY) and Month Wise Data (for QoQ) ---
+        for file in files_to_load:
+            table_name = manifest[file]['table_name']
+            df_to_insert = prepare_annual_frame(file) if table_name == 'annual_registrations' else prepare_monthly_frame(file)
+            if df_to_insert is None:
+                del manifest[file] # Not recorded, so the next incremental run retries it
                 continue
 
-            # Rename the primary 'Name' column first
-            if df_type == "Manufacturer":
-                df.rename(columns={col: 'Name' for col in df.columns if 'Maker_Maker' in col}, inplace=True)
-            elif df_type == "Vehicle Category":
-                df.rename(columns={col: 'Name' for col in df.columns if 'Vehicle Category_Vehicle Category' in col}, inplace=True)
-
-            month_cols = [col for col in df.columns if 'Month Wise_' in col]
-            
-            if 'Name' in df.columns and month_cols:
-                # Identify other ID columns to keep during melt
-                id_vars_monthly = [col for col in df.columns if col not in month_cols and col not in ['TOTAL_TOTAL']]
-
-                df_melted_monthly = df.melt(id_vars=id_vars_monthly,
-                                    value_vars=month_cols, 
-                                    var_name='Month', 
-                                    value_name='MonthlyRegistrations')
-                
-                df_melted_monthly['Month'] = df_melted_monthly['Month'].str.replace('Month Wise_', '')
-                
-                df_to_insert = pd.DataFrame({
-                    'Name': df_melted_monthly['Name'],
-                    'DataType': df_type,
-                    'Year': year,
-                    'Month': df_melted_monthly['Month'],
-                    'MonthlyRegistrations': pd.to_numeric(df_melted_monthly['MonthlyRegistrations'], errors='coerce').fillna(0)
-                })
-
-                # We will no longer apply the category mapping here.
-                # The data will be stored with its original, detailed category names.
-
-                # Filter out rows with NaN in Name or 0 registrations
-                df_to_insert.dropna(subset=['Name', 'MonthlyRegistrations'], inplace=True)
-                df_to_insert = df_to_insert[df_to_insert['MonthlyRegistrations'] > 0]
-
-                if not df_to_insert.empty:
-                    df_to_insert.to_sql('monthly_registrations', conn, if_exists='append', index=False, method='multi')
-                    print(f"Migrated monthly data from {file} to 'monthly_registrations'.")
-                else:
-                    print(f"No valid monthly data to migrate from {file}.")
+            kind = 'annual' if table_name == 'annual_registrations' else 'monthly'
+            if not df_to_insert.empty:
+                try:
+                    df_to_insert.to_sql(table_name, conn, if_exists='append', index=False, method='multi')
+                    row_count += len(df_to_insert)
+                    print(f"Migrated {kind} data from {file} to '{table_name}'.")
+                except Exception as e:
+                    print(f"Error migrating {kind} data from {file}: {e}")
+                    del manifest[file] # Not recorded, so the next incremental run retries it
             else:
-                print(f"Warning: Missing 'Name' or month columns in {file}. Skipping monthly migration.")
-        except Exception as e:
-            print(f"Error migrating monthly data from {file}: {e}")
+                print(f"No valid {kind} data to migrate from {file}.")
 
-    conn.close()
+        refresh_growth_tables(conn)
+        save_manifest(conn, manifest)
+        conn.commit()
+        elapsed = time.perf_counter() - start_time
+        compact_db(conn)
+        print(f"Migrated {row_count} rows in {elapsed:.2f}s ({row_count / max(elapsed, 1e-9):,.0f} rows/sec).")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error during migration, changes rolled back: {e}")
+    finally:
+        conn.close()
     print("All CSV migration complete!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the Vahan CSV exports into the SQLite database.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-ingest CSVs that were added, changed or removed since the last migration.")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Rebuild the tables in one transaction with executemany inserts and deferred index builds.")
+    parser.add_argument("--storage", choices=["flat", "normalized"],
+                        help=f"Table layout of a rebuilt database (default: {STORAGE_MODE}). 'normalized' stores integer-keyed "
+                             "fact tables with dimension tables, behind views that keep the original table names.")
+    parser.add_argument("--check-indexes", action="store_true",
+                        help="Create any missing dashboard indexes and verify the dashboard's queries use them (EXPLAIN QUERY PLAN), without migrating.")
+    args = parser.parse_args()
+
+    if args.check_indexes:
+        conn = sqlite3.connect(DB_FILE)
+        initialize_db(conn, drop_existing=False)
+        all_indexed = check_query_plans(conn)
+        conn.close()
+        raise SystemExit(0 if all_indexed else 1)
+
     # Ensure the DATA_DIR exists for the migration script to find CSVs
     if not os.path.exists(DATA_DIR):
         print(f"Creating data directory: {DATA_DIR}")
         os.makedirs(DATA_DIR)
         print("Please place your scraped CSV files into this directory.")
-    migrate_csvs()
\ No newline at end of file
+    migrate_csvs(incremental=args.incremental, bulk=args.bulk, storage=args.storage)
@@ -4,28 +4,146 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 import os
-import re
+import numpy as np
 import plotly.express as px
+from vahan_growth import map_vehicle_category, QUARTER_CASE_SQL # Shared with the scraper and the migration
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The shared vahan_frames module lives in the repository root
+from vahan_frames import optimize_frame_dtypes
+try:
+    import pyarrow # Optional: enables the shared store of memory-mapped frames
+    import pyarrow.ipc
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
 
 # --- 1. Configuration ---
 DB_FILE = "vahan_data.db" # Name of your SQLite database file
+# Arrow IPC files of the loaded frames and growth tables, memory-mapped by every worker process; only used with
+# GROWTH_ENGINE = 'bulk', or when the database has no materialized growth tables (the frames are not loaded otherwise)
+SHARED_STORE_DIR = ".vahan_shared"
+# 'materialized' reads YoY/QoQ precomputed at ingest time (annual_growth / quarterly_growth tables),
+# 'sql' computes them per selection inside SQLite with window functions, 'pandas' in memory per selection,
+# 'bulk' computes them in memory for every entity at once per dataset version and looks selections up
+GROWTH_ENGINE = "materialized"
+PERIOD_EPOCH_YEAR = 1970 # Month and quarter keys count from January of this year
+LEADERBOARD_SIZE = 20 # Default number of manufacturers in the top movers leaderboard
+COMPARISON_MAX_ENTITIES = 10 # Most lines drawn in the comparison chart
+COMPARISON_MAX_POINTS = 2000 # Most points drawn in the comparison chart; older periods are dropped beyond it
+CACHE_MAX_ENTRIES = 256 # Most results kept per cached query or dashboard artifact
+CACHE_TTL_SECONDS = 3600 # Seconds a cached query or dashboard artifact is kept, so database updates show up
 
 # --- 2. Data Loading from Database and Preprocessing ---
-@st.cache_data # Cache data to avoid reloading on every rerun
-def load_data_from_db():
+# Integer period keys: months and quarters counted from January of PERIOD_EPOCH_YEAR
+def month_key(year, month_num):
+    """Returns the month key (months since January of PERIOD_EPOCH_YEAR) for Year and MonthNum series."""
+    return (year.astype('int32') - PERIOD_EPOCH_YEAR) * 12 + (month_num.astype('int32') - 1)
+
+def format_quarter_labels(quarter_keys):
+    """Returns 'YYYY-Qn' labels for a series of quarter keys, formatting each distinct quarter once."""
+    codes, uniques = pd.factorize(quarter_keys)
+    labels = pd.Index([f"{PERIOD_EPOCH_YEAR + key // 4}-Q{key % 4 + 1}" for key in uniques], dtype=object)
+    return pd.Series(labels.take(codes), index=quarter_keys.index)
+
+# --- Shared Data Store ---
+# Every worker process serving the dashboard maps the same Arrow IPC files instead of holding its own
+# copy of the frames: the pages are shared through the OS page cache, so another worker costs almost
+# no extra RAM per dataset version. Files are named after the dataset version and replaced atomically.
+def shared_store_path(name, dataset_version):
+    """Returns the path of the shared store file holding frame `name` for `dataset_version`."""
+    return os.path.join(SHARED_STORE_DIR, f"{name}_{dataset_version}.arrow")
+
+def write_shared_frame(df, path):
+    """
+    Writes `df` as an Arrow IPC file. Categories are stored as dictionary arrays and NaN stays a
+    float value rather than a null, so read_shared_frame can map every column without copying.
+    """
+    arrays = {}
+    for col in df.columns:
+        if df[col].dtype.kind == 'f':
+            arrays[col] = pyarrow.array(df[col].to_numpy(), from_pandas=False)
+        else:
+            arrays[col] = pyarrow.array(df[col])
+    table = pyarrow.table(arrays)
+    with pyarrow.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+
+def read_shared_frame(path):
+    """
+    Returns the frame stored at `path`, backed by a read-only memory map of the file: numeric
+    columns and category codes point into the mapped pages, only the category labels are copied.
+    """
+    table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if pyarrow.types.is_dictionary(array.type):
+            codes = array.indices.fill_null(-1) if array.null_count else array.indices
+            columns[name] = pd.Categorical.from_codes(codes.to_numpy(zero_copy_only=False), categories=pd.Index(array.dictionary.to_pandas()), validate=False)
+        elif array.null_count == 0 and (pyarrow.types.is_integer(array.type) or pyarrow.types.is_floating(array.type)):
+            columns[name] = array.to_numpy(zero_copy_only=False) # Zero-copy for primitive arrays without nulls
+        else:
+            columns[name] = array.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+def load_shared_frames(dataset_version, names):
+    """Returns the frames `names` of `dataset_version` from the shared store, or None if any of them is not published."""
+    if not ARROW_AVAILABLE or dataset_version is None:
+        return None
+    paths = [shared_store_path(name, dataset_version) for name in names]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    try:
+        return tuple(read_shared_frame(path) for path in paths)
+    except Exception:
+        return None # Unreadable file, the frames are simply built again
+
+def publish_shared_frames(dataset_version, frames_by_name):
+    """
+    Publishes the frames of `dataset_version` to the shared store for the other worker processes
+    and removes the files of other dataset versions. Processes that already mapped a removed file
+    keep their mapping.
+    """
+    if not ARROW_AVAILABLE or dataset_version is None or any(df.empty for df in frames_by_name.values()):
+        return
+    try:
+        os.makedirs(SHARED_STORE_DIR, exist_ok=True)
+        for name, df in frames_by_name.items():
+            path = shared_store_path(name, dataset_version)
+            temp_path = f"{path}.{os.getpid()}.tmp" # Concurrent publishers never write the same file
+            write_shared_frame(df, temp_path)
+            os.replace(temp_path, path)
+        for file in os.listdir(SHARED_STORE_DIR):
+            if file.endswith(".arrow") and not file.endswith(f"_{dataset_version}.arrow"):
+                try:
+                    os.remove(os.path.join(SHARED_STORE_DIR, file))
+                except OSError:
+                    pass # Still open in another process (Windows), removed on a later publish
+    except Exception as e:
+        st.warning(f"Could not publish the shared data store in '{SHARED_STORE_DIR}': {e}")
+
+@st.cache_resource(max_entries=1) # Shared by all sessions without copying; only the latest version is kept
+def load_data_from_db(dataset_version=None):
     """
     Connects to the SQLite database and loads data from both tables.
     Ensures correct data types for calculations.
+    With a `dataset_version` (see get_dataset_version) the frames are memory-mapped from the shared
+    store if another worker process already published them, and published after loading otherwise.
+    They are shared by all sessions, so they must not be modified.
     """
     if not os.path.exists(DB_FILE):
         st.error(f"Error: The database file '{DB_FILE}' was not found. Please run 'sql_scraper.py' or 'migrate_csv_to_sql.py' first.")
         st.stop()
 
+    shared_frames = load_shared_frames(dataset_version, ("annual_registrations", "monthly_registrations"))
+    if shared_frames is not None:
+        return shared_frames
+
     conn = sqlite3.connect(DB_FILE)
     
     # Load annual data
     try:
-        calendar_data_combined = pd.read_sql_query("SELECT * FROM annual_registrations", conn)
+        calendar_data_combined = pd.read_sql_query(select_with_mapped_name(dataset_version, "annual_registrations"), conn)
         # Ensure correct numeric types for annual data
         calendar_data_combined['Year'] = pd.to_numeric(calendar_data_combined['Year'], errors='coerce').fillna(0).astype(int)
         calendar_data_combined['Registrations'] = pd.to_numeric(calendar_data_combined['Registrations'], errors='coerce').fillna(0)
@@ -35,138 +153,796 @@ def load_data_from_db():
 
     # Load monthly data
     try:
-        monthly_data_combined = pd.read_sql_query("SELECT * FROM monthly_registrations", conn)
+        monthly_data_combined = pd.read_sql_query(select_with_mapped_name(dataset_version, "monthly_registrations"), conn)
         # Ensure correct numeric types for monthly data
         monthly_data_combined['Year'] = pd.to_numeric(monthly_data_combined['Year'], errors='coerce').fillna(0).astype(int)
         monthly_data_combined['MonthlyRegistrations'] = pd.to_numeric(monthly_data_combined['MonthlyRegistrations'], errors='coerce').fillna(0)
 
-        # Reconstruct 'Date' column for QoQ calculation
-        month_to_num = {
-            'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
-            'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
-        }
+        # Add the integer 'MonthKey' column for the QoQ calculation
         if 'Month' in monthly_data_combined.columns and 'Year' in monthly_data_combined.columns:
-            monthly_data_combined['MonthNum'] = monthly_data_combined['Month'].map(month_to_num)
-            # Combine Year and MonthNum to create a valid date string, then convert to datetime
-            monthly_data_combined['Date'] = pd.to_datetime(
-                monthly_data_combined['Year'].astype(str) + '-' + 
-                monthly_data_combined['MonthNum'].astype(str) + '-01', 
-                errors='coerce'
-            )
-            monthly_data_combined.dropna(subset=['Date'], inplace=True)
-            monthly_data_combined.drop(columns=['MonthNum'], inplace=True, errors='ignore') # Drop temporary MonthNum
+            monthly_data_combined = add_month_key(monthly_data_combined)
     except pd.io.sql.DatabaseError:
         st.warning(f"Table 'monthly_registrations' not found in {DB_FILE}. Ensure scraper has completed successfully.")
         monthly_data_combined = pd.DataFrame()
 
     conn.close()
     
-    # The map_vehicle_category function should now be applied here
-    # to the loaded dataframes, not during migration.
-    
-    # We will first add a new column 'MappedName' to store the grouped category.
-    # We'll use this new column for filtering and analysis when the user selects 'Vehicle Category'.
-    
-    # Apply category mapping for 'Vehicle Category' rows
+    # MappedName (the 2W/3W/4W group for 'Vehicle Category' rows) comes from category_map;
+    # only names the map does not cover yet are classified here
     if not calendar_data_combined.empty and 'Name' in calendar_data_combined.columns:
-        calendar_data_combined.loc[calendar_data_combined['DataType'] == 'Vehicle Category', 'MappedName'] = calendar_data_combined[calendar_data_combined['DataType'] == 'Vehicle Category']['Name'].apply(map_vehicle_category)
-        # Correcting the FutureWarning by using re-assignment
-        calendar_data_combined['MappedName'] = calendar_data_combined['MappedName'].fillna(calendar_data_combined['Name'])
-    
-    if not monthly_data_combined.empty and 'Name' in monthly_data_combined.columns:
-        monthly_data_combined.loc[monthly_data_combined['DataType'] == 'Vehicle Category', 'MappedName'] = monthly_data_combined[monthly_data_combined['DataType'] == 'Vehicle Category']['Name'].apply(map_vehicle_category)
-        # Correcting the FutureWarning by using re-assignment
-        monthly_data_combined['MappedName'] = monthly_data_combined['MappedName'].fillna(monthly_data_combined['Name'])
+        calendar_data_combined = fill_mapped_names(calendar_data_combined)
 
+    if not monthly_data_combined.empty and 'Name' in monthly_data_combined.columns:
+        monthly_data_combined = fill_mapped_names(monthly_data_combined)
 
+    calendar_data_combined = optimize_frame_dtypes(calendar_data_combined, "annual_registrations")
+    monthly_data_combined = optimize_frame_dtypes(monthly_data_combined, "monthly_registrations")
+    publish_shared_frames(dataset_version, {"annual_registrations": calendar_data_combined, "monthly_registrations": monthly_data_combined})
     return calendar_data_combined, monthly_data_combined
 
 # --- 3. Vehicle Category Mapping ---
-def map_vehicle_category(category_name):
+def map_vehicle_categories(names):
     """
-    Maps detailed vehicle category names to broader 2W, 3W, or 4W groups.
+    Vectorized map_vehicle_category for a Series of names: each distinct name is classified once
+    and the result is broadcast back through the factorized codes, so the cost is O(unique names).
     """
-    category_name = str(category_name).strip().upper()
-    
-    # Check for two-wheelers
-    if 'TWO WHEELER' in category_name:
-        return '2W'
-    
-    # Check for three-wheelers
-    if 'THREE WHEELER' in category_name:
-        return '3W'
-    
-    # Check for four-wheelers and other heavy vehicles
-    if any(keyword in category_name for keyword in [
-        'FOUR WHEELER', 'LIGHT MOTOR VEHICLE', 'MEDIUM MOTOR VEHICLE',
-        'HEAVY MOTOR VEHICLE', 'GOODS VEHICLE', 'PASSENGER VEHICLE',
-        'BUS', 'TRAC', 'EARTH MOVING', 'DUMPER', 'CRANE'
-    ]):
-        return '4W'
-        
-    return 'Other'
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    return pd.Series(pd.Index(uniques, dtype=object).map(map_vehicle_category).take(codes), index=names.index)
+
+# --- 4. Filtered Query Layer ---
+# Value column of each registrations table
+VALUE_COLUMNS = {
+    'annual_registrations': 'Registrations',
+    'monthly_registrations': 'MonthlyRegistrations',
+}
+
+def build_registrations_query(table_name, data_type, names=None, year_range=None, include_previous_period=False):
+    """
+    Builds a parameterized SELECT against one registrations table for a data type, an optional
+    list of raw entity names and an optional (start, end) year range.
+    With include_previous_period=True the range is widened back to the latest year before `start`
+    that has data for the same entities, so growth for the first year/quarter in range still has
+    its previous period (exactly as if the full history had been loaded).
+    Returns (sql, params).
+    """
+    where = ["DataType = ?"]
+    params = [data_type]
+    name_clause = ""
+    name_params = []
+    if names is not None:
+        name_clause = f"Name IN ({', '.join('?' for _ in names)})"
+        name_params = list(names)
+        where.append(name_clause)
+        params.extend(name_params)
+    if year_range is not None:
+        start, end = int(year_range[0]), int(year_range[1])
+        if include_previous_period:
+            previous_year_sql = f"SELECT MAX(Year) FROM {table_name} WHERE DataType = ? AND Year < ?"
+            previous_year_params = [data_type, start]
+            if name_clause:
+                previous_year_sql += f" AND {name_clause}"
+                previous_year_params.extend(name_params)
+            where.append(f"Year >= COALESCE(({previous_year_sql}), ?)")
+            params.extend(previous_year_params + [start])
+        else:
+            where.append("Year >= ?")
+            params.append(start)
+        where.append("Year <= ?")
+        params.append(end)
+
+    columns = "Name, DataType, Year, Month, MonthlyRegistrations" if table_name == 'monthly_registrations' else "Name, DataType, Year, Registrations"
+    sql = f"SELECT {columns} FROM {table_name} WHERE {' AND '.join(where)}"
+    return sql, params
+
+def run_query(sql, params=()):
+    """Runs a read-only query against DB_FILE and returns the result as a DataFrame."""
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def add_month_key(df_monthly):
+    """Adds the integer 'MonthKey' column that the QoQ calculation relies on, dropping rows with an unknown month label."""
+    month_to_num = {
+        'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+        'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+    }
+    month_num = df_monthly['Month'].astype(object).map(month_to_num)
+    df_monthly = df_monthly[month_num.notna()].copy()
+    df_monthly['MonthKey'] = month_key(df_monthly['Year'], month_num[month_num.notna()])
+    return df_monthly
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_raw_names(dataset_version, data_type):
+    """Returns the distinct raw Name values stored for a data type across both tables."""
+    try:
+        df = run_query(
+            "SELECT Name FROM annual_registrations WHERE DataType = ? UNION SELECT Name FROM monthly_registrations WHERE DataType = ?",
+            (data_type, data_type)
+        )
+    except pd.io.sql.DatabaseError:
+        return []
+    return df['Name'].tolist()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def has_category_map(dataset_version):
+    """True if the database holds the category_map table written by the scraper and the migration."""
+    try:
+        run_query("SELECT 1 FROM category_map LIMIT 1")
+    except pd.io.sql.DatabaseError:
+        return False
+    return True
 
-# --- 4. Growth Analysis Functions ---
-def calculate_yoy_growth(df_annual):
+def select_with_mapped_name(dataset_version, table_name):
+    """
+    Returns a SELECT of every column of `table_name` plus MappedName, joined from category_map when
+    the database has it (NULL otherwise; fill_mapped_names completes it).
+    """
+    if has_category_map(dataset_version):
+        return (
+            f"SELECT r.*, CASE WHEN r.DataType = 'Vehicle Category' THEN c.MappedName ELSE r.Name END AS MappedName "
+            f"FROM {table_name} r LEFT JOIN category_map c ON r.DataType = 'Vehicle Category' AND c.RawName = r.Name"
+        )
+    return f"SELECT *, NULL AS MappedName FROM {table_name}"
+
+def fill_mapped_names(df):
+    """Fills MappedName for rows category_map does not cover: classified in Python for vehicle categories, Name otherwise."""
+    unmapped = df['MappedName'].isna()
+    if unmapped.any():
+        vehicle_categories = unmapped & (df['DataType'] == 'Vehicle Category')
+        df['MappedName'] = df['MappedName'].astype(object)
+        df.loc[vehicle_categories, 'MappedName'] = map_vehicle_categories(df.loc[vehicle_categories, 'Name'])
+        df['MappedName'] = df['MappedName'].fillna(df['Name'])
+    return df
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_category_lookup(dataset_version):
+    """Returns a Name -> MappedName DataFrame covering every stored vehicle category name."""
+    sql = (
+        "SELECT Name FROM annual_registrations WHERE DataType = 'Vehicle Category' "
+        "UNION SELECT Name FROM monthly_registrations WHERE DataType = 'Vehicle Category'"
+    )
+    if has_category_map(dataset_version):
+        sql = f"SELECT n.Name, c.MappedName FROM ({sql}) n LEFT JOIN category_map c ON c.RawName = n.Name"
+    else:
+        sql = f"SELECT Name, NULL AS MappedName FROM ({sql})"
+    try:
+        lookup = run_query(sql)
+    except pd.io.sql.DatabaseError:
+        return pd.DataFrame(columns=['Name', 'MappedName'])
+    lookup['DataType'] = 'Vehicle Category'
+    return fill_mapped_names(lookup)[['Name', 'MappedName']]
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_entity_names(dataset_version, data_type):
+    """
+    Returns the sorted names offered in the entity selectbox: the 2W/3W/4W groups for
+    'Vehicle Category', the raw manufacturer names otherwise.
+    """
+    if data_type == "Vehicle Category":
+        return sorted(get_category_lookup(dataset_version)['MappedName'].unique())
+    return sorted(get_raw_names(dataset_version, data_type))
+
+def resolve_raw_names(dataset_version, data_type, selected_name):
+    """Returns the raw Name values behind a selected entity (all categories of a 2W/3W/4W group)."""
+    if data_type == "Vehicle Category":
+        lookup = get_category_lookup(dataset_version)
+        return lookup.loc[lookup['MappedName'] == selected_name, 'Name'].tolist()
+    return [selected_name]
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_year_bounds(dataset_version):
+    """
+    Returns the (min, max) Year across both tables, or (None, None) if they are empty. In the
+    normalized storage mode of migrate_csv_to_sql.py they are read from the fact tables' PeriodId
+    (yyyymm) indexes, since MIN/MAX through the views would join every fact row.
+    """
+    try:
+        normalized = not run_query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fact_annual'").empty
+        if normalized:
+            annual_table, monthly_table, year_col, to_year = "fact_annual", "fact_monthly", "PeriodId", " / 100"
+        else:
+            annual_table, monthly_table, year_col, to_year = "annual_registrations", "monthly_registrations", "Year", ""
+        # Separate scalar MIN/MAX subqueries so each one is a single lookup on the Year (or PeriodId) indexes
+        df = run_query(
+            "SELECT MIN(COALESCE(a_min, m_min), COALESCE(m_min, a_min)) AS MinYear, MAX(COALESCE(a_max, m_max), COALESCE(m_max, a_max)) AS MaxYear FROM ("
+            f"SELECT (SELECT MIN({year_col}){to_year} FROM {annual_table}) AS a_min, (SELECT MIN({year_col}){to_year} FROM {monthly_table}) AS m_min, "
+            f"(SELECT MAX({year_col}){to_year} FROM {annual_table}) AS a_max, (SELECT MAX({year_col}){to_year} FROM {monthly_table}) AS m_max)"
+        )
+    except pd.io.sql.DatabaseError:
+        return None, None
+    if df.empty or pd.isna(df.loc[0, 'MinYear']):
+        return None, None
+    return int(df.loc[0, 'MinYear']), int(df.loc[0, 'MaxYear'])
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def load_filtered_registrations(dataset_version, table_name, data_type, selected_name, year_range):
+    """
+    Loads only the rows of `table_name` needed to show growth for one entity within `year_range`
+    (plus the preceding period), with the same columns and dtypes as load_data_from_db().
+    """
+    raw_names = resolve_raw_names(dataset_version, data_type, selected_name)
+    if not raw_names:
+        return pd.DataFrame()
+    sql, params = build_registrations_query(table_name, data_type, raw_names, year_range, include_previous_period=True)
+    try:
+        df = run_query(sql, params)
+    except pd.io.sql.DatabaseError:
+        st.warning(f"Table '{table_name}' not found in {DB_FILE}. Ensure scraper has completed successfully.")
+        return pd.DataFrame()
+
+    value_col = VALUE_COLUMNS[table_name]
+    df['Year'] = pd.to_numeric(df['Year'], errors='coerce').fillna(0).astype(int)
+    df[value_col] = pd.to_numeric(df[value_col], errors='coerce').fillna(0)
+    if table_name == 'monthly_registrations':
+        df = add_month_key(df)
+    df['MappedName'] = selected_name if data_type == "Vehicle Category" else df['Name']
+    return df
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def load_preview(dataset_version, table_name, rows=5):
+    """Returns the first rows of a table for the dataset preview."""
+    try:
+        df = run_query(f"{select_with_mapped_name(dataset_version, table_name)} LIMIT ?", (rows,))
+    except pd.io.sql.DatabaseError:
+        return pd.DataFrame()
+    if 'Name' in df.columns:
+        df = fill_mapped_names(df)
+    return df
+
+# --- 5. Growth Analysis Functions ---
+def calculate_yoy_growth(df_annual, entity_cols=None):
     """
     Calculates Year-over-Year (YoY) growth for registrations.
     Expects a DataFrame with 'Name' or 'MappedName', 'Year', and 'Registrations' columns.
+    `entity_cols` identify an entity (default: the grouping column); every entity is handled in
+    one groupby, which also sorts, and one groupby-shift.
     """
     # Use 'MappedName' for grouping if it exists, otherwise use 'Name'
     group_col = 'MappedName' if 'MappedName' in df_annual.columns else 'Name'
     if df_annual.empty or 'Year' not in df_annual.columns or 'Registrations' not in df_annual.columns or group_col not in df_annual.columns:
         return pd.DataFrame()
+    entity_cols = entity_cols or [group_col]
 
-    # Aggregate registrations by the grouping column and year
-    df_annual_grouped = df_annual.groupby([group_col, 'Year'])['Registrations'].sum().reset_index()
+    # Aggregate registrations by entity and year; the result is sorted for the shift
+    df_annual_sorted = df_annual.groupby(entity_cols + ['Year'], observed=True)['Registrations'].sum().reset_index()
 
-    # Ensure registrations are numeric and sort
-    df_annual_grouped['Registrations'] = pd.to_numeric(df_annual_grouped['Registrations'], errors='coerce').fillna(0)
-    df_annual_sorted = df_annual_grouped.sort_values(by=[group_col, 'Year']).copy()
+    # Ensure registrations are numeric
+    df_annual_sorted['Registrations'] = pd.to_numeric(df_annual_sorted['Registrations'], errors='coerce').fillna(0)
     
     # Calculate previous year's registrations using shift
-    df_annual_sorted['PrevYearRegistrations'] = df_annual_sorted.groupby([group_col])['Registrations'].shift(1)
+    df_annual_sorted['PrevYearRegistrations'] = df_annual_sorted.groupby(entity_cols, observed=True)['Registrations'].shift(1)
     
     # Calculate YoY Growth and ensure the resulting column is a nullable float type
     yoy_series = ((df_annual_sorted['Registrations'] - df_annual_sorted['PrevYearRegistrations']) / df_annual_sorted['PrevYearRegistrations']) * 100
-    df_annual_sorted['YoYGrowth'] = pd.to_numeric(yoy_series, errors='coerce').replace([float('inf'), -float('inf')], pd.NA).round(2)
+    df_annual_sorted['YoYGrowth'] = pd.to_numeric(yoy_series, errors='coerce').replace([float('inf'), -float('inf')], float('nan')).round(2)
     
     return df_annual_sorted
 
-def calculate_qoq_growth(df_monthly):
+def calculate_qoq_growth(df_monthly, entity_cols=None):
     """
     Calculates Quarter-over-Quarter (QoQ) growth for registrations.
-    Expects a DataFrame with 'Name' or 'MappedName', 'Date', and 'MonthlyRegistrations' columns.
+    Expects a DataFrame with 'Name' or 'MappedName', 'MonthKey', and 'MonthlyRegistrations' columns.
+    Quarters are identified by QuarterKey (quarters since January of PERIOD_EPOCH_YEAR);
+    'YYYY-Qn' labels are only formatted for display. `entity_cols` as in calculate_yoy_growth.
     """
     # Use 'MappedName' for grouping if it exists, otherwise use 'Name'
     group_col = 'MappedName' if 'MappedName' in df_monthly.columns else 'Name'
-    if df_monthly.empty or 'Date' not in df_monthly.columns or 'MonthlyRegistrations' not in df_monthly.columns or group_col not in df_monthly.columns:
+    if df_monthly.empty or 'MonthKey' not in df_monthly.columns or 'MonthlyRegistrations' not in df_monthly.columns or group_col not in df_monthly.columns:
         return pd.DataFrame()
 
-    # Ensure monthly registrations are numeric
-    df_monthly['MonthlyRegistrations'] = pd.to_numeric(df_monthly['MonthlyRegistrations'], errors='coerce').fillna(0)
+    # Ensure monthly registrations are numeric; assign leaves the (possibly shared) input frame untouched
+    df_monthly = df_monthly.assign(
+        MonthlyRegistrations=pd.to_numeric(df_monthly['MonthlyRegistrations'], errors='coerce').fillna(0),
+        QuarterKey=df_monthly['MonthKey'] // 3,
+    )
 
-    # Add Quarter and QuarterYear columns
-    df_monthly['Quarter'] = df_monthly['Date'].dt.quarter
-    df_monthly['QuarterYear'] = df_monthly['Year'].astype(str) + '-Q' + df_monthly['Quarter'].astype(str)
-    
-    # Aggregate monthly registrations to quarterly by the grouping column
-    df_quarterly = df_monthly.groupby([group_col, 'Year', 'Quarter', 'QuarterYear'])['MonthlyRegistrations'].sum().reset_index()
-    df_quarterly.rename(columns={'MonthlyRegistrations': 'QuarterlyRegistrations'}, inplace=True)
-    
-    # Sort for correct shift calculation
-    df_quarterly_sorted = df_quarterly.sort_values(by=[group_col, 'Year', 'Quarter']).copy()
+    entity_cols = entity_cols or [group_col]
+
+    # Aggregate monthly registrations to quarterly by entity; the result is sorted for the shift
+    df_quarterly_sorted = df_monthly.groupby(entity_cols + ['QuarterKey'], observed=True)['MonthlyRegistrations'].sum().reset_index()
+    df_quarterly_sorted.rename(columns={'MonthlyRegistrations': 'QuarterlyRegistrations'}, inplace=True)
+
+    # Derive Year and the quarter number arithmetically from the quarter key
+    df_quarterly_sorted.insert(len(entity_cols), 'Year', PERIOD_EPOCH_YEAR + df_quarterly_sorted['QuarterKey'] // 4)
+    df_quarterly_sorted.insert(len(entity_cols) + 1, 'Quarter', (df_quarterly_sorted['QuarterKey'] % 4 + 1).astype('int32'))
     
     # Calculate previous quarter's registrations using shift
-    df_quarterly_sorted['PrevQuarterRegistrations'] = df_quarterly_sorted.groupby([group_col])['QuarterlyRegistrations'].shift(1)
+    df_quarterly_sorted['PrevQuarterRegistrations'] = df_quarterly_sorted.groupby(entity_cols, observed=True)['QuarterlyRegistrations'].shift(1)
     
     # Calculate QoQ Growth and ensure the resulting column is a nullable float type
     qoq_series = ((df_quarterly_sorted['QuarterlyRegistrations'] - df_quarterly_sorted['PrevQuarterRegistrations']) / df_quarterly_sorted['PrevQuarterRegistrations']) * 100
-    df_quarterly_sorted['QoQGrowth'] = pd.to_numeric(qoq_series, errors='coerce').replace([float('inf'), -float('inf')], pd.NA).round(2)
+    df_quarterly_sorted['QoQGrowth'] = pd.to_numeric(qoq_series, errors='coerce').replace([float('inf'), -float('inf')], float('nan')).round(2)
     
     return df_quarterly_sorted
 
-# --- 5. Streamlit Dashboard Main Function ---
+# --- SQL Growth Engine (window functions, SQLite >= 3.25) ---
+# Year and Quarter -> the integer quarter key used by calculate_qoq_growth
+QUARTER_KEY_SQL = f"(Year - {PERIOD_EPOCH_YEAR}) * 4 + Quarter - 1"
+
+def build_yoy_growth_query(source_sql):
+    """
+    Wraps a query returning (MappedName, Year, Registrations) rows into one that aggregates per
+    MappedName and Year and adds the previous year's registrations and YoY growth with LAG().
+    The growth expression mirrors calculate_yoy_growth: ((current - previous) / previous) * 100,
+    with NULL for the first year of each group and for a previous year of zero.
+    """
+    return f"""
+        WITH grouped AS (
+            SELECT MappedName, Year, SUM(Registrations) AS Registrations
+            FROM ({source_sql})
+            GROUP BY MappedName, Year
+        ),
+        lagged AS (
+            SELECT MappedName, Year, Registrations,
+                   LAG(Registrations) OVER (PARTITION BY MappedName ORDER BY Year) AS PrevYearRegistrations
+            FROM grouped
+        )
+        SELECT MappedName, Year, Registrations, PrevYearRegistrations,
+               ((Registrations - PrevYearRegistrations) * 1.0 / PrevYearRegistrations) * 100 AS YoYGrowth
+        FROM lagged
+        ORDER BY MappedName, Year
+    """
+
+def build_qoq_growth_query(source_sql):
+    """
+    Wraps a query returning (MappedName, Year, Month, MonthlyRegistrations) rows into one that
+    aggregates per MappedName and quarter and adds the previous quarter's registrations and QoQ
+    growth with LAG(), mirroring calculate_qoq_growth.
+    """
+    return f"""
+        WITH monthly AS (
+            SELECT MappedName, Year, {QUARTER_CASE_SQL} AS Quarter, MonthlyRegistrations
+            FROM ({source_sql})
+        ),
+        grouped AS (
+            SELECT MappedName, Year, Quarter, {QUARTER_KEY_SQL} AS QuarterKey,
+                   SUM(MonthlyRegistrations) AS QuarterlyRegistrations
+            FROM monthly
+            WHERE Quarter IS NOT NULL
+            GROUP BY MappedName, Year, Quarter
+        ),
+        lagged AS (
+            SELECT MappedName, Year, Quarter, QuarterKey, QuarterlyRegistrations,
+                   LAG(QuarterlyRegistrations) OVER (PARTITION BY MappedName ORDER BY QuarterKey) AS PrevQuarterRegistrations
+            FROM grouped
+        )
+        SELECT MappedName, Year, Quarter, QuarterKey, QuarterlyRegistrations, PrevQuarterRegistrations,
+               ((QuarterlyRegistrations - PrevQuarterRegistrations) * 1.0 / PrevQuarterRegistrations) * 100 AS QoQGrowth
+        FROM lagged
+        ORDER BY MappedName, QuarterKey
+    """
+
+def build_entity_source_query(dataset_version, table_name, data_type, selected_name, year_range):
+    """
+    Returns (sql, params) selecting the selected entity's rows, labelled with MappedName, as the
+    input of the growth queries. Uses the same filter pushdown as load_filtered_registrations.
+    """
+    raw_names = resolve_raw_names(dataset_version, data_type, selected_name)
+    if not raw_names:
+        return None, None
+    filtered_sql, filtered_params = build_registrations_query(table_name, data_type, raw_names, year_range, include_previous_period=True)
+    value_col = VALUE_COLUMNS[table_name]
+    month_col = "Month, " if table_name == 'monthly_registrations' else ""
+    mapped_name = "? AS MappedName" if data_type == "Vehicle Category" else "Name AS MappedName"
+    mapped_params = [selected_name] if data_type == "Vehicle Category" else []
+    sql = f"SELECT {mapped_name}, Year, {month_col}{value_col} FROM ({filtered_sql})"
+    return sql, mapped_params + filtered_params
+
+def finalize_growth_frame(df, value_col, prev_col, growth_col):
+    """Applies the pandas engine's dtypes and rounding to a growth frame computed in SQLite."""
+    df['Year'] = df['Year'].astype(int)
+    df[value_col] = pd.to_numeric(df[value_col], errors='coerce').fillna(0)
+    df[prev_col] = pd.to_numeric(df[prev_col], errors='coerce').astype(float)
+    df[growth_col] = pd.to_numeric(df[growth_col], errors='coerce').astype(float).round(2)
+    return df
+
+def window_functions_supported():
+    return sqlite3.sqlite_version_info >= (3, 25, 0)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def has_materialized_growth(dataset_version):
+    """True if the database holds populated annual_growth and quarterly_growth tables."""
+    try:
+        df = run_query("SELECT (SELECT COUNT(*) FROM (SELECT 1 FROM annual_growth LIMIT 1)) AS a, (SELECT COUNT(*) FROM (SELECT 1 FROM quarterly_growth LIMIT 1)) AS q")
+    except pd.io.sql.DatabaseError:
+        return False
+    return bool(df.loc[0, 'a']) and bool(df.loc[0, 'q'])
+
+def read_materialized_growth(table_name, columns, data_type, selected_name, year_range):
+    """
+    Reads one entity's precomputed growth rows within `year_range`, plus the latest period before
+    it, i.e. the same rows the 'sql' engine returns.
+    """
+    start, end = int(year_range[0]), int(year_range[1])
+    order_by = "Year, Quarter" if table_name == 'quarterly_growth' else "Year"
+    sql = (
+        f"SELECT {columns} FROM {table_name} WHERE DataType = ? AND MappedName = ? "
+        f"AND Year >= COALESCE((SELECT MAX(Year) FROM {table_name} WHERE DataType = ? AND MappedName = ? AND Year < ?), ?) "
+        f"AND Year <= ? ORDER BY {order_by}"
+    )
+    return run_query(sql, (data_type, selected_name, data_type, selected_name, start, start, end))
+
+# --- Bulk Growth Engine (every entity at once, per dataset version) ---
+def get_dataset_version():
+    """
+    Returns a version key for the database contents: the size and modification time of DB_FILE and,
+    in WAL mode, of its -wal file, which is where commits land until a checkpoint copies them over.
+    """
+    stat = os.stat(DB_FILE)
+    version = f"{stat.st_size}-{stat.st_mtime_ns}"
+    if os.path.exists(DB_FILE + "-wal"):
+        wal_stat = os.stat(DB_FILE + "-wal")
+        version += f"-{wal_stat.st_size}-{wal_stat.st_mtime_ns}"
+    return version
+
+def build_growth_index(growth):
+    """Maps each (DataType, MappedName) of a growth table to the positions of its rows."""
+    if growth.empty:
+        return {}
+    return growth.groupby(['DataType', 'MappedName'], observed=True, sort=False).indices
+
+@st.cache_resource(max_entries=1)
+def load_growth_engine(dataset_version):
+    """
+    Returns (annual_growth, quarterly_growth, annual_index, quarterly_index) with YoY/QoQ for every
+    (DataType, MappedName), computed in one pass each from load_data_from_db(). It is built once
+    per dataset version and shared by all sessions without copying, so the frames must not be
+    modified; get_entity_growth returns copies of their rows. The growth tables go through the shared
+    store like the frames, so only the first worker process computes them.
+    """
+    shared_growth = load_shared_frames(dataset_version, ("annual_growth", "quarterly_growth"))
+    if shared_growth is not None:
+        annual_growth, quarterly_growth = shared_growth
+    else:
+        calendar_data, monthly_data = load_data_from_db(dataset_version)
+        annual_growth = calculate_yoy_growth(calendar_data, entity_cols=['DataType', 'MappedName'])
+        quarterly_growth = calculate_qoq_growth(monthly_data, entity_cols=['DataType', 'MappedName'])
+        publish_shared_frames(dataset_version, {"annual_growth": annual_growth, "quarterly_growth": quarterly_growth})
+    return annual_growth, quarterly_growth, build_growth_index(annual_growth), build_growth_index(quarterly_growth)
+
+def get_entity_growth(growth, growth_index, data_type, selected_name, year_range):
+    """
+    Returns one entity's rows of a bulk growth table, found through its index (a dict lookup, no
+    scan), within `year_range` plus the latest year before it, i.e. the rows the 'materialized'
+    engine returns.
+    """
+    positions = growth_index.get((data_type, selected_name))
+    if positions is None:
+        return pd.DataFrame()
+    df = growth.take(positions).drop(columns='DataType')
+    start, end = int(year_range[0]), int(year_range[1])
+    earlier_years = df.loc[df['Year'] < start, 'Year']
+    first_year = earlier_years.max() if not earlier_years.empty else start
+    df = df[(df['Year'] >= first_year) & (df['Year'] <= end)].reset_index(drop=True)
+    df['MappedName'] = df['MappedName'].astype(object)
+    return df
+
+# --- Multi-Entity Comparison ---
+def get_comparison_growth(growth, growth_index, data_type, names, year_range, period_col, growth_col):
+    """
+    Returns (rows, truncated): the growth rows of several entities within `year_range` that have a
+    growth value, taken from the growth table in one slice of their concatenated index positions.
+    If they exceed COMPARISON_MAX_POINTS, only the latest periods that fit are kept.
+    """
+    positions = [growth_index[(data_type, name)] for name in names if (data_type, name) in growth_index]
+    if not positions:
+        return pd.DataFrame(), False
+    df = growth.take(np.concatenate(positions))
+    df = df[(df['Year'] >= year_range[0]) & (df['Year'] <= year_range[1])].dropna(subset=[growth_col])
+    return limit_comparison_points(df, period_col, len(positions))
+
+def limit_comparison_points(df, period_col, entity_count):
+    """
+    Keeps only the latest periods of the comparison rows `df` that fit in COMPARISON_MAX_POINTS for
+    `entity_count` entities and sorts them by period, keeping each period's entities in their order.
+    Returns (rows, truncated).
+    """
+    truncated = len(df) > COMPARISON_MAX_POINTS
+    if truncated:
+        periods = np.sort(df[period_col].unique())
+        kept_periods = max(1, COMPARISON_MAX_POINTS // entity_count)
+        df = df[df[period_col] >= periods[-kept_periods]]
+    df = df.sort_values(period_col, kind='stable').reset_index(drop=True)
+    df['MappedName'] = df['MappedName'].astype(object)
+    return df, truncated
+
+def read_materialized_comparison(growth_type, data_type, names, year_range):
+    """
+    Reads the comparison rows of `names` within `year_range` that have a growth value from the
+    materialized growth table, in one query, ordered like get_comparison_growth. Returns (rows, truncated).
+    """
+    growth_col, value_col, prev_col = GROWTH_COLUMNS[growth_type]
+    if growth_type == "YoY Growth":
+        table_name, period_col, period_columns, order_by = 'annual_growth', 'Year', "Year", "Year"
+    else:
+        table_name, period_col, period_columns, order_by = 'quarterly_growth', 'QuarterKey', f"Year, Quarter, {QUARTER_KEY_SQL} AS QuarterKey", "Year, Quarter"
+    placeholders = ", ".join("?" * len(names))
+    sql = (
+        f"SELECT MappedName, {period_columns}, {value_col}, {prev_col}, {growth_col} FROM {table_name} "
+        f"WHERE DataType = ? AND MappedName IN ({placeholders}) AND Year >= ? AND Year <= ? AND {growth_col} IS NOT NULL "
+        f"ORDER BY MappedName, {order_by}"
+    )
+    df = run_query(sql, [data_type] + list(names) + [int(year_range[0]), int(year_range[1])])
+    if df.empty:
+        return pd.DataFrame(), False
+    df = finalize_growth_frame(df, value_col, prev_col, growth_col)
+    if period_col == 'QuarterKey':
+        df['QuarterKey'] = df['QuarterKey'].astype('int32')
+    # Group the rows in the order `names` were selected, as get_comparison_growth concatenates them
+    name_order = {name: position for position, name in enumerate(dict.fromkeys(names))}
+    df = df.iloc[np.argsort(df['MappedName'].map(name_order).to_numpy(), kind='stable')]
+    entity_count = df['MappedName'].nunique()
+    if len(df) > COMPARISON_MAX_POINTS: # Share the points among every selected entity with growth rows, in range or not
+        entity_count = int(run_query(f"SELECT COUNT(DISTINCT MappedName) AS Entities FROM {table_name} WHERE DataType = ? AND MappedName IN ({placeholders})",
+                                     [data_type] + list(names)).loc[0, 'Entities'])
+    return limit_comparison_points(df, period_col, entity_count)
+
+# --- Top Movers Leaderboard ---
+def build_ranking_index(growth, period_col, metric_cols):
+    """
+    Ranks the Manufacturer rows of a growth table within each period. Returns
+    {metric: {period: row positions}} with each array sorted by the metric, highest first, and rows
+    where the metric is NaN left out. One lexsort per metric ranks every period at once, so a
+    top-N query is a slice of a presorted array.
+    """
+    if growth.empty:
+        return {metric: {} for metric in metric_cols}
+    rows = np.flatnonzero((growth['DataType'] == 'Manufacturer').to_numpy())
+    periods = growth[period_col].to_numpy()[rows]
+    ranking = {}
+    for metric in metric_cols:
+        values = growth[metric].to_numpy(dtype=float)[rows]
+        ranked = ~np.isnan(values)
+        order = np.lexsort((-values[ranked], periods[ranked])) # By period, then metric descending
+        metric_rows, metric_periods = rows[ranked][order], periods[ranked][order]
+        if len(metric_rows) == 0:
+            ranking[metric] = {}
+            continue
+        starts = np.flatnonzero(np.diff(metric_periods)) + 1
+        ranking[metric] = dict(zip(metric_periods[np.r_[0, starts]].tolist(), np.split(metric_rows, starts)))
+    return ranking
+
+@st.cache_resource(max_entries=1)
+def load_ranking_index(dataset_version):
+    """Returns the (annual, quarterly) rankings of the growth tables, built once per dataset version."""
+    annual_growth, quarterly_growth, _, _ = load_growth_engine(dataset_version)
+    return (build_ranking_index(annual_growth, 'Year', ['YoYGrowth', 'Registrations']),
+            build_ranking_index(quarterly_growth, 'QuarterKey', ['QoQGrowth', 'QuarterlyRegistrations']))
+
+def get_leaderboard(growth, ranking, metric, period, n, highest=True):
+    """Returns the `n` manufacturers with the highest (or lowest) `metric` in `period`, with a Rank column."""
+    positions = ranking[metric].get(period, np.array([], dtype=np.intp))
+    positions = positions[:n] if highest else positions[::-1][:n]
+    leaderboard = growth.take(positions).reset_index(drop=True)
+    leaderboard.insert(0, 'Rank', np.arange(1, len(leaderboard) + 1))
+    return leaderboard
+
+def materialized_period_filter(growth_type):
+    """Returns (table_name, WHERE clause matching one period) of the materialized growth table behind `growth_type`."""
+    if growth_type == "YoY Growth":
+        return 'annual_growth', "Year = ?"
+    return 'quarterly_growth', "Year = ? AND Quarter = ?"
+
+def materialized_period_params(growth_type, period):
+    """Splits a leaderboard period (a Year, or a QuarterKey) into the parameters of materialized_period_filter."""
+    if growth_type == "YoY Growth":
+        return [int(period)]
+    return [PERIOD_EPOCH_YEAR + int(period) // 4, int(period) % 4 + 1]
+
+def read_materialized_periods(growth_type, year_range):
+    """Returns the periods within `year_range` with ranked manufacturers in the materialized growth table, oldest first."""
+    start, end = int(year_range[0]), int(year_range[1])
+    if growth_type == "YoY Growth":
+        sql = ("SELECT DISTINCT Year AS Period FROM annual_growth WHERE DataType = 'Manufacturer' "
+               "AND Year >= ? AND Year <= ? AND Registrations IS NOT NULL ORDER BY Period")
+    else:
+        sql = (f"SELECT DISTINCT {QUARTER_KEY_SQL} AS Period FROM quarterly_growth WHERE DataType = 'Manufacturer' "
+               "AND Year >= ? AND Year <= ? AND QuarterlyRegistrations IS NOT NULL ORDER BY Period")
+    return run_query(sql, (start, end))['Period'].astype(int).tolist()
+
+def read_materialized_leaderboard(growth_type, metric, period, n, highest=True):
+    """
+    Reads the `n` manufacturers with the highest (or lowest) `metric` in `period` from the materialized
+    growth table, with a Rank column, so SQLite returns only the ranked rows. Ties keep the order of
+    get_leaderboard.
+    """
+    growth_col, value_col, prev_col = GROWTH_COLUMNS[growth_type]
+    table_name, period_filter = materialized_period_filter(growth_type)
+    order_by = f"{metric} DESC, MappedName" if highest else f"{metric} ASC, MappedName DESC"
+    sql = (
+        f"SELECT MappedName, Year, {value_col}, {prev_col}, {growth_col} FROM {table_name} "
+        f"WHERE DataType = 'Manufacturer' AND {period_filter} AND {metric} IS NOT NULL ORDER BY {order_by} LIMIT ?"
+    )
+    df = run_query(sql, materialized_period_params(growth_type, period) + [int(n)])
+    leaderboard = finalize_growth_frame(df, value_col, prev_col, growth_col).drop(columns='Year')
+    leaderboard.insert(0, 'Rank', np.arange(1, len(leaderboard) + 1))
+    return leaderboard
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_yoy_growth(dataset_version, data_type, selected_name, year_range):
+    """
+    Returns the YoY growth table for one entity. With GROWTH_ENGINE = 'bulk' it is looked up in the
+    growth computed for every entity by load_growth_engine. With 'materialized' the rows are read
+    from annual_growth (refreshed by the scraper and the migration). With 'sql', or when that table is
+    not populated, the aggregation, LAG() and growth are computed inside SQLite and only the final
+    series is read; otherwise (or if the SQLite build lacks window functions) calculate_yoy_growth
+    runs on the filtered rows in pandas.
+    """
+    if GROWTH_ENGINE == "bulk":
+        annual_growth, _, annual_index, _ = load_growth_engine(dataset_version)
+        df = get_entity_growth(annual_growth, annual_index, data_type, selected_name, year_range)
+        return finalize_growth_frame(df, 'Registrations', 'PrevYearRegistrations', 'YoYGrowth') if not df.empty else pd.DataFrame()
+    if GROWTH_ENGINE == "materialized" and has_materialized_growth(dataset_version):
+        df = read_materialized_growth('annual_growth', "MappedName, Year, Registrations, PrevYearRegistrations, YoYGrowth",
+                                      data_type, selected_name, year_range)
+        return finalize_growth_frame(df, 'Registrations', 'PrevYearRegistrations', 'YoYGrowth') if not df.empty else pd.DataFrame()
+    if GROWTH_ENGINE in ("materialized", "sql") and window_functions_supported():
+        sql, params = build_entity_source_query(dataset_version, 'annual_registrations', data_type, selected_name, year_range)
+        if sql is None:
+            return pd.DataFrame()
+        try:
+            df = run_query(build_yoy_growth_query(sql), params)
+            return finalize_growth_frame(df, 'Registrations', 'PrevYearRegistrations', 'YoYGrowth') if not df.empty else pd.DataFrame()
+        except (pd.io.sql.DatabaseError, sqlite3.Error) as e:
+            st.warning(f"SQL growth engine failed ({e}); falling back to pandas.")
+    return calculate_yoy_growth(load_filtered_registrations(dataset_version, 'annual_registrations', data_type, selected_name, year_range).copy())
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_qoq_growth(dataset_version, data_type, selected_name, year_range):
+    """Returns the QoQ growth table for one entity, see get_yoy_growth."""
+    if GROWTH_ENGINE == "bulk":
+        _, quarterly_growth, _, quarterly_index = load_growth_engine(dataset_version)
+        df = get_entity_growth(quarterly_growth, quarterly_index, data_type, selected_name, year_range)
+        return finalize_growth_frame(df, 'QuarterlyRegistrations', 'PrevQuarterRegistrations', 'QoQGrowth') if not df.empty else pd.DataFrame()
+    if GROWTH_ENGINE == "materialized" and has_materialized_growth(dataset_version):
+        df = read_materialized_growth('quarterly_growth', f"MappedName, Year, Quarter, {QUARTER_KEY_SQL} AS QuarterKey, QuarterlyRegistrations, PrevQuarterRegistrations, QoQGrowth",
+                                      data_type, selected_name, year_range)
+        if df.empty:
+            return pd.DataFrame()
+        df['Quarter'] = df['Quarter'].astype('int32')
+        df['QuarterKey'] = df['QuarterKey'].astype('int32')
+        return finalize_growth_frame(df, 'QuarterlyRegistrations', 'PrevQuarterRegistrations', 'QoQGrowth')
+    if GROWTH_ENGINE in ("materialized", "sql") and window_functions_supported():
+        sql, params = build_entity_source_query(dataset_version, 'monthly_registrations', data_type, selected_name, year_range)
+        if sql is None:
+            return pd.DataFrame()
+        try:
+            df = run_query(build_qoq_growth_query(sql), params)
+            if df.empty:
+                return pd.DataFrame()
+            df['Quarter'] = df['Quarter'].astype('int32') # Same dtypes as calculate_qoq_growth
+            df['QuarterKey'] = df['QuarterKey'].astype('int32')
+            return finalize_growth_frame(df, 'QuarterlyRegistrations', 'PrevQuarterRegistrations', 'QoQGrowth')
+        except (pd.io.sql.DatabaseError, sqlite3.Error) as e:
+            st.warning(f"SQL growth engine failed ({e}); falling back to pandas.")
+    return calculate_qoq_growth(load_filtered_registrations(dataset_version, 'monthly_registrations', data_type, selected_name, year_range).copy())
+
+# --- Cached Dashboard Artifacts ---
+# Every widget change reruns main_dashboard. Each artifact below is cached on the inputs it depends
+# on, so a rerun only recomputes what the changed widget affects.
+# Table, registrations and previous-period columns behind each growth metric
+GROWTH_COLUMNS = {
+    "YoY Growth": ('YoYGrowth', 'Registrations', 'PrevYearRegistrations'),
+    "QoQ Growth": ('QoQGrowth', 'QuarterlyRegistrations', 'PrevQuarterRegistrations'),
+}
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_growth_view(dataset_version, data_type, selected_name, growth_type, year_range):
+    """
+    Returns the selected entity's growth rows within `year_range` as the growth table shows them
+    (QoQ rows need a growth value and get their QuarterYear label), or None if the entity has no
+    growth data at all.
+    """
+    if growth_type == "YoY Growth":
+        # Only the selected entity's growth in range (computed from the rows in range plus the year before) is read
+        yoy_df = get_yoy_growth(dataset_version, data_type, selected_name, year_range)
+        if yoy_df.empty:
+            return None
+        return yoy_df[(yoy_df['Year'] >= year_range[0]) & (yoy_df['Year'] <= year_range[1])]
+
+    # Only the selected entity's growth in range (computed from the rows in range plus the quarter before) is read
+    qoq_df = get_qoq_growth(dataset_version, data_type, selected_name, year_range)
+    if qoq_df.empty:
+        return None
+    display_qoq_df = qoq_df[
+        (qoq_df['Year'] >= year_range[0]) &
+        (qoq_df['Year'] <= year_range[1])
+    ].dropna(subset=['QoQGrowth']).copy()
+    display_qoq_df['QuarterYear'] = format_quarter_labels(display_qoq_df['QuarterKey'])
+    return display_qoq_df
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def build_growth_figure(dataset_version, data_type, selected_name, growth_type, year_range):
+    """Returns the growth trend figure for one selection."""
+    display_df = get_growth_view(dataset_version, data_type, selected_name, growth_type, year_range)
+    if growth_type == "YoY Growth":
+        fig = px.line(display_df,
+                      x='Year',
+                      y='YoYGrowth',
+                      title=f"YoY Growth for {selected_name}",
+                      labels={'YoYGrowth': 'YoY Growth (%)', 'Year': 'Year'},
+                      markers=True)
+    else:
+        # Plot in quarter key order, labelled by QuarterYear
+        fig = px.line(display_df.sort_values('QuarterKey'),
+                      x='QuarterYear',
+                      y='QoQGrowth',
+                      title=f"QoQ Growth for {selected_name}",
+                      labels={'QoQGrowth': 'QoQ Growth (%)', 'QuarterYear': 'Quarter'},
+                      markers=True)
+    fig.update_traces(mode='lines+markers')
+    return fig
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def build_comparison_figure(dataset_version, data_type, names, growth_type, year_range):
+    """
+    Returns (figure, truncated) for the comparison chart of `names`, with figure None if they have no
+    data. Their rows are read from the materialized growth tables when populated, else from load_growth_engine.
+    """
+    if has_materialized_growth(dataset_version):
+        comparison_df, truncated = read_materialized_comparison(growth_type, data_type, names, year_range)
+    else:
+        annual_growth, quarterly_growth, annual_index, quarterly_index = load_growth_engine(dataset_version)
+        if growth_type == "YoY Growth":
+            comparison_df, truncated = get_comparison_growth(annual_growth, annual_index, data_type, names, year_range, 'Year', 'YoYGrowth')
+        else:
+            comparison_df, truncated = get_comparison_growth(quarterly_growth, quarterly_index, data_type, names, year_range, 'QuarterKey', 'QoQGrowth')
+    if growth_type == "YoY Growth":
+        x_col, y_col, category_orders = 'Year', 'YoYGrowth', {}
+    else:
+        x_col, y_col = 'QuarterYear', 'QoQGrowth'
+        if not comparison_df.empty:
+            comparison_df['QuarterYear'] = format_quarter_labels(comparison_df['QuarterKey'])
+        category_orders = {'QuarterYear': comparison_df['QuarterYear'].unique().tolist()} if not comparison_df.empty else {}
+    if comparison_df.empty:
+        return None, False
+    fig = px.line(comparison_df,
+                  x=x_col,
+                  y=y_col,
+                  color='MappedName',
+                  title=f"{growth_type} Comparison",
+                  labels={y_col: f"{growth_type} (%)", 'QuarterYear': 'Quarter', 'MappedName': data_type},
+                  category_orders=category_orders,
+                  markers=True)
+    return fig, truncated
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_leaderboard_periods(dataset_version, growth_type, year_range):
+    """
+    Returns {period: label} for the periods within `year_range` the leaderboard can rank, oldest first.
+    They are read from the materialized growth tables when populated, else from load_ranking_index.
+    """
+    if has_materialized_growth(dataset_version):
+        periods = read_materialized_periods(growth_type, year_range)
+        if growth_type == "YoY Growth":
+            return {year: str(year) for year in periods}
+        return dict(zip(periods, format_quarter_labels(pd.Series(periods, dtype='int64')).tolist()))
+    annual_ranking, quarterly_ranking = load_ranking_index(dataset_version)
+    if growth_type == "YoY Growth":
+        periods = [year for year in sorted(annual_ranking['Registrations']) if year_range[0] <= year <= year_range[1]]
+        return {year: str(year) for year in periods}
+    periods = [key for key in sorted(quarterly_ranking['QuarterlyRegistrations']) if year_range[0] <= PERIOD_EPOCH_YEAR + key // 4 <= year_range[1]]
+    return dict(zip(periods, format_quarter_labels(pd.Series(periods, dtype='int64')).tolist()))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
+def get_leaderboard_view(dataset_version, growth_type, period, rank_by_growth, n, highest):
+    """
+    Returns the leaderboard table for one selection of period, ranking metric, size and direction,
+    ranked by SQLite from the materialized growth tables when populated, else from load_ranking_index.
+    """
+    growth_col, value_col, prev_col = GROWTH_COLUMNS[growth_type]
+    if has_materialized_growth(dataset_version):
+        leaderboard = read_materialized_leaderboard(growth_type, growth_col if rank_by_growth else value_col, period, n, highest=highest)
+        return leaderboard[['Rank', 'MappedName', value_col, prev_col, growth_col]]
+    annual_growth, quarterly_growth, _, _ = load_growth_engine(dataset_version)
+    annual_ranking, quarterly_ranking = load_ranking_index(dataset_version)
+    growth, ranking = (annual_growth, annual_ranking) if growth_type == "YoY Growth" else (quarterly_growth, quarterly_ranking)
+    leaderboard = get_leaderboard(growth, ranking, growth_col if rank_by_growth else value_col, period, n, highest=highest)
+    return leaderboard[['Rank', 'MappedName', value_col, prev_col, growth_col]]
+
+# --- 6. Streamlit Dashboard Main Function ---
 def main_dashboard():
     st.set_page_config(layout="wide", page_title="Vehicle Registration Dashboard 🚗")
     st.title("🚗📈 Vehicle Registration Growth Analysis")
@@ -179,10 +955,16 @@ def main_dashboard():
     """)
     st.markdown("---")
 
-    # Load and preprocess data using the SQL function
-    calendar_data, monthly_data = load_data_from_db()
+    if not os.path.exists(DB_FILE):
+        st.error(f"Error: The database file '{DB_FILE}' was not found. Please run 'sql_scraper.py' or 'migrate_csv_to_sql.py' first.")
+        st.stop()
 
-    if calendar_data.empty and monthly_data.empty:
+    # Only the year bounds are read up front; rows are queried per selection below
+    # Every cached read below is keyed on the dataset version, so a new scrape or migration is picked up on the next rerun
+    dataset_version = get_dataset_version()
+    min_year_db, max_year_db = get_year_bounds(dataset_version)
+
+    if min_year_db is None:
         st.error("No data loaded. Please ensure the database is populated correctly.")
         st.stop()
 
@@ -204,20 +986,8 @@ def main_dashboard():
     st.sidebar.markdown("---")
 
     # Dynamic filter for Name (Vehicle Category Group or Manufacturer Name)
-    unique_names = []
-    if data_type_filter == "Vehicle Category":
-        # Use 'MappedName' for the selectbox options
-        if not calendar_data.empty:
-            unique_names.extend(calendar_data[calendar_data['DataType'] == 'Vehicle Category']['MappedName'].unique())
-        if not monthly_data.empty:
-            unique_names.extend(monthly_data[monthly_data['DataType'] == 'Vehicle Category']['MappedName'].unique())
-    else: # Manufacturer
-        if not calendar_data.empty:
-            unique_names.extend(calendar_data[calendar_data['DataType'] == 'Manufacturer']['Name'].unique())
-        if not monthly_data.empty:
-            unique_names.extend(monthly_data[monthly_data['DataType'] == 'Manufacturer']['Name'].unique())
-    
-    unique_names = sorted(list(set(unique_names)))
+    # 'MappedName' groups (2W/3W/4W) for vehicle categories, raw names for manufacturers
+    unique_names = get_entity_names(dataset_version, data_type_filter)
     
     if not unique_names:
         st.warning("No names (categories/manufacturers) found in the loaded data for filtering.")
@@ -231,15 +1001,8 @@ def main_dashboard():
     st.sidebar.markdown("---")
 
     # Date Range Selection
-    min_year_data = pd.Timestamp.now().year
-    max_year_data = pd.Timestamp.now().year
-    
-    if not calendar_data.empty and 'Year' in calendar_data.columns:
-        min_year_data = min(min_year_data, calendar_data['Year'].min())
-        max_year_data = max(max_year_data, calendar_data['Year'].max())
-    if not monthly_data.empty and 'Year' in monthly_data.columns:
-        min_year_data = min(min_year_data, monthly_data['Year'].min())
-        max_year_data = max(max_year_data, monthly_data['Year'].max())
+    min_year_data = min(pd.Timestamp.now().year, min_year_db)
+    max_year_data = max(pd.Timestamp.now().year, max_year_db)
 
     year_range = st.sidebar.slider(
         "Select Year Range:",
@@ -255,34 +1018,16 @@ def main_dashboard():
 
     insight_message = ""
     if growth_type_filter == "YoY Growth":
-        # Use 'MappedName' for filtering if applicable
-        filter_col = 'MappedName' if data_type_filter == "Vehicle Category" else 'Name'
-        filtered_annual_data = calendar_data[
-            (calendar_data['DataType'] == data_type_filter) &
-            (calendar_data[filter_col] == selected_name)
-        ].copy()
-
-        yoy_df = calculate_yoy_growth(filtered_annual_data)
+        # The selected entity's YoY growth within the year range
+        display_yoy_df = get_growth_view(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range)
         
-        if not yoy_df.empty:
-            display_yoy_df = yoy_df[
-                (yoy_df['Year'] >= year_range[0]) & 
-                (yoy_df['Year'] <= year_range[1])
-            ]
-            
+        if display_yoy_df is not None:
             if not display_yoy_df.empty:
                 st.subheader("Year-over-Year Growth Table")
                 st.dataframe(display_yoy_df[['Year', 'Registrations', 'PrevYearRegistrations', 'YoYGrowth']].set_index('Year').style.format({"Registrations": "{:,.0f}", "PrevYearRegistrations": "{:,.0f}", "YoYGrowth": "{:.2f}%"}))
 
                 st.subheader("Year-over-Year Growth Trend")
-                fig_yoy = px.line(display_yoy_df, 
-                                x='Year', 
-                                y='YoYGrowth', 
-                                title=f"YoY Growth for {selected_name}",
-                                labels={'YoYGrowth': 'YoY Growth (%)', 'Year': 'Year'},
-                                markers=True)
-                fig_yoy.update_traces(mode='lines+markers')
-                st.plotly_chart(fig_yoy, use_container_width=True)
+                st.plotly_chart(build_growth_figure(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range), use_container_width=True)
 
                 st.info(f"YoY Growth is calculated as ((Current Year Registrations - Previous Year Registrations) / Previous Year Registrations) * 100.")
                 
@@ -308,34 +1053,16 @@ def main_dashboard():
             st.warning("YoY growth data could not be computed. Please check the raw data and filters.")
     
     elif growth_type_filter == "QoQ Growth":
-        # Use 'MappedName' for filtering if applicable
-        filter_col = 'MappedName' if data_type_filter == "Vehicle Category" else 'Name'
-        filtered_monthly_data = monthly_data[
-            (monthly_data['DataType'] == data_type_filter) &
-            (monthly_data[filter_col] == selected_name)
-        ].copy()
-
-        qoq_df = calculate_qoq_growth(filtered_monthly_data)
+        # The selected entity's QoQ growth within the year range
+        display_qoq_df = get_growth_view(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range)
         
-        if not qoq_df.empty:
-            display_qoq_df = qoq_df[
-                (qoq_df['Year'] >= year_range[0]) & 
-                (qoq_df['Year'] <= year_range[1])
-            ].dropna(subset=['QoQGrowth'])
-            
+        if display_qoq_df is not None:
             if not display_qoq_df.empty:
                 st.subheader("Quarter-over-Quarter Growth Table")
                 st.dataframe(display_qoq_df[['QuarterYear', 'QuarterlyRegistrations', 'PrevQuarterRegistrations', 'QoQGrowth']].set_index('QuarterYear').style.format({"QuarterlyRegistrations": "{:,.0f}", "PrevQuarterRegistrations": "{:,.0f}", "QoQGrowth": "{:.2f}%"}))
 
                 st.subheader("Quarter-over-Quarter Growth Trend")
-                fig_qoq = px.line(display_qoq_df.sort_values('QuarterYear'), 
-                                x='QuarterYear', 
-                                y='QoQGrowth', 
-                                title=f"QoQ Growth for {selected_name}",
-                                labels={'QoQGrowth': 'QoQ Growth (%)', 'QuarterYear': 'Quarter'},
-                                markers=True)
-                fig_qoq.update_traces(mode='lines+markers')
-                st.plotly_chart(fig_qoq, use_container_width=True)
+                st.plotly_chart(build_growth_figure(dataset_version, data_type_filter, selected_name, growth_type_filter, year_range), use_container_width=True)
 
                 st.info(f"QoQ Growth is calculated as ((Current Quarter Registrations - Previous Quarter Registrations) / Previous Quarter Registrations) * 100.")
 
@@ -367,21 +1094,63 @@ def main_dashboard():
     else:
         st.write("Select a data type, entity, and growth metric to generate insights. Ensure sufficient data is available for the selected period.")
 
+    # --- Multi-Entity Comparison ---
+    st.markdown("---")
+    st.subheader(f"📊 {growth_type_filter} Comparison")
+    compare_names = st.multiselect(
+        f"Select up to {COMPARISON_MAX_ENTITIES} entries to compare:",
+        unique_names,
+        default=[selected_name],
+        max_selections=COMPARISON_MAX_ENTITIES,
+        help="Each selected entry is drawn as one line of the same chart."
+    )
+    if compare_names:
+        fig_compare, truncated = build_comparison_figure(dataset_version, data_type_filter, tuple(compare_names), growth_type_filter, year_range)
+        if fig_compare is not None:
+            st.plotly_chart(fig_compare, use_container_width=True)
+            if truncated:
+                st.caption(f"Only the latest periods are shown, to keep the chart under {COMPARISON_MAX_POINTS} points.")
+        else:
+            st.info(f"No {growth_type_filter} data for the selected entries in the selected year range ({year_range[0]}-{year_range[1]}).")
+
+    # --- Top Movers Leaderboard ---
+    st.markdown("---")
+    st.subheader(f"🏆 Top Movers: Manufacturers by {growth_type_filter}")
+    period_labels = get_leaderboard_periods(dataset_version, growth_type_filter, year_range)
+    if period_labels:
+        periods = list(period_labels)
+        col1, col2, col3, col4 = st.columns(4)
+        period = col1.selectbox("Period:", periods, index=len(periods) - 1, format_func=period_labels.get)
+        rank_by = col2.radio("Rank by:", [growth_type_filter, "Registrations"], horizontal=True)
+        direction = col3.radio("Show:", ["Highest", "Lowest"], horizontal=True)
+        top_n = col4.number_input("Manufacturers:", min_value=1, max_value=500, value=LEADERBOARD_SIZE, step=5)
+
+        leaderboard = get_leaderboard_view(dataset_version, growth_type_filter, period, rank_by == growth_type_filter, int(top_n), direction == "Highest")
+        if not leaderboard.empty:
+            growth_col, value_col, prev_col = GROWTH_COLUMNS[growth_type_filter]
+            st.dataframe(leaderboard.set_index('Rank').style.format({value_col: "{:,.0f}", prev_col: "{:,.0f}", growth_col: "{:.2f}%"}, na_rep="-"))
+        else:
+            st.info(f"No manufacturer has {rank_by} data for {period_labels[period]}.")
+    else:
+        st.info(f"No manufacturer growth data in the selected year range ({year_range[0]}-{year_range[1]}).")
+
     st.markdown("---")
     st.subheader("Dataset Previews")
     col1, col2 = st.columns(2)
     with col1:
         st.write("#### Annual Data (for YoY)")
-        # Display only head for preview, if calendar_data is not empty
-        if not calendar_data.empty:
-            st.dataframe(calendar_data.head())
+        # Display only head for preview, if the table is not empty
+        calendar_preview = load_preview(dataset_version, 'annual_registrations')
+        if not calendar_preview.empty:
+            st.dataframe(calendar_preview)
         else:
             st.info("No annual data available.")
     with col2:
         st.write("#### Monthly Data (for QoQ)")
-        # Display only head for preview, if monthly_data is not empty
-        if not monthly_data.empty:
-            st.dataframe(monthly_data.head())
+        # Display only head for preview, if the table is not empty
+        monthly_preview = load_preview(dataset_version, 'monthly_registrations')
+        if not monthly_preview.empty:
+            st.dataframe(monthly_preview)
         else:
             st.info("No monthly data available.")
 
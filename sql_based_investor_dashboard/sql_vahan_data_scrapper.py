@@ -15,27 +15,35 @@ from datetime import datetime
 import io
 import sqlite3 # Import the sqlite3 module
 import re # For regex to extract year from filenames (for naming)
+import queue
+import threading
+import argparse
+import hashlib # Content hashes of the scraped tables
+from concurrent.futures import ThreadPoolExecutor # For the pool of browser workers
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import xml.etree.ElementTree as ET # JSF partial responses are XML
+import requests # Request replay engine (no browser)
+from vahan_growth import DASHBOARD_INDEXES, get_storage_mode, create_category_map, create_growth_tables, refresh_growth_tables
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The shared vahan_crawl module lives in the repository root
+from vahan_crawl import LOCATORS, WAIT_TIMEOUT, OPEN_YEARS, get_panel_state, wait_until_settled, print_wait_report
+from vahan_crawl import build_scrape_jobs, create_crawl_ledger, plan_crawl_jobs, update_crawl_job
 
 # --- Configuration ---
 VAHAN_DASHBOARD_URL = "https://vahan.parivahan.gov.in/vahan4dashboard/vahan/view/reportview.xhtml"
 DB_FILE = "../vahan_data.db" # Name of your SQLite database file
 HTML_BACKUP_DIR = "html_backups" # HTML backup for debugging (optional, but good practice)
 BROWSER = "edge" # Choose 'chrome' or 'edge'
-WAIT_TIMEOUT = 30 # Maximum wait time for webdriver (in seconds)
-SLEEP_AFTER_ACTION = 3 # Increased delay after each interaction (in seconds)
-
-# XPath Locators
-LOCATORS = {
-    "y_axis_dropdown_id": "yaxisVar",
-    "x_axis_dropdown_id": "xaxisVar",
-    "year_type_dropdown_id": "selectedYearType",
-    "single_select_year_dropdown_id": "selectedYear",
-    "multi_select_year_dropdown_id": "yearList",
-    "refresh_button": (By.XPATH, "//button[contains(@class, 'ui-button') and .//span[contains(@class, 'ui-icon-refresh')]]"),
-    "main_table_panel_id": "combTablePnl",
-    "loading_overlay_blocker": (By.ID, "j_idt132_blocker"),
-    "dropdown_options": (By.XPATH, ".//ul[contains(@class, 'ui-selectonemenu-list')]/li[contains(@class, 'ui-selectonemenu-item')]")
-}
+SCRAPE_ENGINE = "replay" # 'replay' posts the dashboard's JSF requests directly; 'browser' drives Selenium. Jobs replay cannot run fall back to the browser
+HTTP_TIMEOUT = 60 # Seconds to wait for a replayed request
+SCRAPE_WORKERS = 3 # Browser sessions crawling in parallel; 1 walks every combination serially in one visible browser
+MAX_SCRAPE_WORKERS = 4 # Politeness cap: never more concurrent sessions against the Vahan portal than this
+HEADLESS_WORKERS = True # Run the pooled browser sessions without a window
+TARGET_Y_AXIS_OPTIONS = ["Vehicle Category", "Maker"]
+TARGET_X_AXIS_OPTIONS = ["Month Wise", "Calendar Year"] # Focus on these two for year iteration
+REFRESH_CLOSED_YEARS = False # Fetch closed years the ledger has done again too (see --refresh-closed-years)
+STALE_GROWTH_DATA_TYPES = set() # DataTypes written since the growth tables were last refreshed (see refresh_stale_growth)
 
 # --- Database Interaction Functions ---
 def initialize_db():
@@ -43,63 +51,199 @@ def initialize_db():
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
-    # Table for Calendar Year data (YoY)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS annual_registrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Name TEXT NOT NULL,
-            DataType TEXT NOT NULL,
-            Year INTEGER NOT NULL,
-            Registrations INTEGER NOT NULL,
-            UNIQUE(Name, DataType, Year)
-        );
-    ''')
-
-    # Table for Month Wise data (QoQ)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS monthly_registrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Name TEXT NOT NULL,
-            DataType TEXT NOT NULL,
-            Year INTEGER NOT NULL,
-            Month TEXT NOT NULL,
-            MonthlyRegistrations INTEGER NOT NULL,
-            UNIQUE(Name, DataType, Year, Month)
-        );
-    ''')
+    # A database migrated with --storage normalized (see migrate_csv_to_sql.py) exposes both tables as
+    # views over integer-keyed fact tables whose triggers accept the same inserts; only the flat layout is created here
+    if get_storage_mode(conn) != 'normalized':
+        # Table for Calendar Year data (YoY)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS annual_registrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name TEXT NOT NULL,
+                DataType TEXT NOT NULL,
+                Year INTEGER NOT NULL,
+                Registrations INTEGER NOT NULL,
+                UNIQUE(Name, DataType, Year)
+            );
+        ''')
+
+        # Table for Month Wise data (QoQ)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS monthly_registrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Name TEXT NOT NULL,
+                DataType TEXT NOT NULL,
+                Year INTEGER NOT NULL,
+                Month TEXT NOT NULL,
+                MonthlyRegistrations INTEGER NOT NULL,
+                UNIQUE(Name, DataType, Year, Month)
+            );
+        ''')
+
+        # Covering indexes for the dashboard's access pattern (DataType, then entity, then year range) and for the Year bounds lookup
+        for index_sql in DASHBOARD_INDEXES:
+            cursor.execute(index_sql)
+    create_category_map(conn)
+    create_growth_tables(conn)
+    create_crawl_ledger(conn)
     conn.commit()
     conn.close()
     print(f"Database '{DB_FILE}' initialized successfully.")
 
+# Natural key of each table: rows scraped again (a resumed or forced crawl) update the stored counts
+TABLE_KEYS = {
+    'annual_registrations': ['Name', 'DataType', 'Year'],
+    'monthly_registrations': ['Name', 'DataType', 'Year', 'Month'],
+}
+
+def upsert_rows(table, conn, keys, data_iter):
+    """
+    to_sql insert method that upserts against the table's natural key. The normalized storage's
+    views cannot take an upsert, but their INSTEAD OF INSERT triggers already upsert.
+    """
+    sql = f"INSERT INTO {table.name} ({', '.join(keys)}) VALUES ({', '.join('?' * len(keys))})"
+    key_cols = TABLE_KEYS.get(table.name)
+    if key_cols and get_storage_mode(conn) == 'flat':
+        updates = ', '.join(f"{col} = excluded.{col}" for col in keys if col not in key_cols)
+        sql += f" ON CONFLICT({', '.join(key_cols)}) DO UPDATE SET {updates}"
+    conn.executemany(sql, list(data_iter))
+
 def insert_data_into_db(df, table_name, if_exists='append'):
-    """Inserts a DataFrame into a specified SQLite table."""
+    """
+    Upserts a DataFrame into a specified SQLite table and marks its DataTypes for refresh_stale_growth.
+    Raises if the write fails.
+    """
     if df.empty:
         print(f"No data to insert into '{table_name}'.")
         return
     conn = sqlite3.connect(DB_FILE)
     try:
-        # Using 'replace' for 'if_exists' to handle potential re-runs and ensure unique constraints are met
-        df.to_sql(table_name, conn, if_exists=if_exists, index=False)
+        df.to_sql(table_name, conn, if_exists=if_exists, index=False, method=upsert_rows)
         print(f"Successfully inserted {len(df)} rows into '{table_name}'.")
-    except sqlite3.IntegrityError as e:
-        print(f"Integrity error inserting data into '{table_name}': {e}. Likely duplicate key.")
-        print("Attempting to update existing records if supported, or skipping duplicates.")
-        # If UNIQUE constraint is violated, try to update or log. For this assignment,
-        # we'll assume 'replace' is suitable if a full overwrite is desired for unique keys,
-        # or 'append' with error logging if duplicates are truly an error.
-        # Given 'UNIQUE' constraint, 'replace' would overwrite based on key, 'append' would fail.
-        # For simplicity, if_exists='append' (default) is fine, and we catch the error.
+        conn.commit()
+        STALE_GROWTH_DATA_TYPES.update(df['DataType'].unique().tolist())
     except Exception as e:
+        conn.rollback()
         print(f"Error inserting data into '{table_name}': {e}")
+        raise
+    finally:
+        conn.close()
+
+def refresh_stale_growth():
+    """
+    Brings the dashboard's precomputed YoY/QoQ in step with the raw rows: refreshes the growth tables
+    once for all DataTypes written since the last refresh, instead of once per scraped table.
+    """
+    if not STALE_GROWTH_DATA_TYPES:
+        return
+    data_types = sorted(STALE_GROWTH_DATA_TYPES)
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        refresh_growth_tables(conn, data_types)
+        conn.commit()
+        STALE_GROWTH_DATA_TYPES.difference_update(data_types)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error refreshing the growth tables: {e}")
+    finally:
+        conn.close()
+
+# --- Crawl Ledger (resumable crawl) ---
+def get_content_hash(job):
+    """Returns the content hash of the rows last stored for `job`, or None."""
+    y_axis_option, x_axis_option, year = job
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        row = conn.execute("SELECT ContentHash FROM crawl_jobs WHERE YAxis = ? AND XAxis = ? AND Year = ?",
+                           (y_axis_option, x_axis_option, int(year))).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+def hash_scraped_rows(scraped):
+    """Content hash of a job's scraped (df, table_name, if_exists) writes, independent of the portal's row order."""
+    digest = hashlib.sha256()
+    for df, table_name, _ in sorted(scraped, key=lambda write: write[1]):
+        digest.update(table_name.encode('utf-8'))
+        digest.update(df.sort_values(list(df.columns)).to_csv(index=False).encode('utf-8'))
+    return digest.hexdigest()
+
+def rows_are_stored(scraped):
+    """
+    Checks that the target tables still hold as many rows as each scraped write, per DataType and
+    Year, so a ledger hash is not trusted for rows that were since deleted (e.g. by a full migration).
+    """
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        for df, table_name, _ in scraped:
+            for (data_type, year), group in df.groupby(['DataType', 'Year']):
+                stored = conn.execute(f"SELECT COUNT(*) FROM {table_name} WHERE DataType = ? AND Year = ?",
+                                      (data_type, int(year))).fetchone()[0]
+                if stored < len(group):
+                    return False
     finally:
         conn.close()
+    return True
+
+def record_crawl_job(job, status, row_count=None, error=None, content_hash=None):
+    """Sets a job's status in the ledger kept in DB_FILE, see update_crawl_job."""
+    update_crawl_job(DB_FILE, job, status, row_count, error, content_hash)
+
+def commit_crawl_job(job, writes, row_count, content_hash):
+    """
+    Writes a job's (df, table_name, if_exists) rows and only then records it as done with its row
+    count and content hash. If a write fails the job is recorded as failed, so the next run fetches
+    it again. Returns True if the job was committed.
+    """
+    try:
+        for df, table_name, if_exists in writes:
+            insert_data_into_db(df, table_name, if_exists)
+    except Exception as e:
+        record_crawl_job(job, 'failed', row_count, f"Write failed: {e}")
+        return False
+    record_crawl_job(job, 'done', row_count, None, content_hash)
+    return True
+
+def run_crawl_job(job, scrape, commit_job=commit_crawl_job, record_job=record_crawl_job):
+    """
+    Runs one ledger job: `scrape(write_rows)` scrapes its rows, which `commit_job` writes only if
+    their content hash differs from the one stored for the job, so an unchanged table costs no DB
+    write or growth refresh. A job that scraped no rows is recorded as failed; an exception is
+    recorded and re-raised. Returns the number of rows scraped (0 if the commit failed).
+    """
+    stored_hash = get_content_hash(job)
+    record_job(job, 'running')
+    scraped = []
+
+    def collect_rows(df, table_name, if_exists='append'):
+        scraped.append((df, table_name, if_exists))
+
+    try:
+        scrape(collect_rows)
+    except Exception as e:
+        record_job(job, 'failed', 0, str(e))
+        raise
+    row_count = sum(len(df) for df, _, _ in scraped)
+    if not row_count:
+        record_job(job, 'failed', 0, "No rows scraped")
+        return 0
+    content_hash = hash_scraped_rows(scraped)
+    if content_hash == stored_hash and rows_are_stored(scraped):
+        print(f"{' / '.join(job)} is unchanged since the last scrape. Nothing written.")
+        scraped = []
+    # A queued commit (parallel crawl) returns None: the DB writer records the outcome
+    if commit_job(job, scraped, row_count, content_hash) is False:
+        return 0
+    return row_count
 
 # --- WebDriver Setup ---
-def setup_driver(browser_name):
+def setup_driver(browser_name, headless=False):
     """
-    Sets up and returns the webdriver.
+    Sets up and returns the webdriver, without a window if `headless`.
     """
     options = webdriver.EdgeOptions() if browser_name == 'edge' else webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080") # Same layout as a desktop window, so elements stay clickable
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev_shm_usage")
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36")
@@ -147,7 +291,7 @@ def get_dropdown_options(driver, dropdown_parent_id, dropdown_name):
             message=f"{dropdown_name} dropdown trigger (ID: {dropdown_parent_id}) is not clickable."
         )
         dropdown_trigger_element.click()
-        time.sleep(SLEEP_AFTER_ACTION)
+        wait_until_settled(driver, "open dropdown")
 
         specific_dropdown_panel_locator = (By.ID, f"{dropdown_parent_id}_panel")
 
@@ -183,11 +327,11 @@ def get_dropdown_options(driver, dropdown_parent_id, dropdown_name):
                     EC.invisibility_of_element_located(specific_dropdown_panel_locator),
                     message=f"{dropdown_name} dropdown panel did not become invisible after closing."
                 )
-                time.sleep(SLEEP_AFTER_ACTION)
+                wait_until_settled(driver, "close dropdown")
             except Exception as e:
                 print(f"Warning: Panel invisibility check failed for {dropdown_name}. Error: {e}")
                 driver.find_element(By.TAG_NAME, "body").click()
-                time.sleep(SLEEP_AFTER_ACTION)
+                wait_until_settled(driver, "close dropdown")
         
         return option_texts
     except Exception as e:
@@ -207,7 +351,7 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
             message=f"{dropdown_name} dropdown trigger is not clickable."
         )
         dropdown_trigger_element.click()
-        time.sleep(SLEEP_AFTER_ACTION)
+        wait_until_settled(driver, "open dropdown")
 
         specific_dropdown_panel_locator = (By.ID, f"{dropdown_parent_id}_panel")
         panel = WebDriverWait(driver, WAIT_TIMEOUT).until(
@@ -235,7 +379,7 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
             
             driver.execute_script("arguments[0].scrollIntoView(true);", option_to_click)
             option_to_click.click()
-            time.sleep(1)
+            wait_until_settled(driver, "select option", fixed_delay=1)
 
         if dropdown_parent_id == LOCATORS["multi_select_year_dropdown_id"]:
             try:
@@ -254,11 +398,11 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
                 EC.invisibility_of_element_located(specific_dropdown_panel_locator),
                 message=f"{dropdown_name} dropdown panel did not become invisible after closing."
             )
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "close dropdown")
         except Exception as e:
             print(f"Warning: Panel invisibility check failed for {dropdown_name}. Error: {e}")
             driver.find_element(By.TAG_NAME, "body").click()
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "close dropdown")
         print(f"Successfully selected '{option_text}' in {dropdown_name}.")
         return True
     except Exception as e:
@@ -266,9 +410,11 @@ def select_dropdown_option(driver, dropdown_parent_id, option_text, dropdown_nam
         return False
 
 # --- Data Scraping and Saving to DB ---
-def scrape_table_data_to_db(driver, y_axis_option, x_axis_option, year_val):
+def scrape_table_data_to_db(driver, y_axis_option, x_axis_option, year_val, write_rows=insert_data_into_db):
     """
     Scrapes the data table from the page and inserts it into the SQLite database.
+    The rows go through `write_rows` (same signature as insert_data_into_db), which browser workers
+    point at the queue of the single DB writer.
     """
     try:
         WebDriverWait(driver, WAIT_TIMEOUT).until(
@@ -276,7 +422,7 @@ def scrape_table_data_to_db(driver, y_axis_option, x_axis_option, year_val):
             message="Loading overlay did not disappear."
         )
         print("Loading overlay disappeared.")
-        time.sleep(1)
+        wait_until_settled(driver, "table ready", fixed_delay=1)
 
         main_table_container_id = ""
         try:
@@ -300,83 +446,91 @@ def scrape_table_data_to_db(driver, y_axis_option, x_axis_option, year_val):
         )
         
         table_html_to_parse = main_table_container.get_attribute('outerHTML')
-        tables = pd.read_html(io.StringIO(table_html_to_parse))
-
-        if tables:
-            data_df = pd.DataFrame()
-            best_df = None
-            for df in tables:
-                s_no_found = any('S No' in str(col) or 'S. No' in str(col) for col in df.columns)
-                if s_no_found and df.shape[0] > 1:
-                    best_df = df
-                    break
-                if df.shape[0] > 1 and df.shape[1] > 2 and (best_df is None or df.size > best_df.size):
-                    best_df = df
-            
-            if best_df is not None:
-                data_df = best_df
-                if isinstance(data_df.columns, pd.MultiIndex):
-                    data_df.columns = ['_'.join(col).strip() for col in data_df.columns.values]
-                else:
-                    data_df.columns = [col.strip() for col in data_df.columns.values]
-
-                # Data cleaning (remove commas, convert to numeric)
-                for col in data_df.columns:
-                    if data_df[col].dtype == 'object':
-                        data_df[col] = data_df[col].astype(str).str.replace(',', '', regex=False).str.strip()
-                        data_df[col] = pd.to_numeric(data_df[col], errors='ignore')
-
-                # Prepare DataFrame for database insertion
-                if x_axis_option == 'Calendar Year':
-                    # Assuming the structure for Calendar Year is 'S No', 'Name', 'Calendar Year_YYYY', 'TOTAL'
-                    col_year_regex = re.compile(r'Calendar Year_(\d{4})')
-                    year_col_name = next((col for col in data_df.columns if col_year_regex.match(col)), None)
-                    if year_col_name:
-                        df_to_insert = pd.DataFrame({
-                            'Name': data_df.iloc[:, 1], # Assuming 'Name' is the second column
-                            'DataType': y_axis_option,
-                            'Year': int(year_col_name.split('_')[-1]), # Extract year from column name
-                            'Registrations': data_df[year_col_name]
-                        })
-                        insert_data_into_db(df_to_insert, 'annual_registrations', if_exists='append')
-                    else:
-                        print(f"Warning: Could not find Calendar Year column in data for {y_axis_option}-{x_axis_option}-{year_val}")
-
-                elif x_axis_option == 'Month Wise':
-                    # Assuming the structure for Month Wise is 'S No', 'Name', 'Month Wise_JAN', ..., 'TOTAL_TOTAL'
-                    month_cols = [col for col in data_df.columns if 'Month Wise_' in col]
-                    if 'Name' in data_df.columns and month_cols:
-                        df_melted = data_df.melt(id_vars=['S No_S No', 'Name'], 
-                                                value_vars=month_cols, 
-                                                var_name='Month', 
-                                                value_name='MonthlyRegistrations')
-                        df_melted['Month'] = df_melted['Month'].str.replace('Month Wise_', '')
-                        
-                        df_to_insert = pd.DataFrame({
-                            'Name': df_melted['Name'],
-                            'DataType': y_axis_option,
-                            'Year': year_val, # Use the year provided to the function
-                            'Month': df_melted['Month'],
-                            'MonthlyRegistrations': pd.to_numeric(df_melted['MonthlyRegistrations'], errors='coerce').fillna(0)
-                        })
-                        insert_data_into_db(df_to_insert, 'monthly_registrations', if_exists='append')
-                    else:
-                        print(f"Warning: Could not find Name or Month Wise columns in data for {y_axis_option}-{x_axis_option}-{year_val}")
+        return save_table_html(table_html_to_parse, main_table_container_id, y_axis_option, x_axis_option, year_val, write_rows)
+    except Exception as e:
+        print(f"Error scraping data table for '{y_axis_option}-{x_axis_option}-{year_val}': {e}")
+        return pd.DataFrame()
 
-                print(f"Data saved to DB for {y_axis_option}-{x_axis_option}-{year_val}.")
-                return data_df # Return the DataFrame for logging/debugging if needed
+def save_table_html(table_html, container_id, y_axis_option, x_axis_option, year_val, write_rows=insert_data_into_db):
+    """
+    Parses the data table out of `table_html` (the outerHTML of the table container `container_id`)
+    and writes its rows through `write_rows`. Returns the parsed DataFrame, empty if none was found.
+    """
+    tables = pd.read_html(io.StringIO(table_html))
+    
+    if tables:
+        data_df = pd.DataFrame()
+        best_df = None
+        for df in tables:
+            s_no_found = any('S No' in str(col) or 'S. No' in str(col) for col in df.columns)
+            if s_no_found and df.shape[0] > 1:
+                best_df = df
+                break
+            if df.shape[0] > 1 and df.shape[1] > 2 and (best_df is None or df.size > best_df.size):
+                best_df = df
+    
+        if best_df is not None:
+            data_df = best_df
+            if isinstance(data_df.columns, pd.MultiIndex):
+                data_df.columns = ['_'.join(col).strip() for col in data_df.columns.values]
             else:
-                print(f"No usable data table found after parsing HTML for '{y_axis_option}-{x_axis_option}-{year_val}'.")
-                return pd.DataFrame()
+                data_df.columns = [col.strip() for col in data_df.columns.values]
+    
+            # Data cleaning (remove commas, convert to numeric)
+            for col in data_df.columns:
+                if data_df[col].dtype == 'object':
+                    data_df[col] = data_df[col].astype(str).str.replace(',', '', regex=False).str.strip()
+                    data_df[col] = pd.to_numeric(data_df[col], errors='ignore')
+    
+            # Prepare DataFrame for database insertion
+            if x_axis_option == 'Calendar Year':
+                # Assuming the structure for Calendar Year is 'S No', 'Name', 'Calendar Year_YYYY', 'TOTAL'
+                col_year_regex = re.compile(r'Calendar Year_(\d{4})')
+                year_col_name = next((col for col in data_df.columns if col_year_regex.match(col)), None)
+                if year_col_name:
+                    df_to_insert = pd.DataFrame({
+                        'Name': data_df.iloc[:, 1], # Assuming 'Name' is the second column
+                        'DataType': y_axis_option,
+                        'Year': int(year_col_name.split('_')[-1]), # Extract year from column name
+                        'Registrations': data_df[year_col_name]
+                    })
+                    write_rows(df_to_insert, 'annual_registrations', if_exists='append')
+                else:
+                    print(f"Warning: Could not find Calendar Year column in data for {y_axis_option}-{x_axis_option}-{year_val}")
+    
+            elif x_axis_option == 'Month Wise':
+                # Assuming the structure for Month Wise is 'S No', 'Name', 'Month Wise_JAN', ..., 'TOTAL_TOTAL'
+                month_cols = [col for col in data_df.columns if 'Month Wise_' in col]
+                name_col = data_df.columns[1] if data_df.shape[1] > 1 else None # Assuming 'Name' is the second column (e.g. 'Maker_Maker')
+                if name_col is not None and name_col not in month_cols and month_cols:
+                    df_melted = data_df.melt(id_vars=[name_col], 
+                                            value_vars=month_cols, 
+                                            var_name='Month', 
+                                            value_name='MonthlyRegistrations')
+                    df_melted['Month'] = df_melted['Month'].str.replace('Month Wise_', '')
+    
+                    df_to_insert = pd.DataFrame({
+                        'Name': df_melted[name_col],
+                        'DataType': y_axis_option,
+                        'Year': year_val, # Use the year provided to the function
+                        'Month': df_melted['Month'],
+                        'MonthlyRegistrations': pd.to_numeric(df_melted['MonthlyRegistrations'], errors='coerce').fillna(0)
+                    })
+                    write_rows(df_to_insert, 'monthly_registrations', if_exists='append')
+                else:
+                    print(f"Warning: Could not find Name or Month Wise columns in data for {y_axis_option}-{x_axis_option}-{year_val}")
+    
+            print(f"Data saved to DB for {y_axis_option}-{x_axis_option}-{year_val}.")
+            return data_df # Return the DataFrame for logging/debugging if needed
         else:
-            print(f"No tables found at all within '{main_table_container_id}'s HTML for '{y_axis_option}-{x_axis_option}-{year_val}'.")
+            print(f"No usable data table found after parsing HTML for '{y_axis_option}-{x_axis_option}-{year_val}'.")
             return pd.DataFrame()
-    except Exception as e:
-        print(f"Error scraping data table for '{y_axis_option}-{x_axis_option}-{year_val}': {e}")
+    else:
+        print(f"No tables found at all within '{container_id}'s HTML for '{y_axis_option}-{x_axis_option}-{year_val}'.")
         return pd.DataFrame()
 
 
-def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id):
+def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id, write_rows=insert_data_into_db):
     """
     Selects a single year, scrapes the data into DB, and then unselects it (for multi-select).
     """
@@ -391,19 +545,20 @@ def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_optio
                 EC.element_to_be_clickable(LOCATORS["refresh_button"]),
                 message="Refresh button is not clickable."
             )
+            panel_state = get_panel_state(driver) # To detect when the refreshed table has arrived
             refresh_button.click()
             WebDriverWait(driver, WAIT_TIMEOUT).until(
                 EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
                 message="Loading overlay did not disappear after refresh."
             )
-            time.sleep(SLEEP_AFTER_ACTION)
+            wait_until_settled(driver, "refresh table", panel_state=panel_state)
             print("Refresh button clicked and page reloaded.")
         except Exception as e:
             print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping to next year.")
             return
 
         save_html_backup(driver, f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-        scrape_table_data_to_db(driver, y_axis_option, x_axis_option, int(year_to_scrape)) # Pass actual year
+        scrape_table_data_to_db(driver, y_axis_option, x_axis_option, int(year_to_scrape), write_rows) # Pass actual year
 
     except Exception as e:
         print(f"An error occurred while processing year {year_to_scrape}: {e}")
@@ -417,14 +572,14 @@ def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_optio
                     EC.element_to_be_clickable(dropdown_trigger_locator)
                 )
                 dropdown_trigger_element.click()
-                time.sleep(SLEEP_AFTER_ACTION)
+                wait_until_settled(driver, "unselect year")
                 
                 year_label_locator = (By.XPATH, f"//div[@id='{active_year_dropdown_id}_panel']//li/label[text()='{year_to_scrape}']")
                 year_label_element = WebDriverWait(driver, WAIT_TIMEOUT).until(
                     EC.element_to_be_clickable(year_label_locator)
                 )
                 year_label_element.click()
-                time.sleep(SLEEP_AFTER_ACTION)
+                wait_until_settled(driver, "unselect year")
 
                 # Click trigger again to close the panel
                 dropdown_trigger_element.click()
@@ -432,10 +587,39 @@ def select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_optio
             except Exception as e:
                 print(f"Error unselecting year {year_to_scrape}: {e}")
 
-def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option):
+def scrape_month_wise_year(driver, year_to_scrape, y_axis_option, x_axis_option, write_rows=insert_data_into_db):
+    """
+    Selects one year in the single-select Year dropdown, refreshes the table and scrapes it into DB.
+    """
+    if not select_dropdown_option(driver, LOCATORS["single_select_year_dropdown_id"], year_to_scrape, "Year"):
+        return
+
+    print(f"\nProcessing combination: Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}")
+
+    try:
+        refresh_button = WebDriverWait(driver, WAIT_TIMEOUT).until(
+            EC.element_to_be_clickable(LOCATORS["refresh_button"]),
+            message="Refresh button is not clickable."
+        )
+        panel_state = get_panel_state(driver) # To detect when the refreshed table has arrived
+        refresh_button.click()
+        WebDriverWait(driver, WAIT_TIMEOUT).until(
+            EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
+            message="Loading overlay did not disappear after refresh."
+        )
+        wait_until_settled(driver, "refresh table", panel_state=panel_state)
+        print("Refresh button clicked and page reloaded.")
+    except Exception as e:
+        print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping to next year.")
+        return
+
+    save_html_backup(driver, f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+    scrape_table_data_to_db(driver, y_axis_option, x_axis_option, int(year_to_scrape), write_rows) # Pass actual year
+
+def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option, target_years):
     """
     Handles single-select year iteration for the 'Month Wise' X-axis.
-    Scrapes data to DB for each year.
+    Scrapes data to DB for each of `target_years` (the years the freshness policy fetches), recording each in the ledger.
     """
     active_year_dropdown_id = LOCATORS["single_select_year_dropdown_id"]
     print(f"Detected single-select Year dropdown: {active_year_dropdown_id}")
@@ -445,7 +629,6 @@ def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option):
         print("No year options available. Skipping year iteration.")
         return
 
-    target_years = [str(y) for y in range(2016, datetime.now().year + 1)] # Scrape all years up to current
     relevant_year_options = [opt for opt in fetched_year_options if opt in target_years]
 
     if not relevant_year_options:
@@ -453,35 +636,14 @@ def handle_year_selection_month_wise(driver, x_axis_option, y_axis_option):
         return
 
     for year_to_scrape in relevant_year_options:
-        if not select_dropdown_option(driver, active_year_dropdown_id, year_to_scrape, "Year"):
-            continue
-
-        print(f"\nProcessing combination: Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}")
-
-        try:
-            refresh_button = WebDriverWait(driver, WAIT_TIMEOUT).until(
-                EC.element_to_be_clickable(LOCATORS["refresh_button"]),
-                message="Refresh button is not clickable."
-            )
-            refresh_button.click()
-            WebDriverWait(driver, WAIT_TIMEOUT).until(
-                EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
-                message="Loading overlay did not disappear after refresh."
-            )
-            time.sleep(SLEEP_AFTER_ACTION)
-            print("Refresh button clicked and page reloaded.")
-        except Exception as e:
-            print(f"Error clicking Refresh button or waiting for page reload: {e}. Skipping to next year.")
-            continue
-
-        save_html_backup(driver, f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-        scrape_table_data_to_db(driver, y_axis_option, x_axis_option, int(year_to_scrape)) # Pass actual year
+        run_crawl_job((y_axis_option, x_axis_option, year_to_scrape),
+                      lambda write_rows: scrape_month_wise_year(driver, year_to_scrape, y_axis_option, x_axis_option, write_rows))
 
 
-def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
+def handle_year_selection_calendar(driver, x_axis_option, y_axis_option, target_years):
     """
     Handles multi-select year iteration for the 'Calendar Year' X-axis.
-    Scrapes data to DB for each year.
+    Scrapes data to DB for each of `target_years` (the years the freshness policy fetches), recording each in the ledger.
     """
     active_year_dropdown_id = LOCATORS["multi_select_year_dropdown_id"]
     print(f"Detected multi-select Year dropdown: {active_year_dropdown_id}")
@@ -491,7 +653,6 @@ def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
         print("No year options available. Skipping year iteration.")
         return
 
-    target_years = [str(y) for y in range(2016, datetime.now().year + 1)] # Scrape all years up to current
     relevant_year_options = [opt for opt in fetched_year_options if opt in target_years]
 
     if not relevant_year_options:
@@ -499,7 +660,8 @@ def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
         return
 
     for year_to_scrape in relevant_year_options:
-        select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id)
+        run_crawl_job((y_axis_option, x_axis_option, year_to_scrape),
+                      lambda write_rows: select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, active_year_dropdown_id, write_rows))
         
         try:
             dropdown_trigger_locator = (By.XPATH, f"//div[@id='{active_year_dropdown_id}']/div[contains(@class, 'ui-selectcheckboxmenu-trigger')]")
@@ -509,10 +671,414 @@ def handle_year_selection_calendar(driver, x_axis_option, y_axis_option):
             pass # Panel is already closed, or we can move on
 
 
-def main():
+# --- Request Replay Engine (JSF partial requests over HTTP, no browser) ---
+# The Refresh button issues a PrimeFaces partial request: a POST of the whole form with its
+# javax.faces.ViewState token, answered by a <partial-response> whose <update id="combTablePnl">
+# holds the new table. Each replay worker captures the form, the ViewState and the button once per
+# HTTP session and replays that POST for its (yaxisVar, xaxisVar, year) jobs; jobs it cannot run
+# fall back to the browser workers.
+REPLAY_HEADERS = {
+    "Faces-Request": "partial/ajax",
+    "X-Requested-With": "XMLHttpRequest",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36",
+}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+class JSFPageParser(HTMLParser):
+    """
+    Collects what a replayed JSF request needs from the dashboard page: per form its action, its
+    successful fields (as the browser would submit them) and the option values of its selects by
+    label, plus the form and id of the Refresh button.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = {} # form id -> {'action': ..., 'fields': {name: value}, 'options': {select name: {label: value}}}
+        self.refresh_button = None # (form id, button id)
+        self._form = None
+        self._select = None
+        self._option = None # [value, selected, text parts] of the option being read
+        self._button = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self._form = attrs.get('id') or attrs.get('name')
+            self.forms[self._form] = {'action': attrs.get('action', ''), 'fields': {}, 'options': {}}
+        elif self._form is None:
+            return
+        elif tag == 'input':
+            name, input_type = attrs.get('name'), (attrs.get('type') or 'text').lower()
+            if name and input_type not in ('submit', 'button', 'image', 'reset', 'file') and (input_type not in ('checkbox', 'radio') or 'checked' in attrs):
+                self.forms[self._form]['fields'][name] = attrs.get('value') or ''
+        elif tag == 'select':
+            self._select = attrs.get('name')
+            self.forms[self._form]['options'][self._select] = {}
+        elif tag == 'option' and self._select:
+            self._option = [attrs.get('value'), 'selected' in attrs, []]
+        elif tag == 'button':
+            self._button = attrs.get('id') or attrs.get('name')
+        elif tag == 'span' and self._button and 'ui-icon-refresh' in (attrs.get('class') or ''):
+            self.refresh_button = (self._form, self._button)
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[2].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'option' and self._option is not None:
+            value, selected, text = self._option
+            label = ''.join(text).strip()
+            value = label if value is None else value
+            options = self.forms[self._form]['options'][self._select]
+            # A single select submits its first option unless another one is selected
+            if selected or not options:
+                self.forms[self._form]['fields'][self._select] = value
+            options[label] = value
+            self._option = None
+        elif tag == 'select':
+            self._select = None
+        elif tag == 'button':
+            self._button = None
+        elif tag == 'form':
+            self._form = None
+
+class ElementExtractor(HTMLParser):
+    """Finds the outer HTML of the element with id `element_id`; JSF renders well-formed markup, so end tags balance."""
+    def __init__(self, element_id):
+        super().__init__(convert_charrefs=False)
+        self.element_id = element_id
+        self.depth = 0
+        self.start = None
+        self.end = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.end is not None or tag in VOID_TAGS:
+            return
+        if self.depth:
+            self.depth += 1
+        elif dict(attrs).get('id') == self.element_id:
+            self.start = self.getpos()
+            self.depth = 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass # Self-closing tags neither open nor close an element
+
+    def handle_endtag(self, tag):
+        if self.depth and self.end is None and tag not in VOID_TAGS:
+            self.depth -= 1
+            if self.depth == 0:
+                self.end = self.getpos()
+
+def extract_element_html(html, element_id):
+    """Returns the outer HTML of the element with id `element_id` in `html`, or None if it is not there."""
+    extractor = ElementExtractor(element_id)
+    extractor.feed(html)
+    extractor.close()
+    if extractor.start is None or extractor.end is None:
+        return None
+    line_starts = [0]
+    for line in html.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+    start = line_starts[extractor.start[0] - 1] + extractor.start[1]
+    end_tag = line_starts[extractor.end[0] - 1] + extractor.end[1]
+    return html[start:html.index('>', end_tag) + 1]
+
+def capture_jsf_view(session):
+    """
+    GETs the dashboard page and returns the state a replay needs: the action, fields (including
+    javax.faces.ViewState) and select options of the form holding the Refresh button, and the
+    button's id. Raises ValueError if the page does not look like the dashboard.
+    """
+    response = session.get(VAHAN_DASHBOARD_URL, headers={"User-Agent": REPLAY_HEADERS["User-Agent"]}, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    parser = JSFPageParser()
+    parser.feed(response.text)
+    if parser.refresh_button is None:
+        raise ValueError("Refresh button not found on the dashboard page.")
+    form_id, button_id = parser.refresh_button
+    form = parser.forms[form_id]
+    if "javax.faces.ViewState" not in form['fields']:
+        raise ValueError(f"No javax.faces.ViewState in form '{form_id}'.")
+    return {
+        'action': urljoin(response.url, form['action']) if form['action'] else response.url,
+        'form_id': form_id,
+        'button_id': button_id,
+        'fields': form['fields'],
+        'options': form['options'],
+        'axes': None, # (y_axis_option, x_axis_option) the server-side view was last switched to
+    }
+
+def parse_partial_response(text):
+    """Returns {component id: content} of the <update> elements of a JSF partial response; raises ValueError on <error> or <redirect>."""
+    root = ET.fromstring(text)
+    error = root.find('.//error')
+    if error is not None:
+        raise ValueError(f"{error.findtext('error-name')}: {error.findtext('error-message')}")
+    if root.find('.//redirect') is not None:
+        raise ValueError("The server redirected the partial request (session expired?).")
+    return {update.get('id'): update.text or '' for update in root.iter('update')}
+
+def post_partial_request(session, view, source_id, execute, render, fields, event=None):
+    """
+    POSTs a PrimeFaces partial request for component `source_id` with the form's fields plus
+    `fields`, as the browser would, and keeps the ViewState the response returns. Returns the updates.
+    """
+    data = dict(view['fields'])
+    data.update(fields)
+    data.update({
+        "javax.faces.partial.ajax": "true",
+        "javax.faces.source": source_id,
+        "javax.faces.partial.execute": execute,
+        "javax.faces.partial.render": render,
+        view['form_id']: view['form_id'],
+    })
+    if event:
+        data["javax.faces.behavior.event"] = event
+        data["javax.faces.partial.event"] = event
+    else:
+        data[source_id] = source_id # The button that was clicked
+    response = session.post(view['action'], data=data, headers=REPLAY_HEADERS, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    updates = parse_partial_response(response.text)
+    view_state = next((content for component_id, content in updates.items() if component_id and "javax.faces.ViewState" in component_id), None)
+    if view_state:
+        view['fields']["javax.faces.ViewState"] = view_state
+    return updates
+
+def replay_job(session, view, y_axis_option, x_axis_option, year_to_scrape, write_rows=insert_data_into_db):
+    """
+    Scrapes one (Y-axis, X-axis, year) combination by replaying the dashboard's requests: the axis
+    change events when the axes differ from the view's, then the Refresh POST whose combTablePnl
+    update is parsed like the browser's table. Raises on any failure, so the job can fall back.
+    """
+    y_axis_field = f"{LOCATORS['y_axis_dropdown_id']}_input"
+    x_axis_field = f"{LOCATORS['x_axis_dropdown_id']}_input"
+    axis_fields = {
+        y_axis_field: view['options'].get(y_axis_field, {}).get(y_axis_option, y_axis_option),
+        x_axis_field: view['options'].get(x_axis_field, {}).get(x_axis_option, x_axis_option),
+    }
+    if view['axes'] != (y_axis_option, x_axis_option):
+        view['axes'] = None
+        for dropdown_id in (LOCATORS["y_axis_dropdown_id"], LOCATORS["x_axis_dropdown_id"]):
+            post_partial_request(session, view, dropdown_id, dropdown_id, "@form", axis_fields, event="change")
+        view['axes'] = (y_axis_option, x_axis_option)
+    view['fields'].update(axis_fields)
+
+    if x_axis_option == "Calendar Year":
+        year_fields = {LOCATORS["multi_select_year_dropdown_id"]: year_to_scrape}
+    else:
+        year_fields = {f"{LOCATORS['single_select_year_dropdown_id']}_input": year_to_scrape}
+    print(f"\nReplaying combination: Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}")
+    updates = post_partial_request(session, view, view['button_id'], "@all", LOCATORS["main_table_panel_id"], year_fields)
+    fragment = updates.get(LOCATORS["main_table_panel_id"])
+    if fragment is None:
+        raise ValueError(f"The response did not update '{LOCATORS['main_table_panel_id']}'.")
+
+    os.makedirs(HTML_BACKUP_DIR, exist_ok=True)
+    with open(os.path.join(HTML_BACKUP_DIR, f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year_to_scrape}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"), "w", encoding="utf-8") as f:
+        f.write(fragment)
+
+    for container_id in ("groupingTable", "vchgroupTable"):
+        table_html = extract_element_html(fragment, container_id)
+        if table_html:
+            break
+    else:
+        raise ValueError("Neither 'groupingTable' nor 'vchgroupTable' found in the table fragment.")
+    if save_table_html(table_html, container_id, y_axis_option, x_axis_option, int(year_to_scrape), write_rows).empty:
+        raise ValueError("No usable data table in the table fragment.")
+
+def run_replay_worker(worker_id, jobs, writer_queue, failed_jobs):
+    """
+    Runs jobs from the shared `jobs` queue by request replay over one pooled HTTP session (kept-alive
+    connections, its own JSF view) and sends the rows to the DB writer. Jobs that fail twice are added
+    to `failed_jobs` for the browser. Returns the number of jobs it ran.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=3)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    commit_job, record_job = queued_writers(writer_queue)
+
+    def capture_view():
+        try:
+            return capture_jsf_view(session)
+        except Exception as e:
+            print(f"Replay worker {worker_id}: could not capture the JSF view: {e}")
+            return None
+
+    jobs_run = 0
+    view = capture_view()
+    try:
+        while True:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                break
+            for attempt in range(2): # A failed job is retried once on a fresh view, the old one may have expired
+                if view is None:
+                    failed_jobs.append(job)
+                    break
+                try:
+                    if run_crawl_job(job, lambda write_rows: replay_job(session, view, *job, write_rows), commit_job, record_job):
+                        jobs_run += 1
+                    else:
+                        failed_jobs.append(job) # The table parsed but gave no rows; the browser may fare better
+                    break
+                except Exception as e:
+                    view = capture_view()
+                    if attempt:
+                        print(f"Replay worker {worker_id}: {' / '.join(job)} failed ({e}); it goes to the browser fallback.")
+                        failed_jobs.append(job)
+                    else:
+                        print(f"Replay worker {worker_id}: {' / '.join(job)} failed ({e}); retrying on a fresh view.")
+    finally:
+        session.close()
+    return jobs_run
+
+# --- Parallel Crawl (pool of browser workers, single DB writer) ---
+def run_db_writer(writer_queue):
+    """
+    Runs the (function, args) writes the workers put on `writer_queue`, in order, until it receives
+    None. Being the only thread that writes, it never contends for SQLite's write lock.
+    """
+    while True:
+        item = writer_queue.get()
+        if item is None:
+            break
+        write, args = item
+        try:
+            write(*args)
+        except Exception as e:
+            print(f"DB writer: {write.__name__} failed: {e}") # Keep writing the other workers' jobs
+
+def queued_writers(writer_queue):
+    """
+    Returns commit_job and record_job functions for a worker (same signatures as commit_crawl_job
+    and record_crawl_job) that hand their writes to the DB writer, in order.
+    """
+    def commit_job(job, writes, row_count, content_hash):
+        writer_queue.put((commit_crawl_job, (job, writes, row_count, content_hash)))
+
+    def record_job(job, status, row_count=None, error=None, content_hash=None):
+        writer_queue.put((record_crawl_job, (job, status, row_count, error, content_hash)))
+
+    return commit_job, record_job
+
+def open_dashboard(driver):
+    """Loads the Vahan dashboard and waits until it has settled."""
+    driver.get(VAHAN_DASHBOARD_URL)
+    WebDriverWait(driver, WAIT_TIMEOUT).until(
+        EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
+        message="Initial loading overlay did not disappear."
+    )
+    wait_until_settled(driver, "initial load")
+
+def run_scrape_worker(worker_id, jobs, writer_queue, failed_jobs):
+    """
+    Runs jobs from the shared `jobs` queue in its own browser session until the queue is empty and
+    sends the scraped rows to the DB writer. Jobs that fail are added to `failed_jobs`. Returns the
+    number of jobs it ran.
+    """
+    driver = setup_driver(BROWSER, headless=HEADLESS_WORKERS)
+    if not driver:
+        return 0 # The other workers take over this worker's share of the queue
+    commit_job, record_job = queued_writers(writer_queue)
+
+    jobs_run = 0
+    current_axes = None
+    try:
+        open_dashboard(driver)
+        while True:
+            try:
+                job = jobs.get_nowait()
+            except queue.Empty:
+                break
+            y_axis_option, x_axis_option, year_to_scrape = job
+            try:
+                if current_axes != (y_axis_option, x_axis_option):
+                    current_axes = None
+                    if not (select_dropdown_option(driver, LOCATORS["y_axis_dropdown_id"], y_axis_option, "Y-Axis")
+                            and select_dropdown_option(driver, LOCATORS["x_axis_dropdown_id"], x_axis_option, "X-Axis")):
+                        print(f"Worker {worker_id}: could not select {y_axis_option} / {x_axis_option}. Skipping year {year_to_scrape}.")
+                        record_job(job, 'failed', error="Could not select the axes")
+                        failed_jobs.append(job)
+                        continue
+                    current_axes = (y_axis_option, x_axis_option)
+                if x_axis_option == "Calendar Year":
+                    scrape = lambda rows: select_and_unselect_year(driver, year_to_scrape, y_axis_option, x_axis_option, LOCATORS["multi_select_year_dropdown_id"], rows)
+                else:
+                    scrape = lambda rows: scrape_month_wise_year(driver, year_to_scrape, y_axis_option, x_axis_option, rows)
+                if run_crawl_job(job, scrape, commit_job, record_job):
+                    jobs_run += 1
+                else:
+                    failed_jobs.append(job)
+            except Exception as e:
+                print(f"Worker {worker_id}: error on {y_axis_option} / {x_axis_option} / {year_to_scrape}: {e}. Reloading the dashboard.")
+                failed_jobs.append(job)
+                current_axes = None
+                open_dashboard(driver)
+    except Exception as e:
+        print(f"Worker {worker_id} stopped: {e}")
+    finally:
+        driver.quit()
+    return jobs_run
+
+def run_parallel_crawl(workers, scrape_jobs=None, worker=run_scrape_worker, engine_name="browser"):
+    """
+    Crawls `scrape_jobs` (default: every job of the target axes) over `workers` concurrent
+    `worker`s (capped at MAX_SCRAPE_WORKERS), funnelling all rows into one DB writer thread.
+    Returns the jobs that failed or were never run.
+    """
+    workers = max(1, min(workers, MAX_SCRAPE_WORKERS))
+    scrape_jobs = build_scrape_jobs(TARGET_Y_AXIS_OPTIONS, TARGET_X_AXIS_OPTIONS) if scrape_jobs is None else scrape_jobs
+    failed_jobs = []
+    jobs = queue.Queue()
+    for job in scrape_jobs:
+        jobs.put(job)
+
+    writer_queue = queue.Queue()
+    writer = threading.Thread(target=run_db_writer, args=(writer_queue,), name="db-writer")
+    writer.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs_run = sum(pool.map(lambda worker_id: worker(worker_id, jobs, writer_queue, failed_jobs), range(workers)))
+    finally:
+        writer_queue.put(None) # Every row queued so far is still written
+        writer.join()
+        refresh_stale_growth()
+    print(f"Ran {jobs_run} of {len(scrape_jobs)} jobs with {workers} {engine_name} workers in {time.perf_counter() - start:.0f}s.")
+    if not jobs.empty():
+        print(f"{jobs.qsize()} jobs were not run because no {engine_name} worker was left.")
+        while not jobs.empty():
+            failed_jobs.append(jobs.get_nowait())
+    return failed_jobs
+
+def main(refresh_closed_years=REFRESH_CLOSED_YEARS):
     os.makedirs(HTML_BACKUP_DIR, exist_ok=True)
     initialize_db() # Initialize the database at the start
 
+    # Open years, plus the closed years the ledger does not have done, so a rerun resumes where the last one stopped
+    pending_jobs = plan_crawl_jobs(DB_FILE, build_scrape_jobs(TARGET_Y_AXIS_OPTIONS, TARGET_X_AXIS_OPTIONS), refresh_closed_years)
+    if not pending_jobs:
+        print("Nothing to fetch.")
+        return
+
+    if SCRAPE_ENGINE == "replay":
+        failed_jobs = run_parallel_crawl(SCRAPE_WORKERS, pending_jobs, worker=run_replay_worker, engine_name="replay")
+        if failed_jobs:
+            print(f"Falling back to the browser for {len(failed_jobs)} jobs.")
+            failed_jobs = run_parallel_crawl(SCRAPE_WORKERS, failed_jobs)
+            if failed_jobs:
+                print(f"{len(failed_jobs)} jobs failed in the browser too: {failed_jobs}")
+            print_wait_report()
+        return
+
+    if SCRAPE_WORKERS > 1:
+        run_parallel_crawl(SCRAPE_WORKERS, pending_jobs)
+        print_wait_report()
+        return
+
     driver = setup_driver(BROWSER)
     if not driver:
         return
@@ -524,11 +1090,11 @@ def main():
             EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"]),
             message="Initial loading overlay did not disappear."
         )
-        time.sleep(SLEEP_AFTER_ACTION)
+        wait_until_settled(driver, "initial load")
         save_html_backup(driver, f"initial_page_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
 
-        target_y_axis_options = ["Vehicle Category", "Maker"]
-        target_x_axis_options = ["Month Wise", "Calendar Year"] # Focus on these two for year iteration
+        target_y_axis_options = TARGET_Y_AXIS_OPTIONS
+        target_x_axis_options = TARGET_X_AXIS_OPTIONS
         
         y_axis_options_available = get_dropdown_options(driver, LOCATORS["y_axis_dropdown_id"], "Y-Axis")
         if not y_axis_options_available:
@@ -536,6 +1102,9 @@ def main():
             return
 
         for y_axis_option in target_y_axis_options:
+            if not any(job[0] == y_axis_option for job in pending_jobs):
+                print(f"Nothing to fetch for Y-Axis '{y_axis_option}'. Skipping.")
+                continue
             if y_axis_option not in y_axis_options_available:
                 print(f"Y-Axis option '{y_axis_option}' not available. Skipping.")
                 continue
@@ -551,13 +1120,17 @@ def main():
                 continue
 
             for x_axis_option in relevant_x_axis_options:
+                pending_years = [year for y, x, year in pending_jobs if (y, x) == (y_axis_option, x_axis_option)]
+                if not pending_years:
+                    print(f"Nothing to fetch for {y_axis_option} / {x_axis_option}. Skipping.")
+                    continue
                 if not select_dropdown_option(driver, LOCATORS["x_axis_dropdown_id"], x_axis_option, "X-Axis"):
                     continue
 
                 if x_axis_option == "Calendar Year":
-                    handle_year_selection_calendar(driver, x_axis_option, y_axis_option)
+                    handle_year_selection_calendar(driver, x_axis_option, y_axis_option, pending_years)
                 elif x_axis_option == "Month Wise":
-                    handle_year_selection_month_wise(driver, x_axis_option, y_axis_option)
+                    handle_year_selection_month_wise(driver, x_axis_option, y_axis_option, pending_years)
                 else:
                     # This block is for other X-axis options not requiring specific year iteration,
                     # which is not currently in your target_x_axis_options.
@@ -570,6 +1143,12 @@ def main():
         if driver:
             driver.quit()
             print("Driver closed.")
+        refresh_stale_growth()
+        print_wait_report()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scrape the Vahan dashboard into the SQLite database: the open years, and the closed years the crawl ledger does not have done.")
+    parser.add_argument("--refresh-closed-years", action="store_true", default=REFRESH_CLOSED_YEARS,
+                        help=f"Also fetch the closed years (older than the last {OPEN_YEARS}) that are done; tables that did not change are still not rewritten.")
+    args = parser.parse_args()
+    main(refresh_closed_years=args.refresh_closed_years)
@@ -0,0 +1,197 @@
+# vahan_growth.py
+# Storage layout, vehicle category mapping and the materialized growth tables of the SQLite database,
+# shared by sql_app.py, sql_vahan_data_scrapper.py and migrate_csv_to_sql.py so they build and group alike.
+
+import re
+
+# --- Storage Layout ---
+# Indexes matched to the dashboard's access pattern: filter by DataType, then entity, then a year range.
+# Each one also carries the registration count so those queries never touch the table rows (covering index).
+DASHBOARD_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_annual_registrations_dashboard ON annual_registrations (DataType, Name, Year, Registrations);',
+    'CREATE INDEX IF NOT EXISTS idx_monthly_registrations_dashboard ON monthly_registrations (DataType, Name, Year, Month, MonthlyRegistrations);',
+    'CREATE INDEX IF NOT EXISTS idx_annual_registrations_year ON annual_registrations (Year);',
+    'CREATE INDEX IF NOT EXISTS idx_monthly_registrations_year ON monthly_registrations (Year);',
+]
+
+def get_storage_mode(conn):
+    """
+    Returns the storage mode of an existing database: 'normalized' if annual_registrations is a view
+    over the fact tables (see migrate_csv_to_sql.py --storage normalized), 'flat' if it is a table,
+    or None if it has not been created yet.
+    """
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'annual_registrations'").fetchone()
+    if row is None:
+        return None
+    return 'normalized' if row[0] == 'view' else 'flat'
+
+# --- Category Mapping ---
+# Keyword patterns per vehicle group, compiled once and checked in priority order
+CATEGORY_PATTERNS = [
+    ('2W', re.compile(r'TWO WHEELER')),
+    ('3W', re.compile(r'THREE WHEELER')),
+    # Four-wheelers and other heavy vehicles
+    ('4W', re.compile('|'.join(re.escape(keyword) for keyword in [
+        'FOUR WHEELER', 'LIGHT MOTOR VEHICLE', 'MEDIUM MOTOR VEHICLE',
+        'HEAVY MOTOR VEHICLE', 'GOODS VEHICLE', 'PASSENGER VEHICLE',
+        'BUS', 'TRAC', 'EARTH MOVING', 'DUMPER', 'CRANE'
+    ]))),
+]
+
+def map_vehicle_category(category_name):
+    """
+    Maps detailed vehicle category names to broader 2W, 3W, or 4W groups.
+    """
+    category_name = str(category_name).strip().upper()
+    for group, pattern in CATEGORY_PATTERNS:
+        if pattern.search(category_name):
+            return group
+    return 'Other'
+
+def create_category_map(conn):
+    """
+    Creates the category_map dimension table: one row per raw vehicle category name with the
+    2W/3W/4W group it belongs to, so grouping by category happens inside SQLite.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS category_map (
+            RawName TEXT PRIMARY KEY,
+            MappedName TEXT NOT NULL
+        );
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_category_map_mapped ON category_map (MappedName, RawName);')
+
+def update_category_map(conn):
+    """
+    Classifies the vehicle category names that are not in category_map yet (each new raw name
+    once) and adds them, within the caller's transaction. Returns the number of names added.
+    """
+    create_category_map(conn)
+    new_names = [row[0] for row in conn.execute('''
+        SELECT Name FROM annual_registrations WHERE DataType = 'Vehicle Category'
+        UNION SELECT Name FROM monthly_registrations WHERE DataType = 'Vehicle Category'
+        EXCEPT SELECT RawName FROM category_map
+    ''').fetchall()]
+    conn.executemany(
+        "INSERT OR IGNORE INTO category_map (RawName, MappedName) VALUES (?, ?)",
+        [(name, map_vehicle_category(name)) for name in new_names]
+    )
+    return len(new_names)
+
+# --- Growth Materialization ---
+# Month label -> quarter, for the QoQ aggregation inside SQLite
+QUARTER_CASE_SQL = (
+    "CASE Month WHEN 'JAN' THEN 1 WHEN 'FEB' THEN 1 WHEN 'MAR' THEN 1 "
+    "WHEN 'APR' THEN 2 WHEN 'MAY' THEN 2 WHEN 'JUN' THEN 2 "
+    "WHEN 'JUL' THEN 3 WHEN 'AUG' THEN 3 WHEN 'SEP' THEN 3 "
+    "WHEN 'OCT' THEN 4 WHEN 'NOV' THEN 4 WHEN 'DEC' THEN 4 END"
+)
+
+# Growth key of a registrations row `r` left-joined to category_map `c`: the 2W/3W/4W group for vehicle categories, the raw Name otherwise
+MAPPED_NAME_SQL = "CASE WHEN r.DataType = 'Vehicle Category' THEN c.MappedName ELSE r.Name END"
+
+# Ranking indexes for the dashboard's leaderboard: one period's rows already sorted by each metric, so the top N
+# is read off one end of the index instead of sorting every row of the period. MappedName DESC matches both tie
+# orders of the leaderboard (metric DESC, MappedName for the highest; metric ASC, MappedName DESC for the lowest).
+GROWTH_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_annual_growth_yoy_rank ON annual_growth (DataType, Year, YoYGrowth, MappedName DESC);',
+    'CREATE INDEX IF NOT EXISTS idx_annual_growth_registrations_rank ON annual_growth (DataType, Year, Registrations, MappedName DESC);',
+    'CREATE INDEX IF NOT EXISTS idx_quarterly_growth_qoq_rank ON quarterly_growth (DataType, Year, Quarter, QoQGrowth, MappedName DESC);',
+    'CREATE INDEX IF NOT EXISTS idx_quarterly_growth_registrations_rank ON quarterly_growth (DataType, Year, Quarter, QuarterlyRegistrations, MappedName DESC);',
+]
+
+def create_growth_tables(conn):
+    """Creates the materialized YoY/QoQ tables read by the SQL dashboard, with their GROWTH_INDEXES."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS annual_growth (
+            DataType TEXT NOT NULL,
+            MappedName TEXT NOT NULL,
+            Year INTEGER NOT NULL,
+            Registrations INTEGER NOT NULL,
+            PrevYearRegistrations INTEGER,
+            YoYGrowth REAL,
+            PRIMARY KEY (DataType, MappedName, Year)
+        );
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quarterly_growth (
+            DataType TEXT NOT NULL,
+            MappedName TEXT NOT NULL,
+            Year INTEGER NOT NULL,
+            Quarter INTEGER NOT NULL,
+            QuarterYear TEXT NOT NULL,
+            QuarterlyRegistrations INTEGER NOT NULL,
+            PrevQuarterRegistrations INTEGER,
+            QoQGrowth REAL,
+            PRIMARY KEY (DataType, MappedName, Year, Quarter)
+        );
+    ''')
+    for index_sql in GROWTH_INDEXES:
+        conn.execute(index_sql)
+
+def refresh_growth_tables(conn, data_types=None):
+    """
+    Recomputes annual_growth and quarterly_growth for every (DataType, MappedName, period) of the
+    given data types (all if None) with SUM ... GROUP BY and LAG() window functions, within the
+    caller's transaction. Vehicle categories are grouped into 2W/3W/4W through category_map,
+    manufacturers by Name; growth is stored unrounded, the dashboard rounds it on display.
+    """
+    create_growth_tables(conn)
+    update_category_map(conn)
+    if data_types is None:
+        data_types = [row[0] for row in conn.execute(
+            "SELECT DataType FROM annual_registrations UNION SELECT DataType FROM monthly_registrations").fetchall()]
+    data_types = sorted(set(data_types))
+    if not data_types:
+        return
+
+    placeholders = ', '.join('?' for _ in data_types)
+    conn.execute(f"DELETE FROM annual_growth WHERE DataType IN ({placeholders})", data_types)
+    conn.execute(f'''
+        INSERT INTO annual_growth (DataType, MappedName, Year, Registrations, PrevYearRegistrations, YoYGrowth)
+        WITH named AS (
+            SELECT r.DataType, {MAPPED_NAME_SQL} AS MappedName, r.Year, r.Registrations
+            FROM annual_registrations r
+            LEFT JOIN category_map c ON r.DataType = 'Vehicle Category' AND c.RawName = r.Name
+            WHERE r.DataType IN ({placeholders})
+        ),
+        grouped AS (
+            SELECT DataType, MappedName, Year, SUM(Registrations) AS Registrations
+            FROM named
+            GROUP BY DataType, MappedName, Year
+        ),
+        lagged AS (
+            SELECT DataType, MappedName, Year, Registrations,
+                   LAG(Registrations) OVER (PARTITION BY DataType, MappedName ORDER BY Year) AS PrevYearRegistrations
+            FROM grouped
+        )
+        SELECT DataType, MappedName, Year, Registrations, PrevYearRegistrations,
+               ((Registrations - PrevYearRegistrations) * 1.0 / PrevYearRegistrations) * 100
+        FROM lagged
+    ''', data_types)
+
+    conn.execute(f"DELETE FROM quarterly_growth WHERE DataType IN ({placeholders})", data_types)
+    conn.execute(f'''
+        INSERT INTO quarterly_growth (DataType, MappedName, Year, Quarter, QuarterYear, QuarterlyRegistrations, PrevQuarterRegistrations, QoQGrowth)
+        WITH monthly AS (
+            SELECT r.DataType, {MAPPED_NAME_SQL} AS MappedName, r.Year, {QUARTER_CASE_SQL} AS Quarter, r.MonthlyRegistrations
+            FROM monthly_registrations r
+            LEFT JOIN category_map c ON r.DataType = 'Vehicle Category' AND c.RawName = r.Name
+            WHERE r.DataType IN ({placeholders})
+        ),
+        grouped AS (
+            SELECT DataType, MappedName, Year, Quarter, SUM(MonthlyRegistrations) AS QuarterlyRegistrations
+            FROM monthly
+            WHERE Quarter IS NOT NULL
+            GROUP BY DataType, MappedName, Year, Quarter
+        ),
+        lagged AS (
+            SELECT DataType, MappedName, Year, Quarter, QuarterlyRegistrations,
+                   LAG(QuarterlyRegistrations) OVER (PARTITION BY DataType, MappedName ORDER BY Year, Quarter) AS PrevQuarterRegistrations
+            FROM grouped
+        )
+        SELECT DataType, MappedName, Year, Quarter, Year || '-Q' || Quarter, QuarterlyRegistrations, PrevQuarterRegistrations,
+               ((QuarterlyRegistrations - PrevQuarterRegistrations) * 1.0 / PrevQuarterRegistrations) * 100
+        FROM lagged
+    ''', data_types)
+    print(f"Refreshed growth tables for: {', '.join(data_types)}.")
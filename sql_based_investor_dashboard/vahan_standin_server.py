@@ -0,0 +1,268 @@
+# vahan_standin_server.py
+
+import os
+import re
+import glob
+import html
+import time
+import secrets
+import argparse
+import threading
+import pandas as pd
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+# A local stand-in for the Vahan dashboard's JSF endpoints, so the scraper's request replay engine can
+# be run and timed offline. It serves a minimal reportview.xhtml with the portal's component ids and
+# answers the Refresh partial requests with combTablePnl fragments: recorded ones from the scraper's
+# HTML backups (--record), else one rendered from the CSV exports. Point the scraper at it with
+# VAHAN_DASHBOARD_URL = "http://localhost:8765/vahan4dashboard/vahan/view/reportview.xhtml".
+
+# --- Configuration ---
+PORT = 8765
+PAGE_PATH = "/vahan4dashboard/vahan/view/reportview.xhtml"
+FRAGMENT_DIR = "standin_fragments" # Recorded combTablePnl fragments, one file per combination
+HTML_BACKUP_DIR = "html_backups" # The scraper's HTML backups, recorded with --record
+DATA_DIR = "../vahan_data" # CSV exports used for combinations that were not recorded
+RESPONSE_DELAY = 0.0 # Seconds added to every partial response, to emulate the portal's latency
+Y_AXIS_OPTIONS = {"Vehicle Category": "VCG", "Maker": "MKR", "Fuel": "FUL"} # Label -> option value, as on the portal
+X_AXIS_OPTIONS = {"Calendar Year": "CYR", "Month Wise": "MWS", "Financial Year": "FYR"}
+YEARS = [str(year) for year in range(2016, 2027)]
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+SESSIONS = {} # JSESSIONID -> {'view_state': ..., 'axes': (y label, x label)}
+SESSIONS_LOCK = threading.Lock()
+
+# --- Fragments ---
+def combination_name(y_axis_option, x_axis_option, year):
+    """File name stem of a combination, as the CSV exports name it (e.g. Y_Maker_X_Calendar_Year_Year_2016)."""
+    return re.sub(r'[^A-Za-z0-9]+', '_', f"Y_{y_axis_option}_X_{x_axis_option}_Year_{year}")
+
+class ElementExtractor(HTMLParser):
+    """Finds the outer HTML of the element with id `element_id`; JSF renders well-formed markup, so end tags balance."""
+    def __init__(self, element_id):
+        super().__init__(convert_charrefs=False)
+        self.element_id = element_id
+        self.depth = 0
+        self.start = None
+        self.end = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.end is not None or tag in VOID_TAGS:
+            return
+        if self.depth:
+            self.depth += 1
+        elif dict(attrs).get('id') == self.element_id:
+            self.start = self.getpos()
+            self.depth = 1
+
+    def handle_startendtag(self, tag, attrs):
+        pass # Self-closing tags neither open nor close an element
+
+    def handle_endtag(self, tag):
+        if self.depth and self.end is None and tag not in VOID_TAGS:
+            self.depth -= 1
+            if self.depth == 0:
+                self.end = self.getpos()
+
+def extract_element_html(page_html, element_id):
+    """Returns the outer HTML of the element with id `element_id` in `page_html`, or None if it is not there."""
+    extractor = ElementExtractor(element_id)
+    extractor.feed(page_html)
+    extractor.close()
+    if extractor.start is None or extractor.end is None:
+        return None
+    line_starts = [0]
+    for line in page_html.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+    start = line_starts[extractor.start[0] - 1] + extractor.start[1]
+    end_tag = line_starts[extractor.end[0] - 1] + extractor.end[1]
+    return page_html[start:page_html.index('>', end_tag) + 1]
+
+def record_fragments():
+    """
+    Copies the combTablePnl panel of every scraper HTML backup (browser page sources and replayed
+    fragments alike) into FRAGMENT_DIR. Backups are named Y_<y>_X_<x>_Year_<year>_<timestamp>.html,
+    so the latest backup of a combination wins.
+    """
+    os.makedirs(FRAGMENT_DIR, exist_ok=True)
+    backup_regex = re.compile(r'^Y_(.+)_X_(.+)_Year_(\d{4})_\d{8}_\d{6}\.html$')
+    recorded = {}
+    for filepath in sorted(glob.glob(os.path.join(HTML_BACKUP_DIR, "*.html"))):
+        match = backup_regex.match(os.path.basename(filepath))
+        if not match:
+            continue
+        with open(filepath, encoding="utf-8") as f:
+            fragment = extract_element_html(f.read(), "combTablePnl")
+        if fragment:
+            recorded[combination_name(*match.groups())] = fragment
+    for name, fragment in recorded.items():
+        with open(os.path.join(FRAGMENT_DIR, f"{name}.html"), "w", encoding="utf-8") as f:
+            f.write(fragment)
+    print(f"Recorded {len(recorded)} fragments into {FRAGMENT_DIR}.")
+
+def render_csv_fragment(csv_path):
+    """Renders a CSV export as the portal's combTablePnl: a groupingTable with the two header rows its 'Group_Column' columns came from."""
+    df = pd.read_csv(csv_path)
+    groups = [col.split('_', 1) if '_' in col else [col, col] for col in df.columns]
+    top_row, sub_row = [], []
+    for group, column in groups:
+        if top_row and top_row[-1][0] == group:
+            top_row[-1][1] += 1
+        else:
+            top_row.append([group, 1])
+        sub_row.append(column)
+    header = (
+        "<tr>" + "".join(f'<th colspan="{span}">{html.escape(group)}</th>' for group, span in top_row) + "</tr>"
+        + "<tr>" + "".join(f"<th>{html.escape(column)}</th>" for column in sub_row) + "</tr>"
+    )
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(value))}</td>" for value in row) + "</tr>"
+        for row in df.itertuples(index=False)
+    )
+    return f'<div id="combTablePnl"><div id="groupingTable"><table><thead>{header}</thead><tbody>{body}</tbody></table></div></div>'
+
+def get_fragment(y_axis_option, x_axis_option, year):
+    """Returns the combTablePnl fragment of a combination: the recorded one, else one rendered from its CSV, else an empty panel."""
+    name = combination_name(y_axis_option, x_axis_option, year)
+    fragment_path = os.path.join(FRAGMENT_DIR, f"{name}.html")
+    if os.path.exists(fragment_path):
+        with open(fragment_path, encoding="utf-8") as f:
+            return f.read()
+    csv_path = os.path.join(DATA_DIR, f"{name}.csv")
+    if os.path.exists(csv_path):
+        return render_csv_fragment(csv_path)
+    return '<div id="combTablePnl"><span>No Record(s) Found</span></div>'
+
+# --- Page and Partial Responses ---
+SELECTED_ATTRIBUTE = ' selected="selected"'
+
+def render_select(select_id, options, selected_value):
+    """Renders a PrimeFaces selectOneMenu's hidden <select>, named <id>_input like the portal's."""
+    option_tags = "".join(
+        f'<option value="{value}"{SELECTED_ATTRIBUTE if value == selected_value else ""}>{html.escape(label)}</option>'
+        for label, value in options.items()
+    )
+    return f'<div id="{select_id}" class="ui-selectonemenu"><select id="{select_id}_input" name="{select_id}_input">{option_tags}</select></div>'
+
+def render_page(view_state):
+    """Renders a minimal reportview.xhtml: the dashboard form with its dropdowns, year lists, Refresh button and ViewState."""
+    year_options = {year: year for year in YEARS}
+    year_checkboxes = "".join(
+        f'<input type="checkbox" id="yearList:{i}" name="yearList" value="{year}"/><label for="yearList:{i}">{year}</label>'
+        for i, year in enumerate(YEARS)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><title>Vahan Dashboard (stand-in)</title></head><body>
+<form id="masterLayout_formlogin" name="masterLayout_formlogin" method="post" action="{PAGE_PATH}" enctype="application/x-www-form-urlencoded">
+<input type="hidden" name="masterLayout_formlogin" value="masterLayout_formlogin"/>
+{render_select("yaxisVar", Y_AXIS_OPTIONS, Y_AXIS_OPTIONS["Vehicle Category"])}
+{render_select("xaxisVar", X_AXIS_OPTIONS, X_AXIS_OPTIONS["Calendar Year"])}
+{render_select("selectedYear", year_options, YEARS[-1])}
+<div id="yearList" class="ui-selectcheckboxmenu">{year_checkboxes}</div>
+<button id="j_idt72" name="j_idt72" class="ui-button ui-widget" type="submit"><span class="ui-button-icon-left ui-icon ui-c ui-icon-refresh"></span><span class="ui-button-text ui-c">Refresh</span></button>
+<div id="j_idt132_blocker" style="display:none"></div>
+<div id="combTablePnl"></div>
+<input type="hidden" name="javax.faces.ViewState" id="j_id1:javax.faces.ViewState:0" value="{view_state}" autocomplete="off"/>
+</form></body></html>"""
+
+def cdata(text):
+    """Wraps `text` in CDATA sections, splitting any ']]>' it contains."""
+    return "<![CDATA[" + text.replace("]]>", "]]]]><![CDATA[>") + "]]>"
+
+def partial_response(view_state, updates=None):
+    """Renders a JSF <partial-response> with `updates` (component id -> markup) and the new ViewState."""
+    update_tags = "".join(f'<update id="{component_id}">{cdata(markup)}</update>' for component_id, markup in (updates or {}).items())
+    return (f'<?xml version="1.0" encoding="UTF-8"?><partial-response id="j_id1"><changes>{update_tags}'
+            f'<update id="j_id1:javax.faces.ViewState:0">{cdata(view_state)}</update></changes></partial-response>')
+
+def error_response(error_name, message):
+    """Renders a JSF <partial-response> carrying an <error>, as the portal answers an expired view."""
+    return (f'<?xml version="1.0" encoding="UTF-8"?><partial-response id="j_id1"><error><error-name>{error_name}</error-name>'
+            f'<error-message>{cdata(message)}</error-message></error></partial-response>')
+
+def option_label(options, value):
+    """Returns the label of the option with `value`, or None."""
+    return next((label for label, option_value in options.items() if option_value == value), None)
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """GET serves the dashboard page and starts a session; POST answers the partial requests of that session's view."""
+    protocol_version = "HTTP/1.1" # Keep-alive, like the portal
+
+    def send_body(self, status, content_type, body, cookie=None):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cookie:
+            self.send_header("Set-Cookie", f"JSESSIONID={cookie}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def session_id(self):
+        cookies = dict(part.strip().split("=", 1) for part in self.headers.get("Cookie", "").split(";") if "=" in part)
+        return cookies.get("JSESSIONID")
+
+    def do_GET(self):
+        if urlparse(self.path).path != PAGE_PATH:
+            self.send_body(404, "text/plain", "Not found")
+            return
+        session_id, view_state = secrets.token_hex(8), secrets.token_hex(16)
+        with SESSIONS_LOCK:
+            SESSIONS[session_id] = {'view_state': view_state, 'axes': ("Vehicle Category", "Calendar Year")}
+        self.send_body(200, "text/html; charset=UTF-8", render_page(view_state), cookie=session_id)
+
+    def do_POST(self):
+        form = dict(parse_qsl(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"), keep_blank_values=True))
+        if urlparse(self.path).path != PAGE_PATH or self.headers.get("Faces-Request") != "partial/ajax":
+            self.send_body(400, "text/plain", "Only JSF partial requests are served")
+            return
+        if RESPONSE_DELAY:
+            time.sleep(RESPONSE_DELAY)
+        with SESSIONS_LOCK:
+            session = SESSIONS.get(self.session_id())
+            if session is None or session['view_state'] != form.get("javax.faces.ViewState"):
+                body = error_response("javax.faces.application.ViewExpiredException", "View could not be restored.")
+                self.send_body(200, "text/xml; charset=UTF-8", body)
+                return
+            session['view_state'] = secrets.token_hex(16)
+            source = form.get("javax.faces.source")
+            if source in ("yaxisVar", "xaxisVar"):
+                # Axis change events re-render the form on the portal; only the selection matters here
+                session['axes'] = (
+                    option_label(Y_AXIS_OPTIONS, form.get("yaxisVar_input")) or session['axes'][0],
+                    option_label(X_AXIS_OPTIONS, form.get("xaxisVar_input")) or session['axes'][1],
+                )
+                body = partial_response(session['view_state'])
+            else:
+                y_axis_option, x_axis_option = session['axes']
+                year = form.get("yearList") if x_axis_option == "Calendar Year" else form.get("selectedYear_input")
+                body = partial_response(session['view_state'], {"combTablePnl": get_fragment(y_axis_option, x_axis_option, year)})
+        self.send_body(200, "text/xml; charset=UTF-8", body)
+
+    def log_message(self, format, *args):
+        pass # One line per request would drown the scraper's output
+
+def main(port=PORT):
+    server = ThreadingHTTPServer(("localhost", port), StandinHandler)
+    print(f"Vahan stand-in serving http://localhost:{port}{PAGE_PATH} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in of the Vahan dashboard's JSF endpoints for the scraper's replay engine.")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Port to listen on (default: {PORT}).")
+    parser.add_argument("--delay", type=float, default=RESPONSE_DELAY, help="Seconds added to every partial response, to emulate the portal's latency.")
+    parser.add_argument("--record", action="store_true",
+                        help=f"Record the combTablePnl fragments of the scraper's backups in {HTML_BACKUP_DIR} into {FRAGMENT_DIR}, then exit.")
+    args = parser.parse_args()
+    if args.record:
+        record_fragments()
+    else:
+        RESPONSE_DELAY = args.delay
+        main(args.port)
@@ -0,0 +1,181 @@
+# vahan_crawl.py
+# Browser wait engine and crawl ledger shared by csv_vahan_data_scrapper.py and sql_vahan_data_scrapper.py.
+# The scrapers run from their own directories and put the repository root on sys.path to import it.
+
+import time
+import threading
+import sqlite3 # The crawl ledger
+from datetime import datetime
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+# --- Configuration ---
+WAIT_TIMEOUT = 30 # Maximum wait time for webdriver (in seconds)
+SLEEP_AFTER_ACTION = 3 # Fixed delay (in seconds) formerly slept after each interaction; the wait report measures against it
+WAIT_POLL_INTERVAL = 0.2 # Seconds between checks while waiting for the page to settle
+FIRST_YEAR = 2016 # Years from this one up to the current year are scraped
+OPEN_YEARS = 2 # The current year and the one before still change (late registrations) and are fetched on every run; older years are closed
+
+# XPath Locators
+LOCATORS = {
+    "y_axis_dropdown_id": "yaxisVar",
+    "x_axis_dropdown_id": "xaxisVar",
+    "year_type_dropdown_id": "selectedYearType",
+    "single_select_year_dropdown_id": "selectedYear",
+    "multi_select_year_dropdown_id": "yearList",
+    "refresh_button": (By.XPATH, "//button[contains(@class, 'ui-button') and .//span[contains(@class, 'ui-icon-refresh')]]"),
+    "main_table_panel_id": "combTablePnl",
+    "loading_overlay_blocker": (By.ID, "j_idt132_blocker"),
+    "dropdown_options": (By.XPATH, ".//ul[contains(@class, 'ui-selectonemenu-list')]/li[contains(@class, 'ui-selectonemenu-item')]")
+}
+
+# --- Wait Engine ---
+# Waits for the page to settle after an action instead of sleeping a fixed SLEEP_AFTER_ACTION:
+# the PrimeFaces blocker overlay is hidden, the jQuery/PrimeFaces AJAX queue is idle and, after a
+# refresh, the table panel (combTablePnl) has been replaced or its content has changed.
+AJAX_IDLE_SCRIPT = """
+return document.readyState === 'complete'
+    && (typeof jQuery === 'undefined' || jQuery.active === 0)
+    && (typeof PrimeFaces === 'undefined' || !PrimeFaces.ajax || !PrimeFaces.ajax.Queue || PrimeFaces.ajax.Queue.isEmpty());
+"""
+# Length and a 32-bit hash of the panel HTML, so its content can be compared without transferring it
+PANEL_SIGNATURE_SCRIPT = """
+var panel = document.getElementById(arguments[0]);
+if (!panel) { return null; }
+var html = panel.innerHTML, hash = 0;
+for (var i = 0; i < html.length; i++) { hash = (hash * 31 + html.charCodeAt(i)) | 0; }
+return html.length + ':' + hash;
+"""
+WAIT_REPORT = {} # step -> [count, seconds waited, seconds the fixed sleeps would have taken]
+WAIT_REPORT_LOCK = threading.Lock() # Browser workers record their waits concurrently
+
+def get_panel_state(driver):
+    """Returns (element, signature) of the table panel, taken before an action that updates it."""
+    panels = driver.find_elements(By.ID, LOCATORS["main_table_panel_id"])
+    if not panels:
+        return None, None
+    return panels[0], driver.execute_script(PANEL_SIGNATURE_SCRIPT, LOCATORS["main_table_panel_id"])
+
+def panel_updated(driver, panel_state):
+    """True once the table panel captured in `panel_state` was replaced or its content changed."""
+    element, signature = panel_state
+    if element is None:
+        return bool(driver.find_elements(By.ID, LOCATORS["main_table_panel_id"]))
+    if EC.staleness_of(element)(driver):
+        return True
+    return driver.execute_script(PANEL_SIGNATURE_SCRIPT, LOCATORS["main_table_panel_id"]) != signature
+
+def page_settled(driver, panel_state=None):
+    """True when the blocker overlay is hidden, no AJAX request is pending and the panel (if given) was updated."""
+    if not EC.invisibility_of_element_located(LOCATORS["loading_overlay_blocker"])(driver):
+        return False
+    if not driver.execute_script(AJAX_IDLE_SCRIPT):
+        return False
+    return panel_state is None or panel_updated(driver, panel_state)
+
+def wait_until_settled(driver, step, fixed_delay=SLEEP_AFTER_ACTION, panel_state=None):
+    """
+    Waits until page_settled (at most WAIT_TIMEOUT seconds) and records the time against the
+    `fixed_delay` the step used to sleep, for print_wait_report. A timeout is reported, not raised:
+    the following explicit waits still guard the next interaction.
+    """
+    start = time.perf_counter()
+    try:
+        WebDriverWait(driver, WAIT_TIMEOUT, poll_frequency=WAIT_POLL_INTERVAL).until(lambda d: page_settled(d, panel_state))
+    except TimeoutException:
+        print(f"Warning: Page did not settle within {WAIT_TIMEOUT}s after '{step}'.")
+    with WAIT_REPORT_LOCK:
+        entry = WAIT_REPORT.setdefault(step, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+        entry[2] += fixed_delay
+
+def print_wait_report():
+    """Prints, per step, how long the condition waits took and the seconds saved over the fixed sleeps."""
+    if not WAIT_REPORT:
+        return
+    print("\nWait timing report (condition waits vs. fixed sleeps):")
+    print(f"{'Step':<20}{'Count':>7}{'Waited s':>11}{'Fixed s':>10}{'Saved s':>10}")
+    for step, (count, waited, fixed) in WAIT_REPORT.items():
+        print(f"{step:<20}{count:>7}{waited:>11.1f}{fixed:>10.1f}{fixed - waited:>10.1f}")
+    total_waited = sum(entry[1] for entry in WAIT_REPORT.values())
+    total_fixed = sum(entry[2] for entry in WAIT_REPORT.values())
+    print(f"{'Total':<20}{sum(entry[0] for entry in WAIT_REPORT.values()):>7}{total_waited:>11.1f}{total_fixed:>10.1f}{total_fixed - total_waited:>10.1f}")
+
+# --- Crawl Ledger (resumable crawl) ---
+def build_scrape_jobs(y_axis_options, x_axis_options):
+    """
+    Splits the crawl into independent (Y-axis, X-axis, year) jobs. They are ordered by axes, so a
+    worker taking consecutive jobs rarely has to switch its axis selection.
+    """
+    years = [str(year) for year in range(FIRST_YEAR, datetime.now().year + 1)]
+    return [(y_axis_option, x_axis_option, year) for y_axis_option in y_axis_options for x_axis_option in x_axis_options for year in years]
+
+def create_crawl_ledger(conn):
+    """
+    Creates crawl_jobs, the persistent ledger of the crawl: one row per (Y-axis, X-axis, year) job
+    with its status ('pending', 'running', 'done' or 'failed'), attempts, rows scraped and the
+    content hash of the rows last stored (for scrapers that keep one).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_jobs (
+            YAxis TEXT NOT NULL,
+            XAxis TEXT NOT NULL,
+            Year INTEGER NOT NULL,
+            Status TEXT NOT NULL DEFAULT 'pending',
+            Attempts INTEGER NOT NULL DEFAULT 0,
+            RowCount INTEGER,
+            LastError TEXT,
+            UpdatedAt TEXT,
+            ContentHash TEXT,
+            PRIMARY KEY (YAxis, XAxis, Year)
+        );
+    ''')
+    if 'ContentHash' not in [row[1] for row in conn.execute("PRAGMA table_info(crawl_jobs)")]:
+        conn.execute("ALTER TABLE crawl_jobs ADD COLUMN ContentHash TEXT") # Ledgers created before content hashing
+
+def is_open_year(year):
+    """Returns True if `year` is one of the last OPEN_YEARS years, whose numbers can still change."""
+    return int(year) > datetime.now().year - OPEN_YEARS
+
+def plan_crawl_jobs(db_file, scrape_jobs, refresh_closed_years=False):
+    """
+    Freshness policy: registers every job of `scrape_jobs` in the ledger kept in `db_file` and
+    returns, in crawl order, the ones to fetch: every open year, and the closed years the ledger does
+    not have done (never scraped, failed, or left 'running' by a run that died). A closed year never
+    changes once scraped, so it is skipped unless `refresh_closed_years`.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.executemany("INSERT OR IGNORE INTO crawl_jobs (YAxis, XAxis, Year) VALUES (?, ?, ?)",
+                         [(y_axis_option, x_axis_option, int(year)) for y_axis_option, x_axis_option, year in scrape_jobs])
+        done = set(conn.execute("SELECT YAxis, XAxis, Year FROM crawl_jobs WHERE Status = 'done'").fetchall())
+        conn.commit()
+    finally:
+        conn.close()
+    pending_jobs = [job for job in scrape_jobs
+                    if refresh_closed_years or is_open_year(job[2]) or (job[0], job[1], int(job[2])) not in done]
+    closed_done = sum(1 for job in scrape_jobs if not is_open_year(job[2]) and (job[0], job[1], int(job[2])) in done)
+    print(f"Crawl ledger: {len(pending_jobs)} of {len(scrape_jobs)} jobs to fetch "
+          f"({closed_done} closed years done{', refreshed anyway' if refresh_closed_years else ' and skipped'}).")
+    return pending_jobs
+
+def update_crawl_job(db_file, job, status, row_count=None, error=None, content_hash=None):
+    """
+    Sets a job's status in the ledger kept in `db_file` ('running' also counts an attempt), with
+    the rows it scraped, its error and content hash, if any.
+    """
+    y_axis_option, x_axis_option, year = job
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute(
+            "UPDATE crawl_jobs SET Status = ?, Attempts = Attempts + ?, RowCount = COALESCE(?, RowCount), LastError = ?, UpdatedAt = ?, "
+            "ContentHash = COALESCE(?, ContentHash) WHERE YAxis = ? AND XAxis = ? AND Year = ?",
+            (status, int(status == 'running'), row_count, error, datetime.now().isoformat(timespec='seconds'), content_hash,
+             y_axis_option, x_axis_option, int(year))
+        )
+        conn.commit()
+    finally:
+        conn.close()
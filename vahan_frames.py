@@ -0,0 +1,36 @@
+# vahan_frames.py
+# Memory-optimized frame builder shared by csv_app.py and sql_app.py, so both dashboards hold their
+# registration frames with the same compact dtypes. The apps put the repository root on sys.path to import it.
+
+import pandas as pd
+
+# Text columns stored as category, and count columns downcast to the smallest unsigned integer
+CATEGORY_COLUMNS = ['Name', 'DataType', 'Month', 'MappedName']
+COUNT_COLUMNS = ['Registrations', 'MonthlyRegistrations', 'QuarterlyRegistrations']
+
+def optimize_frame_dtypes(df, label):
+    """
+    Returns `df` with compact dtypes: CATEGORY_COLUMNS as category, COUNT_COLUMNS as the smallest
+    unsigned integer that holds them (if they are whole and non-negative), Year as int16 and
+    MonthNum as int8. The loaded frames are the dashboards' main RAM cost; the footprint before and
+    after is printed to the server log.
+    """
+    if df.empty:
+        return df
+    memory_before = df.memory_usage(deep=True).sum()
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in COUNT_COLUMNS:
+        if col in df.columns:
+            counts = pd.to_numeric(df[col], errors='coerce')
+            if counts.notna().all() and (counts >= 0).all() and (counts % 1 == 0).all():
+                df[col] = pd.to_numeric(counts.astype('int64'), downcast='unsigned')
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype('int16')
+    if 'MonthNum' in df.columns:
+        df['MonthNum'] = df['MonthNum'].astype('int8')
+    memory_after = df.memory_usage(deep=True).sum()
+    print(f"{label}: {memory_before / 1024 ** 2:.2f} MiB -> {memory_after / 1024 ** 2:.2f} MiB in memory")
+    return df